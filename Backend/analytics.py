@@ -0,0 +1,510 @@
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from embedding_cache import CACHE_DIR
+from feedback import QUESTION_TYPES
+from generation_planner import normalize_question
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+ANALYTICS_DB_PATH = os.getenv("ANALYTICS_DB_PATH", os.path.join(CACHE_DIR, "analytics.db"))
+# The writer thread commits once this many results are queued, or after
+# ANALYTICS_FLUSH_INTERVAL seconds, whichever comes first.
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "200"))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "1.0"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id         INTEGER PRIMARY KEY,
+    user_id    TEXT NOT NULL,
+    score      INTEGER NOT NULL,
+    total      INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_user ON results (user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS answers (
+    result_id     INTEGER NOT NULL,
+    user_id       TEXT NOT NULL,
+    question_key  TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    difficulty    TEXT NOT NULL,
+    is_correct    INTEGER NOT NULL,
+    chosen        TEXT,
+    created_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_result ON answers (result_id);
+CREATE INDEX IF NOT EXISTS answers_question ON answers (question_key);
+
+-- Materialized rollups, updated incrementally with every batch.
+CREATE TABLE IF NOT EXISTS user_rollup (
+    user_id   TEXT PRIMARY KEY,
+    results   INTEGER NOT NULL,
+    answers   INTEGER NOT NULL,
+    correct   INTEGER NOT NULL,
+    score_sum INTEGER NOT NULL,
+    total_sum INTEGER NOT NULL,
+    last_at   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_type_rollup (
+    user_id       TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    answers       INTEGER NOT NULL,
+    correct       INTEGER NOT NULL,
+    PRIMARY KEY (user_id, question_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS type_rollup (
+    question_type TEXT PRIMARY KEY,
+    answers       INTEGER NOT NULL,
+    correct       INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS difficulty_rollup (
+    difficulty TEXT PRIMARY KEY,
+    answers    INTEGER NOT NULL,
+    correct    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_rollup (
+    question_key  TEXT PRIMARY KEY,
+    question_text TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    difficulty    TEXT NOT NULL,
+    answers       INTEGER NOT NULL,
+    correct       INTEGER NOT NULL,
+    accuracy      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS question_rollup_accuracy
+    ON question_rollup (accuracy, answers);
+-- One row per offered option; `chosen` counts how often students picked it.
+CREATE TABLE IF NOT EXISTS option_rollup (
+    question_key TEXT NOT NULL,
+    option       TEXT NOT NULL,
+    is_correct   INTEGER NOT NULL,
+    chosen       INTEGER NOT NULL,
+    PRIMARY KEY (question_key, option)
+) WITHOUT ROWID;
+"""
+
+
+def question_key(text: str) -> str:
+    """Stable ID for a question: sha1 of its normalized text."""
+    return hashlib.sha1(normalize_question(text).encode("utf-8")).hexdigest()
+
+
+def _ratio(correct: int, answers: int) -> float:
+    return correct / answers if answers else 0.0
+
+
+def _chosen_text(d: Dict[str, Any]) -> Optional[str]:
+    chosen = d.get("chosen_options", d.get("chosen_option"))
+    if isinstance(chosen, list):
+        return "|".join(str(c) for c in chosen)
+    return None if chosen is None else str(chosen)
+
+
+def match_option(answer: Any, options: List[str]) -> Optional[str]:
+    """Map an answer (option text or letter) onto one of `options`."""
+    if answer is None or not options:
+        return None
+    answer = str(answer).strip()
+    lowered = answer.lower()
+    for option in options:
+        if str(option).strip().lower() == lowered:
+            return str(option)
+    if len(answer) == 1 and answer.isalpha():
+        idx = ord(answer.upper()) - ord("A")
+        if 0 <= idx < len(options):
+            return str(options[idx])
+    return None
+
+
+def option_counts(d: Dict[str, Any]) -> Dict[str, List[int]]:
+    """{option: [is_correct, times_chosen]} for one answered question."""
+    options = d.get("options")
+    if not isinstance(options, list) or not options:
+        return {}
+    options = [str(o) for o in options]
+    correct = d.get("correct_options", d.get("correct_option"))
+    correct = correct if isinstance(correct, list) else [correct]
+    chosen = d.get("chosen_options", d.get("chosen_option"))
+    chosen = chosen if isinstance(chosen, list) else [chosen]
+
+    counts = {option: [0, 0] for option in options}
+    for answer in correct:
+        option = match_option(answer, options)
+        if option is not None:
+            counts[option][0] = 1
+    for answer in chosen:
+        option = match_option(answer, options)
+        if option is not None:
+            counts[option][1] += 1
+    return counts
+
+
+def parse_result(result: Any, now: float) -> Tuple[str, int, int, float, List[tuple]]:
+    """
+    (user_id, score, total, created_at, answers) for one result, where each
+    answer is (text, question_type, difficulty, is_correct, chosen,
+    option_counts). Raises ValueError on a malformed result.
+    """
+    if not isinstance(result, dict):
+        raise ValueError("result is not a JSON object")
+    try:
+        user_id = str(result.get("userID") or "anonymous")
+        created_at = float(result.get("created_at") or now)
+        score = int(result.get("score", 0) or 0)
+        total = int(result.get("total_questions", 0) or 0)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"bad score, total or created_at: {e}") from e
+
+    answers = []
+    for qtype in QUESTION_TYPES:
+        section = result.get(qtype) or {}
+        if not isinstance(section, dict):
+            continue
+        for text, d in section.items():
+            if not isinstance(d, dict):
+                raise ValueError(f"{qtype} entry for {str(text)[:60]!r} is not an object")
+            answers.append((
+                str(text), qtype, str(d.get("difficulty") or "Unknown"),
+                int(bool(d.get("is_correct"))), _chosen_text(d), option_counts(d),
+            ))
+    return user_id, score, total, created_at, answers
+
+
+# -------------------------------------------------
+# STORE
+# -------------------------------------------------
+class AnalyticsStore:
+    """
+    SQLite (WAL) store of graded quiz results.
+
+    Writes go through write_batch(), which inserts raw rows with executemany
+    and folds the batch's per-user / per-type / per-difficulty / per-question
+    deltas into the rollup tables in the same transaction, so dashboard
+    reads are primary-key lookups instead of scans over `answers`.
+    """
+
+    def __init__(self, db_path: str = ANALYTICS_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+        return conn
+
+    # ---------- writes ----------
+    def write_batch(self, results: List[Dict[str, Any]]) -> int:
+        """
+        Insert results + answers and update rollups in one transaction.
+        Malformed results are skipped (and logged), not the whole batch.
+        """
+        if not results:
+            return 0
+        now = time.time()
+        parsed = []
+        for result in results:
+            try:
+                parsed.append(parse_result(result, now))
+            except ValueError as e:
+                user = result.get("userID") if isinstance(result, dict) else None
+                print(f"Analytics: skipped malformed result (userID={user!r}): {e}")
+        result_rows, answer_rows = [], []
+        users: Dict[str, List[float]] = defaultdict(lambda: [0, 0, 0, 0, 0, 0.0])
+        user_types: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0])
+        types: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        difficulties: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        questions: Dict[str, List[Any]] = {}
+        options: Dict[tuple, List[int]] = {}
+
+        with self._write_lock:
+            conn = self._conn()
+            next_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM results").fetchone()[0]) + 1
+
+            for user_id, score, total, created_at, answers in parsed:
+                result_id, next_id = next_id, next_id + 1
+                result_rows.append((result_id, user_id, score, total, created_at))
+
+                u = users[user_id]
+                u[0] += 1
+                u[3] += score
+                u[4] += total
+                u[5] = max(u[5], created_at)
+
+                for text, qtype, difficulty, correct, chosen, counts in answers:
+                    key = question_key(text)
+                    answer_rows.append((
+                        result_id, user_id, key, qtype, difficulty,
+                        correct, chosen, created_at,
+                    ))
+                    u[1] += 1
+                    u[2] += correct
+                    for bucket in (user_types[(user_id, qtype)], types[qtype],
+                                   difficulties[difficulty]):
+                        bucket[0] += 1
+                        bucket[1] += correct
+                    q = questions.setdefault(key, [text, qtype, difficulty, 0, 0])
+                    q[3] += 1
+                    q[4] += correct
+                    for option, (is_right, picks) in counts.items():
+                        o = options.setdefault((key, option), [0, 0])
+                        o[0] |= is_right
+                        o[1] += picks
+
+            with conn:
+                conn.executemany(
+                    "INSERT INTO results (id, user_id, score, total, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)", result_rows,
+                )
+                conn.executemany(
+                    "INSERT INTO answers (result_id, user_id, question_key, question_type, "
+                    "difficulty, is_correct, chosen, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    answer_rows,
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO user_rollup VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        results = results + excluded.results,
+                        answers = answers + excluded.answers,
+                        correct = correct + excluded.correct,
+                        score_sum = score_sum + excluded.score_sum,
+                        total_sum = total_sum + excluded.total_sum,
+                        last_at = MAX(last_at, excluded.last_at)
+                    """,
+                    [(k, *v) for k, v in users.items()],
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO user_type_rollup VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id, question_type) DO UPDATE SET
+                        answers = answers + excluded.answers,
+                        correct = correct + excluded.correct
+                    """,
+                    [(*k, *v) for k, v in user_types.items()],
+                )
+                for table, column, deltas in (
+                    ("type_rollup", "question_type", types),
+                    ("difficulty_rollup", "difficulty", difficulties),
+                ):
+                    conn.executemany(
+                        f"""
+                        INSERT INTO {table} VALUES (?, ?, ?)
+                        ON CONFLICT ({column}) DO UPDATE SET
+                            answers = answers + excluded.answers,
+                            correct = correct + excluded.correct
+                        """,
+                        [(k, *v) for k, v in deltas.items()],
+                    )
+                conn.executemany(
+                    """
+                    INSERT INTO question_rollup VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (question_key) DO UPDATE SET
+                        answers = answers + excluded.answers,
+                        correct = correct + excluded.correct,
+                        accuracy = CAST(correct + excluded.correct AS REAL)
+                                   / (answers + excluded.answers)
+                    """,
+                    [
+                        (k, text, qtype, diff, n, c, _ratio(c, n))
+                        for k, (text, qtype, diff, n, c) in questions.items()
+                    ],
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO option_rollup VALUES (?, ?, ?, ?)
+                    ON CONFLICT (question_key, option) DO UPDATE SET
+                        is_correct = MAX(is_correct, excluded.is_correct),
+                        chosen = chosen + excluded.chosen
+                    """,
+                    [(*k, *v) for k, v in options.items()],
+                )
+        return len(result_rows)
+
+    # ---------- reads (dashboard) ----------
+    def user_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT results, answers, correct, score_sum, total_sum, last_at "
+            "FROM user_rollup WHERE user_id = ?", (user_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        results, answers, correct, score_sum, total_sum, last_at = row
+        by_type = {
+            qtype: {"answers": n, "correct": c, "accuracy": _ratio(c, n)}
+            for qtype, n, c in conn.execute(
+                "SELECT question_type, answers, correct FROM user_type_rollup "
+                "WHERE user_id = ?", (user_id,),
+            )
+        }
+        return {
+            "user_id": user_id,
+            "results": results,
+            "answers": answers,
+            "accuracy": _ratio(correct, answers),
+            "mean_score": score_sum / results if results else 0.0,
+            "score_ratio": _ratio(score_sum, total_sum),
+            "last_at": last_at,
+            "by_type": by_type,
+        }
+
+    def _bucket_summary(self, table: str, column: str) -> Dict[str, Dict[str, Any]]:
+        return {
+            key: {"answers": n, "correct": c, "accuracy": _ratio(c, n)}
+            for key, n, c in self._conn().execute(
+                f"SELECT {column}, answers, correct FROM {table}"
+            )
+        }
+
+    def question_type_summary(self) -> Dict[str, Dict[str, Any]]:
+        return self._bucket_summary("type_rollup", "question_type")
+
+    def difficulty_summary(self) -> Dict[str, Dict[str, Any]]:
+        return self._bucket_summary("difficulty_rollup", "difficulty")
+
+    def question_stats(
+        self, limit: int = 20, hardest: bool = True, min_answers: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Per-question observed accuracy, hardest (or easiest) first."""
+        order = "ASC" if hardest else "DESC"
+        rows = self._conn().execute(
+            f"""
+            SELECT question_key, question_text, question_type, difficulty,
+                   answers, correct, accuracy
+            FROM question_rollup
+            WHERE answers >= ?
+            ORDER BY accuracy {order}
+            LIMIT ?
+            """,
+            (min_answers, limit),
+        ).fetchall()
+        cols = ("question_key", "question_text", "question_type", "difficulty",
+                "answers", "correct", "accuracy")
+        return [dict(zip(cols, row)) for row in rows]
+
+    def option_snapshot(self) -> Tuple[List[tuple], List[tuple]]:
+        """
+        All question and option rollups, for warming the calibration index:
+        ([(key, text, difficulty, answers, correct)], [(key, option, is_correct, chosen)]).
+        """
+        conn = self._conn()
+        questions = conn.execute(
+            "SELECT question_key, question_text, difficulty, answers, correct "
+            "FROM question_rollup"
+        ).fetchall()
+        options = conn.execute(
+            "SELECT question_key, option, is_correct, chosen FROM option_rollup"
+        ).fetchall()
+        return questions, options
+
+
+# -------------------------------------------------
+# BATCHED WRITER
+# -------------------------------------------------
+class AnalyticsWriter:
+    """
+    Non-blocking front for AnalyticsStore.write_batch: request handlers
+    enqueue results and a single background thread commits them in batches.
+    """
+
+    def __init__(
+        self,
+        store: AnalyticsStore,
+        batch_size: int = ANALYTICS_BATCH_SIZE,
+        interval: float = ANALYTICS_FLUSH_INTERVAL,
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="analytics", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def record(self, result: Dict[str, Any]) -> None:
+        result = dict(result)
+        result.setdefault("created_at", time.time())
+        self._queue.put(result)
+
+    def record_many(self, results: List[Dict[str, Any]]) -> None:
+        for result in results:
+            self.record(result)
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Block until everything queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _loop(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        waiters: List[threading.Event] = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or waiters or time.monotonic() >= deadline:
+                if batch:
+                    try:
+                        self.store.write_batch(batch)
+                    except Exception as e:
+                        print(f"Analytics write failed ({len(batch)} results): {e}")
+                    batch = []
+                for event in waiters:
+                    event.set()
+                waiters = []
+                deadline = time.monotonic() + self.interval
+
+
+_store: Optional[AnalyticsStore] = None
+_writer: Optional[AnalyticsWriter] = None
+_init_lock = threading.Lock()
+
+
+def get_analytics_store() -> AnalyticsStore:
+    global _store
+    if _store is None:
+        with _init_lock:
+            if _store is None:
+                _store = AnalyticsStore()
+    return _store
+
+
+def get_analytics_writer() -> AnalyticsWriter:
+    global _writer
+    if _writer is None:
+        store = get_analytics_store()
+        with _init_lock:
+            if _writer is None:
+                _writer = AnalyticsWriter(store)
+    return _writer
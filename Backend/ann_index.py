@@ -0,0 +1,596 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding_cache import CACHE_DIR
+from retrieval import normalize_rows, top_k_indices
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+LIBRARY_DIR = os.getenv("LIBRARY_DIR", os.path.join(CACHE_DIR, "library"))
+# Inverted lists; 0 = automatic (about sqrt(rows)).
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+# Lists scanned per query: the recall-vs-latency knob (nprobe >= nlist is exact).
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+# Below this many live rows the library is searched exactly and not trained.
+ANN_MIN_TRAIN = int(os.getenv("ANN_MIN_TRAIN", "4096"))
+# Retrain once the library has grown by this factor since the last training.
+ANN_RETRAIN_GROWTH = float(os.getenv("ANN_RETRAIN_GROWTH", "2"))
+# Filters matching at most this many rows are answered by exact search.
+ANN_EXACT_BELOW = int(os.getenv("ANN_EXACT_BELOW", "20000"))
+# Deleted rows are compacted away once they are this fraction of the file.
+ANN_COMPACT_RATIO = float(os.getenv("ANN_COMPACT_RATIO", "0.3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id     TEXT PRIMARY KEY,
+    course     TEXT NOT NULL,
+    filename   TEXT NOT NULL,
+    num_chunks INTEGER NOT NULL,
+    added_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_course ON documents (course);
+
+-- row = chunk key, never reused by a running index; vectors.f32 holds one
+-- vector per chunk in row order
+CREATE TABLE IF NOT EXISTS chunks (
+    row       INTEGER PRIMARY KEY,
+    doc_id    TEXT NOT NULL,
+    chunk_idx INTEGER NOT NULL,
+    page      INTEGER NOT NULL,
+    list_id   INTEGER NOT NULL,
+    alive     INTEGER NOT NULL,
+    text      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id);
+"""
+
+
+# -------------------------------------------------
+# K-MEANS (spherical: rows and centroids are unit length)
+# -------------------------------------------------
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    """Nearest centroid (max inner product) per row, in blocks to bound memory."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        out[start:start + block] = np.argmax(
+            np.asarray(vectors[start:start + block]) @ centroids.T, axis=1
+        )
+    return out
+
+
+def train_centroids(
+    vectors: np.ndarray, nlist: int, iters: int = 10, sample: int = 64, seed: int = 0
+) -> np.ndarray:
+    """Spherical k-means on a sample of at most `sample` rows per list."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    take = rng.choice(n, size=min(n, nlist * sample), replace=False)
+    x = np.asarray(vectors[np.sort(take)], dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=nlist, replace=False)].copy()
+
+    for _ in range(iters):
+        labels = assign_lists(x, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random sample points.
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def auto_nlist(rows: int) -> int:
+    return int(np.clip(np.sqrt(rows), 16, 4096))
+
+
+# -------------------------------------------------
+# SNAPSHOT (everything a search reads, never mutated once published)
+# -------------------------------------------------
+class _Snapshot:
+    """
+    One consistent view of the library. Row i of every array is the i-th
+    chunk by key (chunks.row) and the i-th vector in `vectors`. Writers
+    build a new snapshot and swap it in; readers take one and use it for
+    the whole search, text lookup included.
+    """
+
+    __slots__ = (
+        "dim", "centroids", "doc_course", "doc_ord", "course_ord", "row_key",
+        "row_doc", "row_course", "row_page", "row_list", "alive", "vectors", "postings",
+    )
+
+    def __init__(
+        self,
+        dim: Optional[int],
+        centroids: Optional[np.ndarray],
+        doc_course: Dict[str, str],
+        doc_ord: Dict[str, int],
+        course_ord: Dict[str, int],
+        row_key: np.ndarray,
+        row_doc: np.ndarray,
+        row_course: np.ndarray,
+        row_page: np.ndarray,
+        row_list: np.ndarray,
+        alive: np.ndarray,
+        vectors: np.ndarray,
+        postings: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ):
+        self.dim = dim
+        self.centroids = centroids
+        self.doc_course = doc_course
+        self.doc_ord = doc_ord
+        self.course_ord = course_ord
+        self.row_key = row_key
+        self.row_doc = row_doc
+        self.row_course = row_course
+        self.row_page = row_page
+        self.row_list = row_list
+        self.alive = alive
+        self.vectors = vectors
+        if postings is None and centroids is not None:
+            # (rows sorted by list, start offset of every list + end)
+            order = np.argsort(row_list, kind="stable").astype(np.int64)
+            bounds = np.searchsorted(row_list[order], np.arange(len(centroids) + 1))
+            postings = (order, bounds)
+        self.postings = postings
+
+    def replace(self, **changes: Any) -> "_Snapshot":
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        if "row_list" in changes or "centroids" in changes:
+            fields["postings"] = None
+        fields.update(changes)
+        return _Snapshot(**fields)
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+
+def _ordinal(table: Dict[str, int], key: str) -> int:
+    if key not in table:
+        table[key] = len(table)
+    return table[key]
+
+
+# -------------------------------------------------
+# LIBRARY INDEX (IVF, flat lists)
+# -------------------------------------------------
+class LibraryIndex:
+    """
+    Persistent IVF vector index over the chunks of a whole course library.
+
+    Vectors are unit-length float32 rows appended to <root>/vectors.f32 and
+    memory-mapped for search; chunk text and metadata (document, course,
+    page, inverted list) live in <root>/library.db. Queries score the
+    `nprobe` nearest centroids' lists only; nprobe >= nlist (or a library
+    below ANN_MIN_TRAIN rows) gives exact search.
+
+    Documents are inserted and deleted incrementally. New rows join the
+    nearest existing list; the centroids are retrained once the library has
+    grown by ANN_RETRAIN_GROWTH. Deletes are tombstones, compacted away once
+    they make up ANN_COMPACT_RATIO of the file.
+
+    Writers are serialized and publish a new _Snapshot with one assignment;
+    a search reads a single snapshot throughout. Chunk keys never change,
+    and compaction writes a new vector file rather than rewriting the one
+    older snapshots have mapped, so a search that overlaps a write still
+    returns the text of the rows it scored.
+    """
+
+    def __init__(self, root: str = LIBRARY_DIR, nlist: int = ANN_NLIST):
+        self.root = root
+        self.nlist_setting = nlist
+        os.makedirs(root, exist_ok=True)
+        self._vectors_path = os.path.join(root, "vectors.f32")
+        self._centroids_path = os.path.join(root, "centroids.npy")
+        self._state_path = os.path.join(root, "state.json")
+        self._db_path = os.path.join(root, "library.db")
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+        self._load()
+
+    # ---------- storage ----------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self) -> None:
+        try:
+            with open(self._state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        dim: Optional[int] = state.get("dim")
+        self.trained_rows = state.get("trained_rows", 0)
+        centroids: Optional[np.ndarray] = None
+        if os.path.exists(self._centroids_path):
+            centroids = np.load(self._centroids_path)
+
+        conn = self._conn()
+        doc_course = dict(conn.execute("SELECT doc_id, course FROM documents").fetchall())
+        rows = conn.execute(
+            "SELECT row, doc_id, page, list_id, alive FROM chunks ORDER BY row"
+        ).fetchall()
+        doc_ord: Dict[str, int] = {}
+        course_ord: Dict[str, int] = {}
+        row_key = np.array([r for r, _, _, _, _ in rows], dtype=np.int64)
+        self._next_key = int(row_key[-1]) + 1 if len(row_key) else 0
+        self._trim_vectors(len(rows), dim)
+        self._snap = _Snapshot(
+            dim=dim,
+            centroids=centroids,
+            doc_course=doc_course,
+            doc_ord=doc_ord,
+            course_ord=course_ord,
+            row_key=row_key,
+            row_doc=np.array([_ordinal(doc_ord, d) for _, d, _, _, _ in rows], dtype=np.int32),
+            row_course=np.array(
+                [_ordinal(course_ord, doc_course.get(d, "")) for _, d, _, _, _ in rows],
+                dtype=np.int32,
+            ),
+            row_page=np.array([p for _, _, p, _, _ in rows], dtype=np.int32),
+            row_list=np.array([l for _, _, _, l, _ in rows], dtype=np.int32),
+            alive=np.array([a for _, _, _, _, a in rows], dtype=bool),
+            vectors=self._open_vectors(len(rows), dim),
+        )
+
+    def _trim_vectors(self, rows: int, dim: Optional[int]) -> None:
+        """Drop vectors appended by an add_document whose insert never committed."""
+        if dim is None and rows:
+            return
+        size = rows * (dim or 0) * 4
+        try:
+            if os.path.getsize(self._vectors_path) > size:
+                os.truncate(self._vectors_path, size)
+        except OSError:
+            pass
+
+    def _save_state(self, dim: Optional[int]) -> None:
+        tmp = f"{self._state_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": dim, "trained_rows": self.trained_rows}, f)
+        os.replace(tmp, self._state_path)
+
+    def _open_vectors(self, rows: int, dim: Optional[int]) -> np.ndarray:
+        if rows == 0 or dim is None:
+            return np.empty((0, dim or 0), dtype=np.float32)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+
+    # ---------- stats ----------
+    def __len__(self) -> int:
+        return int(self._snap.alive.sum())
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._snap.dim
+
+    @property
+    def nlist(self) -> int:
+        return self._snap.nlist
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snap
+        return {
+            "documents": len(snap.doc_course),
+            "rows": len(snap.alive),
+            "live_rows": int(snap.alive.sum()),
+            "dim": snap.dim,
+            "nlist": snap.nlist,
+            "trained_rows": self.trained_rows,
+            "default_nprobe": ANN_NPROBE,
+        }
+
+    def documents(self, course: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT doc_id, course, filename, num_chunks, added_at FROM documents"
+        args: Tuple[Any, ...] = ()
+        if course is not None:
+            sql += " WHERE course = ?"
+            args = (course,)
+        cols = ("doc_id", "course", "filename", "num_chunks", "added_at")
+        return [dict(zip(cols, row)) for row in self._conn().execute(sql + " ORDER BY added_at", args)]
+
+    def has(self, doc_id: str) -> bool:
+        return doc_id in self._snap.doc_course
+
+    # ---------- writes ----------
+    def add_document(
+        self,
+        doc_id: str,
+        chunks: Sequence[str],
+        vectors: np.ndarray,
+        pages: Optional[Sequence[int]] = None,
+        course: str = "",
+        filename: str = "",
+    ) -> int:
+        """Insert (or replace) a document's chunks; returns rows added."""
+        vectors = normalize_rows(vectors)
+        if len(vectors) != len(chunks):
+            raise ValueError(f"{len(vectors)} vectors for {len(chunks)} chunks")
+        if pages is None or len(pages) != len(chunks):
+            pages = [0] * len(chunks)
+
+        with self._write_lock:
+            snap = self._snap
+            dim = snap.dim if snap.dim is not None else int(vectors.shape[1])
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Vector dim {vectors.shape[1]} != library dim {dim}")
+            if doc_id in snap.doc_course:
+                snap = self._remove(snap, doc_id, compact=False)
+
+            m = len(chunks)
+            keys = np.arange(self._next_key, self._next_key + m, dtype=np.int64)
+            lists = (
+                assign_lists(vectors, snap.centroids)
+                if snap.centroids is not None
+                else np.zeros(m, dtype=np.int32)
+            )
+            # Vectors go in first; if the insert fails the file is cut back
+            # so the next document's rows still line up with chunks.row.
+            with open(self._vectors_path, "ab") as f:
+                size = f.tell()
+                try:
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                    f.flush()
+                    conn = self._conn()
+                    with conn:
+                        conn.execute(
+                            "INSERT INTO documents VALUES (?, ?, ?, ?, ?)",
+                            (doc_id, course, filename, m, time.time()),
+                        )
+                        conn.executemany(
+                            "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, 1, ?)",
+                            [
+                                (int(keys[i]), doc_id, i, int(pages[i]), int(lists[i]), chunks[i])
+                                for i in range(m)
+                            ],
+                        )
+                except BaseException:
+                    f.truncate(size)
+                    # A replaced document's removal is already committed.
+                    self._snap = snap
+                    raise
+            self._next_key += m
+
+            doc_ord, course_ord = dict(snap.doc_ord), dict(snap.course_ord)
+            rows = len(snap.alive) + m
+            snap = snap.replace(
+                dim=dim,
+                doc_course={**snap.doc_course, doc_id: course},
+                doc_ord=doc_ord,
+                course_ord=course_ord,
+                row_key=np.concatenate([snap.row_key, keys]),
+                row_doc=np.concatenate([
+                    snap.row_doc, np.full(m, _ordinal(doc_ord, doc_id), np.int32)
+                ]),
+                row_course=np.concatenate([
+                    snap.row_course, np.full(m, _ordinal(course_ord, course), np.int32)
+                ]),
+                row_page=np.concatenate([snap.row_page, np.asarray(pages, np.int32)]),
+                row_list=np.concatenate([snap.row_list, lists]),
+                alive=np.concatenate([snap.alive, np.ones(m, dtype=bool)]),
+                vectors=self._open_vectors(rows, dim),
+            )
+            self._save_state(dim)
+            self._snap = self._maybe_train(snap)
+            return m
+
+    def remove_document(self, doc_id: str) -> bool:
+        with self._write_lock:
+            snap = self._snap
+            if doc_id not in snap.doc_course:
+                return False
+            self._snap = self._remove(snap, doc_id, compact=True)
+            return True
+
+    def _remove(self, snap: _Snapshot, doc_id: str, compact: bool) -> _Snapshot:
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE chunks SET alive = 0 WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        alive = snap.alive.copy()
+        alive[snap.row_doc == snap.doc_ord.get(doc_id)] = False
+        doc_course = dict(snap.doc_course)
+        del doc_course[doc_id]
+        snap = snap.replace(doc_course=doc_course, alive=alive)
+        dead = len(alive) - int(alive.sum())
+        if compact and len(alive) and dead / len(alive) >= ANN_COMPACT_RATIO:
+            snap = self._compact(snap)
+        return snap
+
+    def compact(self) -> None:
+        """Rewrite the vector file without deleted rows."""
+        with self._write_lock:
+            self._snap = self._compact(self._snap)
+
+    def _compact(self, snap: _Snapshot) -> _Snapshot:
+        keep = np.flatnonzero(snap.alive)
+        # The old file is replaced, not rewritten: snapshots that still map
+        # it keep reading their own vectors.
+        tmp = f"{self._vectors_path}.tmp"
+        with open(tmp, "wb") as f:
+            for start in range(0, len(keep), 8192):
+                f.write(np.asarray(snap.vectors[keep[start:start + 8192]]).tobytes())
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM chunks WHERE alive = 0")
+        os.replace(tmp, self._vectors_path)
+        return snap.replace(
+            row_key=snap.row_key[keep],
+            row_doc=snap.row_doc[keep],
+            row_course=snap.row_course[keep],
+            row_page=snap.row_page[keep],
+            row_list=snap.row_list[keep],
+            alive=np.ones(len(keep), dtype=bool),
+            vectors=self._open_vectors(len(keep), snap.dim),
+            postings=None,
+        )
+
+    def _maybe_train(self, snap: _Snapshot) -> _Snapshot:
+        live = int(snap.alive.sum())
+        if live < ANN_MIN_TRAIN:
+            return snap
+        if snap.centroids is None or live >= self.trained_rows * ANN_RETRAIN_GROWTH:
+            return self._train(snap)
+        return snap
+
+    def train(self, nlist: Optional[int] = None) -> None:
+        """(Re)train the centroids on the live rows and reassign every row."""
+        with self._write_lock:
+            self._snap = self._train(self._snap, nlist)
+
+    def _train(self, snap: _Snapshot, nlist: Optional[int] = None) -> _Snapshot:
+        live = np.flatnonzero(snap.alive)
+        if len(live) == 0:
+            return snap
+        nlist = nlist or self.nlist_setting or auto_nlist(len(live))
+        nlist = min(nlist, len(live))
+        centroids = train_centroids(snap.vectors[live], nlist)
+        lists = assign_lists(snap.vectors, centroids)
+
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "UPDATE chunks SET list_id = ? WHERE row = ?",
+                [(int(l), int(key)) for l, key in zip(lists, snap.row_key)],
+            )
+        np.save(self._centroids_path, centroids)
+        self.trained_rows = len(live)
+        self._save_state(snap.dim)
+        return snap.replace(centroids=centroids, row_list=lists)
+
+    # ---------- reads ----------
+    @staticmethod
+    def _filter_mask(
+        snap: _Snapshot,
+        course: Optional[str],
+        doc_ids: Optional[Iterable[str]],
+        page_range: Optional[Tuple[Optional[int], Optional[int]]],
+    ) -> np.ndarray:
+        mask = snap.alive
+        if course is not None:
+            ordinal = snap.course_ord.get(course, -1)
+            mask = mask & (snap.row_course == ordinal)
+        if doc_ids is not None:
+            ordinals = [snap.doc_ord[d] for d in doc_ids if d in snap.doc_ord]
+            mask = mask & np.isin(snap.row_doc, ordinals)
+        if page_range is not None:
+            lo, hi = page_range
+            if lo is not None:
+                mask = mask & (snap.row_page >= lo)
+            if hi is not None:
+                mask = mask & (snap.row_page <= hi)
+        return mask
+
+    def search_rows(
+        self,
+        query: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        course: Optional[str] = None,
+        doc_ids: Optional[Iterable[str]] = None,
+        page_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, scores) for one query vector, best first."""
+        return self._search_rows(self._snap, query, k, nprobe, course, doc_ids, page_range)
+
+    def _search_rows(
+        self,
+        snap: _Snapshot,
+        query: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        course: Optional[str] = None,
+        doc_ids: Optional[Iterable[str]] = None,
+        page_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if len(snap.alive) == 0 or snap.dim is None:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        q = normalize_rows(query)[0]
+        mask = self._filter_mask(snap, course, doc_ids, page_range)
+        matching = int(mask.sum())
+        nprobe = ANN_NPROBE if nprobe is None else nprobe
+
+        exact = (
+            snap.centroids is None
+            or nprobe >= snap.nlist
+            or (matching <= ANN_EXACT_BELOW and matching < len(snap.alive))
+        )
+        candidates = None
+        if not exact:
+            order, bounds = snap.postings
+            probe = top_k_indices(snap.centroids @ q, nprobe)
+            candidates = np.concatenate([order[bounds[l]:bounds[l + 1]] for l in probe])
+            candidates = np.sort(candidates[mask[candidates]])
+            if len(candidates) < k:
+                candidates = None
+        if candidates is None:
+            candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+
+        scores = np.asarray(snap.vectors[candidates]) @ q
+        top = top_k_indices(scores, k)
+        return candidates[top], scores[top]
+
+    def search(self, query: np.ndarray, k: int = 5, **filters: Any) -> List[Dict[str, Any]]:
+        """Top-k hits with text and metadata; see search_rows for filters."""
+        snap = self._snap
+        rows, scores = self._search_rows(snap, query, k, **filters)
+        if len(rows) == 0:
+            return []
+        keys = snap.row_key[rows].tolist()
+        placeholders = ",".join("?" * len(keys))
+        found = {
+            r[0]: r[1:]
+            for r in self._conn().execute(
+                f"SELECT row, doc_id, chunk_idx, page, text FROM chunks WHERE row IN ({placeholders})",
+                keys,
+            )
+        }
+        hits = []
+        for key, score in zip(keys, scores.tolist()):
+            if key not in found:
+                continue  # document removed and compacted since the snapshot
+            doc_id, chunk_idx, page, text = found[key]
+            hits.append({
+                "doc_id": doc_id,
+                "course": snap.doc_course.get(doc_id, ""),
+                "chunk_idx": chunk_idx,
+                "page": page,
+                "score": score,
+                "text": text,
+            })
+        return hits
+
+
+_library: Optional[LibraryIndex] = None
+_library_lock = threading.Lock()
+
+
+def get_library_index() -> LibraryIndex:
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                _library = LibraryIndex()
+    return _library
@@ -1,19 +1,42 @@
-import os
 import json
-from flask import Flask, request, jsonify
-import tempfile
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from feedback import generate_feedback_from_result, normalize_to_feedback_json
+from feedback import (
+    compute_batch_stats,
+    generate_feedback_from_result,
+    iter_batch_feedback,
+    normalize_to_feedback_json,
+    split_results,
+)
 
-import numpy as np
 from dotenv import load_dotenv
-from pptx import Presentation
-import docx2txt
-import PyPDF2
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-import requests
 
-from rag import extract_text, build_index, retrieve_top_k, call_gemini
+from analytics import get_analytics_store, get_analytics_writer
+from calibration import get_calibration_index
+from jobs import JobQueue, make_job_store
+from metrics import (
+    METRICS_TIMING_HEADER,
+    REGISTRY,
+    http_responses,
+    http_seconds,
+    pop_request_timings,
+    server_timing_header,
+    start_request_timings,
+)
+from ann_index import get_library_index
+from context_packer import ContextStats
+from mcq_pipeline import (
+    PipelineError,
+    add_to_library,
+    open_document,
+    retrieve_context,
+    run_library_pipeline,
+    run_mcq_job,
+    run_mcq_pipeline,
+    stream_mcqs,
+)
+from uploads import UPLOAD_MAX_BYTES, Upload, UploadRequest
 
 # ------------------------------------
 # Flask App + Env
@@ -22,107 +45,159 @@ app = Flask(__name__)
 CORS(app)
 load_dotenv()
 
+# Uploads stream into per-request buffers (hashed on the way in); bodies
+# over UPLOAD_MAX_BYTES are refused with 413.
+app.request_class = UploadRequest
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"error": f"Upload exceeds {UPLOAD_MAX_BYTES} bytes"}), 413
+
+
+# ------------------------------------
+# Metrics: request latency + optional Server-Timing breakdown
+# ------------------------------------
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    if METRICS_TIMING_HEADER or request.headers.get("X-Debug-Timing") == "1":
+        start_request_timings()
+
+
+@app.after_request
+def finish_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    http_seconds.observe(time.perf_counter() - g.request_start, endpoint, request.method)
+    http_responses.inc(1, endpoint, str(response.status_code))
+    timings = pop_request_timings()
+    if timings:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+def read_mcq_form():
+    """Pull /generate_mcq inputs out of the request (the file stays in its upload buffer)."""
+    params = {
+        "num_questions": int(request.form.get("num_questions", 10)),
+        "user_focus": request.form.get("user_focus", "").strip(),
+        "doc_id": request.form.get("doc_id", "").strip(),
+    }
+    if "file" in request.files:
+        params["upload"] = Upload.from_file_storage(request.files["file"])
+    return params
+
 
 @app.route("/generate_mcq", methods=["POST"])
 def generate_mcq():
-    if "file" not in request.files:
-        return jsonify({"error": "No file uploaded"}), 400
-
-    # inputs from frontend
-    num_questions = int(request.form.get("num_questions", 10))
-    user_focus = request.form.get("user_focus", "").strip()
+    try:
+        result = run_mcq_pipeline(**read_mcq_form())
+    except PipelineError as e:
+        return jsonify(e.payload), e.status
+    print(result["mcqs"])
+    return jsonify(result)
 
-    uploaded = request.files["file"]
-    ext = uploaded.filename.split(".")[-1].lower()
 
-    # save temp file
-    tmp_path = f"temp_uploaded.{ext}"
-    uploaded.save(tmp_path)
+# ---------------------------------------------------------
+# STREAMING MODE: one server-sent event per finished question
+# ---------------------------------------------------------
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    # 1️⃣ extract text
-    text = extract_text(tmp_path, ext)
-    if not text:
-        return jsonify({"error": "Could not extract text"}), 500
 
-    # 2️⃣ chunking
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1500,
-        chunk_overlap=200
-    )
-    chunks = splitter.split_text(text)
+@app.route("/generate_mcq/stream", methods=["POST"])
+def generate_mcq_stream():
+    """
+    Events: `meta` (doc_id, context token stats), `question` (one per MCQ,
+    as soon as it is complete), then `done` (count) or `error`.
+    """
+    params = read_mcq_form()
+    num_questions = params.pop("num_questions")
+    user_focus = params.pop("user_focus")
 
-    # 3️⃣ build embeddings + index
-    indexed_chunks, embeddings = build_index(chunks)
+    # Indexing and retrieval errors still get a normal JSON status code.
+    try:
+        doc_id, chunks, index, lexical = open_document(**params)
+        stats = ContextStats()
+        context = retrieve_context(chunks, index, num_questions, user_focus, lexical, stats)
+    except PipelineError as e:
+        return jsonify(e.payload), e.status
 
-    # 4️⃣ retrieval query generation
-    if user_focus:
-        query = (
-            f"Key concepts related to: {user_focus}. "
-            f"Use this context to generate {num_questions} meaningful MCQs."
-        )
-    else:
-        query = (
-            f"Key concepts that are most important in the uploaded document "
-            f"for generating {num_questions} simple, meaningful MCQs."
+    def events():
+        yield sse_event(
+            "meta",
+            {"doc_id": doc_id, "num_questions": num_questions, "context": stats.as_dict()},
         )
+        count = 0
+        try:
+            for question, details in stream_mcqs(context, num_questions):
+                count += 1
+                yield sse_event("question", {"question": question, **details})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e), "count": count})
+            return
+        yield sse_event("done", {"count": count})
 
-    # 5️⃣ retrieve top chunks
-    retrieved_chunks = retrieve_top_k(
-        query, indexed_chunks, embeddings, k=5
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    if not retrieved_chunks:
-        return jsonify({"error": "RAG retrieval failed"}), 500
-
-    context_text = "\n\n".join(retrieved_chunks)
-
-    # 6️⃣ FULL PROMPT ENGINEERING
-    prompt = f"""
-You are an expert educational AI system. Your task is to generate multiple-choice questions (MCQs)
-based ONLY on the retrieved context below.
-
-### Retrieved Context:
-{context_text}
-
-### Instructions:
-- Generate **{num_questions}** simple, meaningful MCQs that test understanding.
-- Each question must have exactly 4 options and ONE correct answer.
-- Assign difficulty level:
-  - "Easy": recall
-  - "Medium": understanding
-  - "Hard": reasoning
-- Use only information inside the retrieved context.
-- STRICTLY return JSON in this format:
-
-{{
-  "Question text 1": {{
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_option": "Correct Option Text",
-    "difficulty": "Easy | Medium | Hard"
-  }},
-  "Question text 2": {{
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_option": "Correct Option Text",
-    "difficulty": "Easy | Medium | Hard"
-  }}
-}}
-"""
-
-    # 7️⃣ LLM call
-    raw_output = call_gemini(prompt)
-
-    cleaned = raw_output.strip()
-    if cleaned.startswith("```json"):
-        cleaned = cleaned[7:]
-    if cleaned.endswith("```"):
-        cleaned = cleaned[:-3]
 
-    try:
-        mcqs = json.loads(cleaned)
-    except:
-        return jsonify({"error": "LLM returned invalid JSON", "raw": raw_output}), 500
-    print(mcqs)
-    return jsonify({"mcqs": mcqs})
+# ---------------------------------------------------------
+# JOB MODE: submit, then poll / long-poll for the result
+# ---------------------------------------------------------
+job_queue = JobQueue(make_job_store())
+
+
+def job_status(job):
+    body = {k: job[k] for k in ("id", "kind", "status", "created_at",
+                                "started_at", "finished_at")}
+    body["result_url"] = f"/jobs/{job['id']}/result"
+    return body
+
+
+@app.route("/jobs/generate_mcq", methods=["POST"])
+def submit_generate_mcq():
+    params = read_mcq_form()
+    if "upload" not in params and not params["doc_id"]:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    # The job runs after this request ends, so it takes over the upload buffer.
+    if "upload" in params:
+        params["upload"].keep()
+    job_id = job_queue.submit("generate_mcq", run_mcq_job, **params)
+    return jsonify(job_status(job_queue.get(job_id))), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    # ?wait=N long-polls for up to N seconds (capped at 60)
+    wait = min(request.args.get("wait", 0.0, type=float), 60.0)
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job_status(job)), 200
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def get_job_result(job_id):
+    wait = min(request.args.get("wait", 0.0, type=float), 60.0)
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    if job["status"] == "done":
+        return jsonify(job["result"]), 200
+    if job["status"] == "failed":
+        return jsonify(job["error"]), job["http_status"] or 500
+    return jsonify(job_status(job)), 202
 
 @app.route("/generate_feedback", methods=["POST"])
 def generate_feedback_route():
@@ -131,6 +206,11 @@ def generate_feedback_route():
         if not data:
             return jsonify({"error": "No result JSON received"}), 400
 
+        # Calibration counts update inline; the analytics write is queued.
+        # (The index warms from the DB on first use, so it must come first.)
+        get_calibration_index().record_result(data)
+        get_analytics_writer().record(data)
+
         # Raw Gemini text (not guaranteed to be JSON)
         feedback_raw = generate_feedback_from_result(data)
         print("\n================ RAW GEMINI FEEDBACK ================")
@@ -148,6 +228,181 @@ def generate_feedback_route():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/generate_feedback/batch", methods=["POST"])
+def generate_feedback_batch_route():
+    """
+    Body: {"results": [<result JSON>, ...]} (or a bare list).
+    Returns per-student feedback + stats and class-level aggregates.
+    With ?stream=1 the response is SSE: one `student` event per student as
+    its group finishes, then `class` and `done`.
+    Malformed results are left out of the stats, calibration, analytics and
+    feedback, and listed under `skipped` (an SSE event when streaming).
+    """
+    data = request.get_json(silent=True)
+    results = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(results, list) or not results:
+        return jsonify({"error": "No result JSON list received"}), 400
+    valid, skipped = split_results(results)
+    if not valid:
+        return jsonify({"error": "No valid result JSON received", "skipped": skipped}), 400
+    usable = [results[i] for i in valid]
+
+    try:
+        per_student, class_stats = compute_batch_stats(usable)
+        calibration = get_calibration_index()
+        for result in usable:
+            calibration.record_result(result)
+        get_analytics_writer().record_many(usable)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    def student_entry(j, feedback):
+        return {
+            "index": valid[j],
+            "userID": usable[j].get("userID"),
+            "stats": per_student[j],
+            "feedback": feedback,
+        }
+
+    if request.args.get("stream") == "1":
+        def events():
+            if skipped:
+                yield sse_event("skipped", skipped)
+            try:
+                for j, feedback in iter_batch_feedback(usable):
+                    yield sse_event("student", student_entry(j, feedback))
+            except Exception as e:
+                yield sse_event("error", {"error": str(e)})
+                return
+            yield sse_event("class", class_stats)
+            yield sse_event("done", {"count": len(usable)})
+
+        return Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        students = [None] * len(usable)
+        for j, feedback in iter_batch_feedback(usable):
+            students[j] = student_entry(j, feedback)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"students": students, "class": class_stats, "skipped": skipped}), 200
+
+
+# ---------------------------------------------------------
+# ANALYTICS: dashboard reads, served from the rollup tables
+# ---------------------------------------------------------
+@app.route("/analytics/users/<user_id>", methods=["GET"])
+def analytics_user(user_id):
+    summary = get_analytics_store().user_summary(user_id)
+    if summary is None:
+        return jsonify({"error": "No results for this user"}), 404
+    return jsonify(summary), 200
+
+
+@app.route("/analytics/question_types", methods=["GET"])
+def analytics_question_types():
+    return jsonify(get_analytics_store().question_type_summary()), 200
+
+
+@app.route("/analytics/difficulty", methods=["GET"])
+def analytics_difficulty():
+    return jsonify(get_analytics_store().difficulty_summary()), 200
+
+
+@app.route("/analytics/questions", methods=["GET"])
+def analytics_questions():
+    # ?order=hardest|easiest&limit=N&min_answers=N
+    limit = max(1, min(request.args.get("limit", 20, type=int), 500))
+    min_answers = max(1, request.args.get("min_answers", 5, type=int))
+    hardest = request.args.get("order", "hardest") != "easiest"
+    return jsonify(get_analytics_store().question_stats(limit, hardest, min_answers)), 200
+
+
+@app.route("/analytics/calibration", methods=["GET", "POST"])
+def analytics_calibration():
+    """
+    GET: questions whose observed difficulty disagrees with the LLM's label
+    or that have bad distractors (?limit=N).
+    POST {"questions": [text, ...]}: calibration for specific questions.
+    """
+    index = get_calibration_index()
+    if request.method == "GET":
+        limit = max(1, min(request.args.get("limit", 50, type=int), 500))
+        return jsonify(index.flagged(limit)), 200
+
+    data = request.get_json(silent=True) or {}
+    questions = data.get("questions")
+    if not isinstance(questions, list):
+        return jsonify({"error": "Expected {\"questions\": [...]}"}), 400
+    return jsonify({str(q): index.lookup(str(q)) for q in questions}), 200
+
+
+# ---------------------------------------------------------
+# COURSE LIBRARY: documents indexed together for cross-document MCQs
+# ---------------------------------------------------------
+@app.route("/library/documents", methods=["GET", "POST"])
+def library_documents():
+    """
+    GET ?course=...: documents in the library.
+    POST (multipart): file or doc_id, plus course; adds it to the library.
+    """
+    if request.method == "GET":
+        course = request.args.get("course")
+        library = get_library_index()
+        return jsonify({"documents": library.documents(course), "stats": library.stats()}), 200
+
+    params = read_mcq_form()
+    try:
+        result = add_to_library(
+            request.form.get("course", "").strip(), params["doc_id"], params.get("upload")
+        )
+    except PipelineError as e:
+        return jsonify(e.payload), e.status
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 200
+
+
+@app.route("/library/documents/<doc_id>", methods=["DELETE"])
+def library_remove_document(doc_id):
+    if not get_library_index().remove_document(doc_id):
+        return jsonify({"error": "Document is not in the library"}), 404
+    return jsonify({"doc_id": doc_id, "removed": True}), 200
+
+
+@app.route("/library/generate_mcq", methods=["POST"])
+def library_generate_mcq():
+    """
+    JSON: num_questions, user_focus, and optional filters course, doc_ids,
+    page_from, page_to, plus nprobe (higher = better recall, slower).
+    """
+    data = request.get_json(silent=True) or {}
+
+    def optional_int(key):
+        return None if data.get(key) is None else int(data[key])
+
+    try:
+        page_range = None
+        if data.get("page_from") is not None or data.get("page_to") is not None:
+            page_range = (optional_int("page_from"), optional_int("page_to"))
+        result = run_library_pipeline(
+            int(data.get("num_questions", 10)),
+            str(data.get("user_focus", "")).strip(),
+            course=data.get("course"),
+            doc_ids=data.get("doc_ids"),
+            page_range=page_range,
+            nprobe=optional_int("nprobe"),
+        )
+    except PipelineError as e:
+        return jsonify(e.payload), e.status
+    except (TypeError, ValueError):
+        return jsonify({"error": "num_questions, page_from, page_to and nprobe must be integers"}), 400
+    return jsonify(result), 200
+
 # ---------------------------------------------------------
 # RUN SERVER
 # ---------------------------------------------------------
@@ -0,0 +1,421 @@
+import os
+import json
+import time
+import asyncio
+import warnings
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import RequestEntityTooLarge
+
+with warnings.catch_warnings():
+    # Deprecated in favour of a2wsgi, which is not a dependency here.
+    warnings.simplefilter("ignore")
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import auth
+from app import app as flask_app
+from analytics import get_analytics_writer
+from calibration import get_calibration_index
+from context_packer import ContextStats
+from feedback import (
+    compute_batch_stats,
+    generate_feedback_from_result_async,
+    iter_batch_feedback_async,
+    normalize_to_feedback_json,
+    split_results,
+)
+from gemini_client import close_async_client
+from mcq_pipeline import (
+    PipelineError,
+    open_document,
+    retrieve_context_async,
+    run_mcq_pipeline_async,
+    stream_mcqs_async,
+)
+from metrics import REGISTRY, http_responses, http_seconds
+from uploads import UPLOAD_MAX_BYTES, Upload
+
+# ------------------------------------
+# ASGI SERVING MODE
+# One event loop serves the MCQ, feedback and auth routes: a request that
+# waits on Gemini holds a socket on the async client, not a thread. Work
+# that needs a CPU (document parsing, chunking, retrieval, stats) runs on
+# the CPU pool below and bcrypt on auth's hash pool. Every other route
+# (jobs, analytics, library) is served by the Flask app behind it.
+# Needs the packages in requirements-asgi.txt.
+#
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+# ------------------------------------
+load_dotenv()
+
+ASGI_HOST = os.getenv("ASGI_HOST", "127.0.0.1")
+ASGI_PORT = int(os.getenv("ASGI_PORT", "5000"))
+# Threads for parsing, retrieval and stats. Some of that work waits on
+# SQLite or the index store, so a few more than there are cores.
+ASGI_CPU_WORKERS = int(os.getenv("ASGI_CPU_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+# Origins allowed to send the session cookie (the frontend fetches with
+# credentials: "include"): a comma-separated list, or by default any
+# localhost port, as the dev server uses.
+ASGI_CORS_ORIGINS = [o.strip() for o in os.getenv("ASGI_CORS_ORIGINS", "").split(",") if o.strip()]
+ASGI_CORS_ORIGIN_REGEX = None if ASGI_CORS_ORIGINS else r"https?://(localhost|127\.0\.0\.1)(:\d+)?"
+
+_cpu_pool = ThreadPoolExecutor(max_workers=ASGI_CPU_WORKERS, thread_name_prefix="asgi-cpu")
+
+
+async def run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_cpu_pool, fn, *args)
+
+
+def error(message: str, status: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ------------------------------------
+# Metrics: request latency by route
+# ------------------------------------
+class RequestMetrics:
+    """Records smartedu_http_* for the async routes, as app.py does for Flask."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            # Requests for the mounted Flask app are recorded by app.py.
+            if not isinstance(route, Mount):
+                endpoint = getattr(route, "path", "unmatched")
+                http_seconds.observe(time.perf_counter() - start, endpoint, scope["method"])
+                http_responses.inc(1, endpoint, str(status[0]))
+
+
+async def metrics_route(request: Request) -> Response:
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# ------------------------------------
+# MCQ routes
+# ------------------------------------
+async def read_mcq_form(request: Request) -> Dict[str, Any]:
+    """
+    /generate_mcq inputs. The file Starlette has already spooled is used in
+    place, so the form is left open: closing the Upload closes the file.
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > UPLOAD_MAX_BYTES:
+        raise RequestEntityTooLarge()
+    form = await request.form(max_files=1)
+    try:
+        try:
+            num_questions = int(form.get("num_questions") or 10)
+        except ValueError:
+            raise PipelineError("num_questions must be an integer", 400) from None
+        params: Dict[str, Any] = {
+            "num_questions": num_questions,
+            "user_focus": str(form.get("user_focus", "")).strip(),
+            "doc_id": str(form.get("doc_id", "")).strip(),
+        }
+        file = form.get("file")
+        if file is not None and not isinstance(file, str):
+            params["upload"] = await run_cpu(Upload.from_spooled, file.file, file.filename or "")
+    except BaseException:
+        await form.close()
+        raise
+    return params
+
+
+async def generate_mcq(request: Request) -> Response:
+    try:
+        params = await read_mcq_form(request)
+    except PipelineError as e:
+        return JSONResponse(e.payload, status_code=e.status)
+    upload: Optional[Upload] = params.get("upload")
+    try:
+        result = await run_mcq_pipeline_async(executor=_cpu_pool, **params)
+    except PipelineError as e:
+        return JSONResponse(e.payload, status_code=e.status)
+    finally:
+        if upload is not None:
+            upload.close()
+    return JSONResponse(result)
+
+
+async def generate_mcq_stream(request: Request) -> Response:
+    """Same events as the Flask route: meta, question..., then done or error."""
+    try:
+        params = await read_mcq_form(request)
+    except PipelineError as e:
+        return JSONResponse(e.payload, status_code=e.status)
+    num_questions = params.pop("num_questions")
+    user_focus = params.pop("user_focus")
+    upload: Optional[Upload] = params.get("upload")
+
+    try:
+        doc_id, chunks, index, lexical = await run_cpu(
+            open_document, params["doc_id"], upload
+        )
+        stats = ContextStats()
+        context = await retrieve_context_async(
+            chunks, index, num_questions, user_focus, lexical, stats, _cpu_pool
+        )
+    except PipelineError as e:
+        return JSONResponse(e.payload, status_code=e.status)
+    finally:
+        if upload is not None:
+            upload.close()
+
+    async def events():
+        yield sse_event(
+            "meta",
+            {"doc_id": doc_id, "num_questions": num_questions, "context": stats.as_dict()},
+        )
+        count = 0
+        try:
+            async for question, details in stream_mcqs_async(context, num_questions):
+                count += 1
+                yield sse_event("question", {"question": question, **details})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e), "count": count})
+            return
+        yield sse_event("done", {"count": count})
+
+    return sse_response(events())
+
+
+# ------------------------------------
+# Feedback routes
+# ------------------------------------
+async def read_json(request: Request) -> Any:
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def record_results(results) -> None:
+    """Calibration counts inline, analytics write queued (as in app.py)."""
+    calibration = get_calibration_index()
+    for result in results:
+        calibration.record_result(result)
+    get_analytics_writer().record_many(results)
+
+
+async def generate_feedback_route(request: Request) -> Response:
+    data = await read_json(request)
+    if not data:
+        return error("No result JSON received", 400)
+    try:
+        await run_cpu(record_results, [data])
+        feedback_raw = await generate_feedback_from_result_async(data)
+        return JSONResponse({"feedback": normalize_to_feedback_json(feedback_raw)})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def generate_feedback_batch_route(request: Request) -> Response:
+    """Body, ?stream=1 and skipped results behave as the Flask route."""
+    data = await read_json(request)
+    results = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(results, list) or not results:
+        return error("No result JSON list received", 400)
+    valid, skipped = split_results(results)
+    if not valid:
+        return JSONResponse(
+            {"error": "No valid result JSON received", "skipped": skipped}, status_code=400
+        )
+    usable = [results[i] for i in valid]
+
+    try:
+        per_student, class_stats = await run_cpu(compute_batch_stats, usable)
+        await run_cpu(record_results, usable)
+    except Exception as e:
+        return error(str(e), 500)
+
+    def student_entry(j, feedback):
+        return {
+            "index": valid[j],
+            "userID": usable[j].get("userID"),
+            "stats": per_student[j],
+            "feedback": feedback,
+        }
+
+    if request.query_params.get("stream") == "1":
+        async def events():
+            if skipped:
+                yield sse_event("skipped", skipped)
+            try:
+                async for j, feedback in iter_batch_feedback_async(usable):
+                    yield sse_event("student", student_entry(j, feedback))
+            except Exception as e:
+                yield sse_event("error", {"error": str(e)})
+                return
+            yield sse_event("class", class_stats)
+            yield sse_event("done", {"count": len(usable)})
+
+        return sse_response(events())
+
+    try:
+        students = [None] * len(usable)
+        async for j, feedback in iter_batch_feedback_async(usable):
+            students[j] = student_entry(j, feedback)
+    except Exception as e:
+        return error(str(e), 500)
+    return JSONResponse({"students": students, "class": class_stats, "skipped": skipped})
+
+
+# ------------------------------------
+# Auth routes (sessions are signed cookies, as with Flask's)
+# ------------------------------------
+async def read_credentials(request: Request):
+    data = await read_json(request)
+    if not isinstance(data, dict):
+        return None, None
+    return data.get("username"), data.get("password")
+
+
+async def signup(request: Request) -> Response:
+    username, password = await read_credentials(request)
+    if not username or not password:
+        return error("Username and password required", 400)
+
+    if await run_cpu(auth.user_exists, username):
+        return error("Username already exists", 400)
+    try:
+        hashed_pw = await auth.hash_password_async(password)
+    except auth.AuthBusy:
+        return error("Server busy, please retry", 503)
+
+    try:
+        await run_cpu(auth.insert_user, username, hashed_pw)
+    except DuplicateKeyError:
+        auth.user_exists_cache.set(username, True)
+        return error("Username already exists", 400)
+    auth.user_exists_cache.set(username, True)
+    return JSONResponse({"message": "User created successfully"}, status_code=201)
+
+
+async def login(request: Request) -> Response:
+    username, password = await read_credentials(request)
+    if not username or not password:
+        return error("Username and password required", 400)
+
+    user = await run_cpu(auth.find_user, username)
+    try:
+        valid = await auth.verify_user_password_async(password, user)
+    except auth.AuthBusy:
+        return error("Server busy, please retry", 503)
+
+    if not valid:
+        return error("Invalid username or password", 401)
+    if auth.needs_rehash(user["password"]):
+        try:
+            hashed_pw = await auth.hash_password_async(password)
+            await run_cpu(
+                auth.users_col.update_one,
+                {"username": username},
+                {"$set": {"password": hashed_pw}},
+            )
+        except auth.AuthBusy:
+            pass  # upgrade on a later login
+    request.session["username"] = username
+    return JSONResponse({"message": "Login successful", "username": username})
+
+
+async def logout(request: Request) -> Response:
+    request.session.clear()
+    return JSONResponse({"message": "Logged out successfully"})
+
+
+async def check_auth(request: Request) -> Response:
+    if "username" in request.session:
+        return JSONResponse({"authenticated": True, "username": request.session["username"]})
+    return JSONResponse({"authenticated": False})
+
+
+# ------------------------------------
+# App
+# ------------------------------------
+async def upload_too_large(request: Request, exc: Exception) -> Response:
+    return error(f"Upload exceeds {UPLOAD_MAX_BYTES} bytes", 413)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    yield
+    await close_async_client()
+    _cpu_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route("/metrics", metrics_route, methods=["GET"]),
+        Route("/generate_mcq", generate_mcq, methods=["POST"]),
+        Route("/generate_mcq/stream", generate_mcq_stream, methods=["POST"]),
+        Route("/generate_feedback", generate_feedback_route, methods=["POST"]),
+        Route("/generate_feedback/batch", generate_feedback_batch_route, methods=["POST"]),
+        Route("/signup", signup, methods=["POST"]),
+        Route("/login", login, methods=["POST"]),
+        Route("/logout", logout, methods=["POST"]),
+        Route("/check_auth", check_auth, methods=["GET"]),
+        # Jobs, analytics and the course library stay on Flask (threads).
+        Mount("/", WSGIMiddleware(flask_app)),
+    ],
+    middleware=[
+        Middleware(RequestMetrics),
+        Middleware(
+            CORSMiddleware,
+            allow_origins=ASGI_CORS_ORIGINS,
+            allow_origin_regex=ASGI_CORS_ORIGIN_REGEX,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        ),
+        Middleware(SessionMiddleware, secret_key=auth.app.secret_key),
+    ],
+    exception_handlers={RequestEntityTooLarge: upload_too_large},
+    lifespan=lifespan,
+)
+
+
+# ---------------------------------------------------------
+# RUN SERVER
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=ASGI_HOST, port=ASGI_PORT)
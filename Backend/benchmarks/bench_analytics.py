@@ -0,0 +1,92 @@
+"""
+Analytics store benchmark: bulk-load synthetic graded results, then time
+the dashboard reads (all served from the rollup tables).
+
+Run from Backend/:
+    python benchmarks/bench_analytics.py [--answers 1000000] [--users 5000]
+
+Needs GEMINI_API_KEY set (any value) because analytics imports feedback.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analytics import AnalyticsStore  # noqa: E402
+from feedback import QUESTION_TYPES  # noqa: E402
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+
+def make_result(rng: random.Random, user: int, bank: int, per_result: int):
+    result = {"userID": f"user-{user}", "score": 0, "total_questions": per_result}
+    for qtype in QUESTION_TYPES:
+        result[qtype] = {}
+    for _ in range(per_result):
+        q = rng.randrange(bank)
+        correct = rng.random() < 0.4 + 0.5 * (q % 7) / 7
+        result["score"] += correct
+        qtype = QUESTION_TYPES[q % len(QUESTION_TYPES)]
+        result[qtype][f"Question number {q} about topic {q % 97}?"] = {
+            "is_correct": correct,
+            "chosen_option": "A",
+            "difficulty": DIFFICULTIES[q % 3],
+        }
+    return result
+
+
+def timed_ms(fn, repeat: int = 50) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answers", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--bank", type=int, default=20000, help="distinct questions")
+    parser.add_argument("--per-result", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=500, help="results per write batch")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnalyticsStore(os.path.join(tmp, "analytics.db"))
+        n_results = args.answers // args.per_result
+
+        start = time.perf_counter()
+        for offset in range(0, n_results, args.batch):
+            batch = [
+                make_result(rng, rng.randrange(args.users), args.bank, args.per_result)
+                for _ in range(min(args.batch, n_results - offset))
+            ]
+            store.write_batch(batch)
+        load = time.perf_counter() - start
+        print(f"loaded {n_results} results / {n_results * args.per_result} answers "
+              f"in {load:.1f}s ({n_results * args.per_result / load:,.0f} answers/s)")
+
+        user = "user-1"
+        print(f"user_summary          {timed_ms(lambda: store.user_summary(user)):7.3f} ms")
+        print(f"question_type_summary {timed_ms(store.question_type_summary):7.3f} ms")
+        print(f"difficulty_summary    {timed_ms(store.difficulty_summary):7.3f} ms")
+        print(f"question_stats(20)    {timed_ms(lambda: store.question_stats(20)):7.3f} ms")
+        print(f"question_stats(easy)  "
+              f"{timed_ms(lambda: store.question_stats(20, hardest=False)):7.3f} ms")
+
+        # What the rollups replace: a scan over every stored answer.
+        conn = store._conn()
+        scan = timed_ms(lambda: conn.execute(
+            "SELECT question_type, COUNT(*), SUM(is_correct) FROM answers "
+            "GROUP BY question_type").fetchall(), repeat=3)
+        print(f"full scan by type      {scan:7.1f} ms  (for comparison)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Library ANN index vs exact search: query latency and recall@k across nprobe,
+plus insert / delete / filtered-search timings.
+
+Vectors are synthetic and clustered (like chunks from many documents on a
+handful of topics), so IVF recall is realistic rather than best-case.
+
+Run from Backend/:
+    python benchmarks/bench_ann.py [--rows 100000] [--dim 256] [--queries 200]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import LibraryIndex  # noqa: E402
+from retrieval import VectorIndex, normalize_rows  # noqa: E402
+
+
+def clustered(n: int, dim: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    labels = rng.integers(0, topics, n)
+    return normalize_rows(centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered(args.rows, args.dim, args.topics, rng)
+    queries = clustered(args.queries, args.dim, args.topics, rng)
+    per_doc = args.rows // args.docs
+
+    root = tempfile.mkdtemp(prefix="smartedu-ann-")
+    try:
+        library = LibraryIndex(root)
+        start = time.perf_counter()
+        for d in range(args.docs):
+            rows = slice(d * per_doc, (d + 1) * per_doc)
+            library.add_document(
+                f"doc{d}",
+                [f"chunk {i}" for i in range(per_doc)],
+                vectors[rows],
+                pages=list(range(1, per_doc + 1)),
+                course=f"course{d % 10}",
+            )
+        build = time.perf_counter() - start
+        stats = library.stats()
+        print(f"inserted {stats['live_rows']} rows in {args.docs} docs: {build:.2f} s "
+              f"(nlist {stats['nlist']}, incl. training)")
+
+        exact = VectorIndex(vectors[: per_doc * args.docs])
+        start = time.perf_counter()
+        truth = [set(exact.search(q, args.k)[0].tolist()) for q in queries]
+        exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+        print(f"\n{'search':<16} {'ms/query':>9} {'recall@' + str(args.k):>10}")
+        print(f"{'exact (numpy)':<16} {exact_ms:>9.2f} {1.0:>10.3f}")
+
+        for nprobe in args.nprobe:
+            start = time.perf_counter()
+            found = [library.search_rows(q, args.k, nprobe=nprobe)[0] for q in queries]
+            ms = (time.perf_counter() - start) / len(queries) * 1000
+            recall = np.mean([len(t & set(f.tolist())) / args.k for t, f in zip(truth, found)])
+            print(f"{'ivf nprobe=' + str(nprobe):<16} {ms:>9.2f} {recall:>10.3f}")
+
+        print()
+        for name, filters in (
+            ("course filter", {"course": "course3"}),
+            ("2-doc filter", {"doc_ids": ["doc1", "doc2"]}),
+            ("pages 1-20", {"page_range": (1, 20)}),
+        ):
+            start = time.perf_counter()
+            for q in queries:
+                library.search_rows(q, args.k, **filters)
+            ms = (time.perf_counter() - start) / len(queries) * 1000
+            print(f"{name:<16} {ms:>9.2f} ms/query")
+
+        start = time.perf_counter()
+        library.search(queries[0], args.k)
+        print(f"search + text    {(time.perf_counter() - start) * 1000:>9.2f} ms")
+
+        start = time.perf_counter()
+        library.add_document("extra", ["x"] * per_doc, vectors[:per_doc], course="extra")
+        print(f"insert 1 doc     {(time.perf_counter() - start) * 1000:>9.2f} ms ({per_doc} rows)")
+        start = time.perf_counter()
+        library.remove_document("extra")
+        print(f"delete 1 doc     {(time.perf_counter() - start) * 1000:>9.2f} ms")
+
+        start = time.perf_counter()
+        LibraryIndex(root)
+        print(f"reopen           {(time.perf_counter() - start) * 1000:>9.2f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Concurrent request capacity: Flask on a fixed pool of request threads vs
+the ASGI app (asgi_app.py, uvicorn) with the async Gemini client.
+
+Both servers run in this process against benchmarks/gemini_stub.py, whose
+--latency and --token-rate make every generation take about a second, as a
+real LLM call does. A document is indexed once up front; then each level
+fires --concurrency requests at /generate_mcq at once (each with its own
+focus string, so the quiz cache never answers) and reports latency
+percentiles, requests per second, errors and the peak thread count.
+
+The Flask server handles at most --threads requests at a time, like
+`gunicorn --threads N`; the rest wait in the accept queue. --threads 0
+starts a thread per request instead (werkzeug's threaded mode).
+
+Run from Backend/:
+    python benchmarks/bench_asgi.py --concurrency 8 64 256 --threads 8 \\
+        --latency 0.2 --token-rate 400
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from corpus import make_document  # noqa: E402
+from gemini_stub import StubConfig, start_stub  # noqa: E402
+
+
+# -------------------------------------------------
+# SERVERS
+# -------------------------------------------------
+def make_pooled_server(app: Any, threads: int) -> Any:
+    """werkzeug server that handles requests on `threads` pooled threads."""
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        request_queue_size = 2048
+
+        def __init__(self):
+            super().__init__("127.0.0.1", 0, app)
+            self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    return PooledWSGIServer()
+
+
+def start_flask(threads: int) -> Tuple[Any, str]:
+    from werkzeug.serving import make_server
+    from app import app
+
+    if threads > 0:
+        server = make_pooled_server(app, threads)
+    else:
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def start_asgi() -> Tuple[Any, str]:
+    import uvicorn
+    from asgi_app import app
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    config = uvicorn.Config(app, log_level="warning", backlog=2048, lifespan="on")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+class ThreadSampler:
+    """Peak threading.active_count() while the block runs."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self) -> "ThreadSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+# -------------------------------------------------
+# DRIVER
+# -------------------------------------------------
+async def fire(base: str, doc_id: str, label: str, n: int, questions: int) -> Dict[str, Any]:
+    """n requests at once, one connection each."""
+    import httpx
+
+    async def one(client: "httpx.AsyncClient", i: int) -> Tuple[float, Optional[int]]:
+        start = time.perf_counter()
+        try:
+            resp = await client.post(
+                f"{base}/generate_mcq",
+                data={
+                    "doc_id": doc_id,
+                    "num_questions": str(questions),
+                    "user_focus": f"{label} request {i}",
+                },
+            )
+            status: Optional[int] = resp.status_code
+        except httpx.HTTPError:
+            status = None
+        return time.perf_counter() - start, status
+
+    # Small pools, as in gemini_client: one large httpx pool would make
+    # the load driver itself the bottleneck.
+    clients = [httpx.AsyncClient(timeout=600) for _ in range(-(-n // 32))]
+    try:
+        with ThreadSampler() as threads:
+            start = time.perf_counter()
+            outcomes = await asyncio.gather(
+                *(one(clients[i % len(clients)], i) for i in range(n))
+            )
+            wall = time.perf_counter() - start
+    finally:
+        for client in clients:
+            await client.aclose()
+
+    latencies = np.array([t for t, _ in outcomes])
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return {
+        "requests": n,
+        "errors": sum(status != 200 for _, status in outcomes),
+        "p50": p50,
+        "p95": p95,
+        "rps": n / wall,
+        "threads": threads.peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 64, 256])
+    parser.add_argument("--threads", type=int, default=8, help="Flask request threads (0 = one per request)")
+    parser.add_argument("--modes", nargs="+", default=["flask", "asgi"], choices=["flask", "asgi"])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-rate", type=float, default=400)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=12)
+    args = parser.parse_args()
+
+    cfg = StubConfig(latency=args.latency, token_rate=args.token_rate, dim=64, synthetic=True)
+    _, stub_base = start_stub(cfg)
+    state_dir = tempfile.mkdtemp(prefix="smartedu-bench-asgi-")
+    os.environ.update({
+        "GEMINI_API_BASE": stub_base,
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "benchmark",
+        "SMARTEDU_CACHE_DIR": os.path.join(state_dir, "cache"),
+        "ANALYTICS_DB_PATH": os.path.join(state_dir, "analytics.db"),
+        "MONGO_URI": os.environ.get("MONGO_URI") or "mongomock://",
+    })
+    os.chdir(state_dir)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    import requests
+
+    servers = {}
+    if "flask" in args.modes:
+        servers["flask"] = start_flask(args.threads)[1]
+    if "asgi" in args.modes:
+        servers["asgi"] = start_asgi()[1]
+
+    # Index once; both servers read the same index store afterwards.
+    name, data = make_document("pdf", args.pages, salt="bench-asgi")
+    resp = requests.post(
+        f"{next(iter(servers.values()))}/generate_mcq",
+        files={"file": (name, data)},
+        data={"num_questions": str(args.questions)},
+        timeout=600,
+    )
+    resp.raise_for_status()
+    doc_id = resp.json()["doc_id"]
+
+    threads = args.threads or "per-request"
+    print(f"stub: {args.latency}s latency, {args.token_rate:g} tok/s; flask threads: {threads}")
+    print(f"{'server':<7} {'conc':>5} {'errors':>6} {'p50 s':>7} {'p95 s':>7} {'req/s':>7} {'threads':>7}")
+    for mode, base in servers.items():
+        for n in args.concurrency:
+            r = asyncio.run(fire(base, doc_id, f"{mode} {n}", n, args.questions))
+            print(f"{mode:<7} {n:>5} {r['errors']:>6} {r['p50']:>7.2f} {r['p95']:>7.2f} "
+                  f"{r['rps']:>7.1f} {r['threads']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Login storm against auth.py with mongomock standing in for the cluster:
+a class of students all logging in at once.
+
+Seeds --users accounts through /signup, then fires --logins logins (with
+a --bad-ratio share of wrong passwords) at each concurrency level through a
+local werkzeug server, and reports latency percentiles, logins/s and the
+503s shed by the bounded bcrypt pool. --inline runs bcrypt on the request
+threads instead of the pool, for comparison.
+
+Run from Backend/:
+    python benchmarks/bench_auth.py --users 200 --logins 400 --concurrency 1 8 32 128 --rounds 10
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--rounds", type=int, default=10, help="BCRYPT_ROUNDS")
+    parser.add_argument("--workers", type=int, default=0, help="AUTH_HASH_WORKERS (0 = cpu count)")
+    parser.add_argument("--bad-ratio", type=float, default=0.1)
+    parser.add_argument("--inline", action="store_true", help="bcrypt on the request thread")
+    args = parser.parse_args()
+
+    os.environ["MONGO_URI"] = "mongomock://"
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    if args.workers:
+        os.environ["AUTH_HASH_WORKERS"] = str(args.workers)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    import auth
+    from werkzeug.serving import make_server
+
+    if args.inline:
+        auth._run_hash = lambda fn, *a: fn(*a)
+
+    server = make_server("127.0.0.1", 0, auth.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(
+            lambda i: requests.post(f"{base}/signup", json={"username": f"student{i}", "password": f"pw{i}"}),
+            range(args.users),
+        ))
+    print(f"seeded {args.users} users in {time.perf_counter() - start:.2f} s "
+          f"(rounds {args.rounds}, {'inline' if args.inline else f'{auth.AUTH_HASH_WORKERS} bcrypt workers'})")
+
+    rng = random.Random(0)
+    attempts = []
+    for _ in range(args.logins):
+        i = rng.randrange(args.users)
+        wrong = rng.random() < args.bad_ratio
+        attempts.append((f"student{i}", "nope" if wrong else f"pw{i}", 401 if wrong else 200))
+
+    local = threading.local()
+
+    def login(attempt):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        user, password, expected = attempt
+        t = time.perf_counter()
+        status = session.post(f"{base}/login", json={"username": user, "password": password}).status_code
+        return time.perf_counter() - t, status, expected
+
+    print(f"\n{'concurrency':>11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'logins/s':>9} {'503':>5} {'wrong':>6}")
+    for c in args.concurrency:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=c) as pool:
+            outcomes = list(pool.map(login, attempts))
+        wall = time.perf_counter() - start
+        lat = np.array([t for t, _, _ in outcomes]) * 1000
+        shed = sum(s == 503 for _, s, _ in outcomes)
+        wrong = sum(s != e and s != 503 for _, s, e in outcomes)
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        print(f"{c:>11} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {len(outcomes) / wall:>9.1f} {shed:>5} {wrong:>6}")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        auth.user_exists(f"student{i % args.users}")
+    print(f"\nuser_exists (cached) {(time.perf_counter() - start):.3f} ms/call")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
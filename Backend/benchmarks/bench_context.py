@@ -0,0 +1,87 @@
+"""
+Prompt context size: the old fixed top-5 join vs the token-budget packer
+(MMR selection, overlap trimming) in context_packer.py.
+
+Synthetic lecture notes are chunked with the structure-aware chunker and
+with the old 1500 / 200 splitter (whose overlap the packer trims); for each
+question count, candidates are ranked by BM25 for a focus string and
+packed. Reports estimated context tokens before / after, tokens trimmed,
+chunks used and distinct topics covered, plus packing time. No network:
+similarity is term overlap (the library path), not embeddings.
+
+Run from Backend/:
+    python benchmarks/bench_context.py --pages 40 --lines 8 40 --questions 5 10 20
+"""
+import os
+import sys
+import time
+import argparse
+from typing import List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from chunking import iter_structured_chunks  # noqa: E402
+from context_packer import (  # noqa: E402
+    CONTEXT_CANDIDATES,
+    ContextStats,
+    context_budget,
+    pack_context,
+)
+from corpus import TOPICS, page_texts  # noqa: E402
+from generation_planner import CHUNKS_PER_SHARD, plan_shards  # noqa: E402
+from lexical import BM25Index  # noqa: E402
+from rag import iter_page_chunks, make_splitter  # noqa: E402
+
+
+def baseline_chunks(num_questions: int) -> int:
+    shards = len(plan_shards(num_questions))
+    return 5 if shards <= 1 else CHUNKS_PER_SHARD * shards
+
+
+def topics_covered(texts: List[str]) -> int:
+    return sum(any(topic in text for text in texts) for topic in TOPICS)
+
+
+def bench(label: str, chunks: List[str], focus: str, questions: List[int]) -> None:
+    lexical = BM25Index().add_many(chunks)
+    for n in questions:
+        baseline = baseline_chunks(n)
+        k = max(CONTEXT_CANDIDATES, 2 * baseline)
+        ranked = lexical.search(focus, k)
+        ranked += [i for i in range(len(chunks)) if i not in ranked][: k - len(ranked)]
+        candidates = [chunks[i] for i in ranked]
+
+        stats = ContextStats()
+        start = time.perf_counter()
+        packed = pack_context(
+            candidates, context_budget(n), positions=ranked, baseline_chunks=baseline, stats=stats
+        )
+        ms = (time.perf_counter() - start) * 1000
+        texts = [text for _, text in packed]
+        print(f"{label:<22} {n:>4} {stats.budget:>6} {stats.baseline_tokens:>9} {stats.tokens:>7} "
+              f"{stats.tokens_saved:>7} {stats.trimmed_tokens:>8} {baseline:>5}->{stats.selected:<3} "
+              f"{topics_covered(candidates[:baseline]):>3}->{topics_covered(texts):<3} {ms:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--lines", type=int, nargs="+", default=[8, 40])
+    parser.add_argument("--questions", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--focus", default="photosynthesis energy")
+    args = parser.parse_args()
+
+    print(f"{'chunks':<22} {'q':>4} {'budget':>6} {'top-k tok':>9} {'packed':>7} "
+          f"{'saved':>7} {'trimmed':>8} {'chunks':>9} {'topics':>7} {'ms':>7}")
+    for lines in args.lines:
+        pages = list(enumerate(page_texts(args.pages, lines=lines), start=1))
+        structured = [c for _, c in iter_structured_chunks(pages)]
+        splitter = make_splitter(chunk_size=1500, chunk_overlap=200)
+        fixed = [c for _, c in iter_page_chunks(pages, splitter)]
+        bench(f"structured {lines} lines", structured, args.focus, args.questions)
+        bench(f"splitter {lines} lines", fixed, args.focus, args.questions)
+
+
+if __name__ == "__main__":
+    main()
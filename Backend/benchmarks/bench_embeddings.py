@@ -0,0 +1,74 @@
+"""
+Embedding client benchmark against the local Gemini stub.
+
+Compares one synchronous POST per batch (the old rag.embed_texts shape,
+split to respect the 100-text limit) with EmbeddingClient at several
+concurrency levels, with per-request latency and 429 injection.
+
+Run from Backend/:
+    python benchmarks/bench_embeddings.py --texts 2000 --latency 0.1 --throttle-rate 0.05 --dim 64
+"""
+import os
+import sys
+import time
+import argparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gemini_client import EmbeddingClient  # noqa: E402
+from gemini_stub import StubConfig, start_stub  # noqa: E402
+
+
+def sequential(base_url: str, texts, batch_size: int):
+    url = f"{base_url}/models/text-embedding-004:batchEmbedContents"
+    out = []
+    for i in range(0, len(texts), batch_size):
+        while True:
+            resp = requests.post(url, params={"key": "stub"}, json={"requests": [
+                {"model": "models/text-embedding-004", "content": {"parts": [{"text": t}]}}
+                for t in texts[i:i + batch_size]
+            ]})
+            if resp.status_code != 429:
+                break
+        resp.raise_for_status()
+        out.extend(e["values"] for e in resp.json()["embeddings"])
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--throttle-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", default="1,4,8,16")
+    # Small vectors keep stub-side JSON encoding from dominating the timing.
+    parser.add_argument("--dim", type=int, default=64)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency, throttle_rate=args.throttle_rate, dim=args.dim
+    )
+    server, base_url = start_stub(config)
+    texts = [f"chunk {i} " * 20 for i in range(args.texts)]
+
+    start = time.perf_counter()
+    expected = sequential(base_url, texts, 100)
+    print(f"{'sequential':>14}: {time.perf_counter() - start:7.2f}s")
+
+    for c in (int(x) for x in args.concurrency.split(",")):
+        client = EmbeddingClient(base_url=base_url, key="stub", concurrency=c,
+                                 max_in_flight=2 * c, backoff=0.01)
+        start = time.perf_counter()
+        got = client.embed(texts)
+        elapsed = time.perf_counter() - start
+        client.close()
+        assert got == expected, "results out of order"
+        print(f"{'concurrency ' + str(c):>14}: {elapsed:7.2f}s")
+
+    print(f"stub stats: {config.stats}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Heading detection for the BM25 heading fast path: the original rule (any
+short line not ending in punctuation) vs lexical.heading_lines, on lecture
+pages whose body paragraphs are hard-wrapped the way PDF text extraction
+returns them.
+
+Each page has a title line, numbered and title-case section headings, and
+paragraphs wrapped at --width characters. Reports body lines taken for
+headings, headings found, and how many body-only terms ("oxygen",
+"glucose", ...) would take the lexical fast path and skip vector search.
+Exits non-zero if lexical.heading_lines takes any body line for a heading,
+so it doubles as a smoke check.
+
+Run from Backend/:
+    python benchmarks/bench_headings.py [--pages 40] [--width 60 72 90]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import textwrap
+from typing import Callable, List, Set, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from corpus import NOUNS, TOPICS, VERBS  # noqa: E402
+from lexical import BM25Index, heading_lines, tokenize  # noqa: E402
+import lexical  # noqa: E402
+
+SECTIONS = ("Key Terms and Definitions", "Worked Example", "SUMMARY", "Common Mistakes")
+
+
+def legacy_heading_lines(text: str) -> List[str]:
+    """The original rule: short, and not ending like a sentence."""
+    out = []
+    for line in text.splitlines():
+        line = line.strip()
+        if (
+            line
+            and len(line) <= 100
+            and len(line.split()) <= 12
+            and line[-1] not in ".,;?!"
+            and any(c.isalpha() for c in line)
+        ):
+            out.append(line)
+    return out
+
+
+def make_pages(pages: int, width: int, seed: int = 0) -> Tuple[List[str], Set[str]]:
+    """Page texts and the set of lines that are real headings."""
+    rng = random.Random(seed)
+    headings: Set[str] = set()
+    out = []
+    for p in range(pages):
+        topic = TOPICS[p % len(TOPICS)]
+        title = f"Unit {p + 1}: {topic.title()}"
+        lines = [title]
+        headings.add(title)
+        for s in range(3):
+            heading = (
+                f"{p + 1}.{s + 1} {topic.capitalize()} in Practice"
+                if s == 0
+                else SECTIONS[(p + s) % len(SECTIONS)]
+            )
+            headings.add(heading)
+            lines.append(heading)
+            clauses = [
+                f"{rng.choice(NOUNS)} {rng.choice(VERBS)} {rng.choice(NOUNS)} during "
+                f"{topic}, which is why condition {rng.randint(1, 999)} matters"
+                for _ in range(rng.randint(3, 6))
+            ]
+            paragraph = clauses[0]
+            for clause in clauses[1:]:
+                joiner = rng.choice([". ", ", and ", "; "])
+                paragraph += joiner + (clause[0].upper() + clause[1:] if joiner == ". " else clause)
+            paragraph = paragraph[0].upper() + paragraph[1:] + "."
+            lines.extend(textwrap.wrap(paragraph, width))
+        out.append("\n".join(lines))
+    return out, headings
+
+
+def evaluate(detect: Callable[[str], List[str]], pages: List[str], headings: Set[str]):
+    found = [line for page in pages for line in detect(page)]
+    body = sum(line not in headings for line in found)
+    hits = len(headings & set(found))
+
+    original = lexical.heading_lines
+    lexical.heading_lines = detect  # BM25Index.add looks it up at call time
+    try:
+        index = BM25Index().add_many(pages)
+    finally:
+        lexical.heading_lines = original
+    heading_terms = {t for h in headings for t in tokenize(h)}
+    body_terms = {t for noun in NOUNS for t in tokenize(noun)} - heading_terms
+    fast_path = sorted(t for t in body_terms if index.heading_matches(t))
+    return body, hits, fast_path, len(body_terms)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--width", type=int, nargs="+", default=[60, 72, 90])
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'rule':<8} {'width':>5} {'body lines':>10} {'headings':>9} {'fast path':>9} {'ms':>7}")
+    for width in args.width:
+        pages, headings = make_pages(args.pages, width)
+        for name, detect in (("legacy", legacy_heading_lines), ("new", heading_lines)):
+            start = time.perf_counter()
+            for page in pages:
+                detect(page)
+            ms = (time.perf_counter() - start) * 1000
+            body, hits, fast_path, terms = evaluate(detect, pages, headings)
+            print(f"{name:<8} {width:>5} {body:>10} {hits:>4}/{len(headings):<4} "
+                  f"{len(fast_path):>4}/{terms:<4} {ms:>7.2f}")
+            if name == "new" and (body or fast_path):
+                failed = True
+                print(f"  body lines taken as headings; fast path for: {', '.join(fast_path)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Import-time / cold-start benchmark for the Flask API process.
+
+Each measurement runs in a fresh interpreter. "eager parsers" re-imports
+the modules app.py and rag.py used to load at import time (Streamlit,
+PyPDF2, python-pptx, docx2txt, langchain splitters) to show what the
+split saves; "first request" adds one round trip through the Flask test
+client.
+
+Run from Backend/:
+    python benchmarks/bench_import.py [--runs 5]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EAGER = "import streamlit, PyPDF2, pptx, docx2txt, langchain_text_splitters"
+FIRST_REQUEST = (
+    "import app; c = app.app.test_client(); "
+    "assert c.post('/generate_mcq').status_code == 400"
+)
+
+CASES = [
+    ("import app", "import app"),
+    ("eager parsers + import app", f"{EAGER}; import app"),
+    ("boot + first request", FIRST_REQUEST),
+]
+
+
+def run_once(code: str) -> float:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "bench")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND, env=env, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = run_once("pass")
+    print(f"interpreter startup: {baseline * 1e3:.0f} ms (subtracted below)")
+    for label, code in CASES:
+        run_once(code)  # warm the bytecode / OS file caches
+        times = [run_once(code) - baseline for _ in range(args.runs)]
+        print(f"{label:>28}: median {statistics.median(times) * 1e3:7.0f} ms  "
+              f"min {min(times) * 1e3:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Hot-path overhead of the metrics layer: cost per timed() block, per item
+through timed_iter(), per counter increment, and per /metrics render.
+
+Run from Backend/:
+    python benchmarks/bench_metrics.py [--n 200000]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import (  # noqa: E402
+    REGISTRY,
+    cache_result,
+    start_request_timings,
+    pop_request_timings,
+    timed,
+    timed_iter,
+)
+
+
+def per_op_ns(fn, n: int, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(n)
+        best = min(best, time.perf_counter() - start)
+    return best / n * 1e9
+
+
+def baseline(n):
+    for _ in range(n):
+        pass
+
+
+def timed_blocks(n):
+    for _ in range(n):
+        with timed("bench"):
+            pass
+
+
+def nested_blocks(n):
+    for _ in range(n):
+        with timed("bench_outer"):
+            with timed("bench_inner"):
+                pass
+
+
+def iter_items(n):
+    for _ in timed_iter("bench_iter", range(n)):
+        pass
+
+
+def counter_incs(n):
+    for _ in range(n):
+        cache_result("bench", True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    args = parser.parse_args()
+
+    base = per_op_ns(baseline, args.n)
+    print(f"empty loop            {base:8.0f} ns/op")
+    for name, fn in (
+        ("timed() block", timed_blocks),
+        ("nested timed() pair", nested_blocks),
+        ("timed_iter item", iter_items),
+        ("counter inc", counter_incs),
+    ):
+        print(f"{name:<21} {per_op_ns(fn, args.n) - base:8.0f} ns/op")
+
+    start_request_timings()
+    with_header = per_op_ns(timed_blocks, args.n) - base
+    pop_request_timings()
+    print(f"timed() + header      {with_header:8.0f} ns/op")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        text = REGISTRY.render()
+    print(f"/metrics render       {(time.perf_counter() - start) * 10:8.3f} ms "
+          f"({len(text.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    main()
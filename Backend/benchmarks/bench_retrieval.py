@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: legacy per-row cosine loop vs. VectorIndex top-k.
+
+Run from Backend/:
+    python benchmarks/bench_retrieval.py [--dim 768] [--k 5] [--queries 16]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from retrieval import VectorIndex  # noqa: E402
+
+
+def legacy_top_k(query_emb: np.ndarray, embeddings: np.ndarray, k: int):
+    """The original rag.retrieve_top_k scoring loop, minus the network call."""
+    sims = []
+    for idx, ch_emb in enumerate(embeddings):
+        denom = np.linalg.norm(query_emb) * np.linalg.norm(ch_emb)
+        sim = 0.0 if denom == 0 else float(np.dot(query_emb, ch_emb) / denom)
+        sims.append((sim, idx))
+    sims.sort(reverse=True, key=lambda x: x[0])
+    return [idx for _, idx in sims[:k]]
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=16)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'legacy ms':>10} {'index ms':>9} {'speedup':>8} "
+          f"{'batch/q ms':>11} {'build ms':>9}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        emb = rng.standard_normal((n, args.dim)).astype(np.float32)
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+        build = best_of(lambda: VectorIndex(emb), 3)
+        index = VectorIndex(emb)
+
+        legacy_repeat = 1 if n >= 100000 else 3
+        legacy = best_of(lambda: legacy_top_k(queries[0], emb, args.k), legacy_repeat)
+        single = best_of(lambda: index.search(queries[0], args.k), 10)
+        batch = best_of(lambda: index.search_batch(queries, args.k), 5)
+
+        assert list(index.search(queries[0], args.k)[0]) == legacy_top_k(
+            queries[0], emb, args.k
+        )
+        print(f"{n:>8} {legacy * 1e3:>10.2f} {single * 1e3:>9.3f} "
+              f"{legacy / single:>7.0f}x {batch / args.queries * 1e3:>11.3f} "
+              f"{build * 1e3:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
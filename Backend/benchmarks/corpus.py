@@ -0,0 +1,200 @@
+"""
+Synthetic PDF / DOCX / PPTX documents for offline benchmarks.
+
+Every document is built in memory from generated lecture-style text, so
+the benchmarks need no fixtures. `salt` changes the text (and so the
+document hash), which defeats the document index and quiz caches when a
+benchmark wants cold requests. `boilerplate` adds what real decks carry:
+a course header and page footer on every page, and a recurring
+"questions / recap" slide.
+
+PDF and DOCX are written by hand (no extra dependencies); PPTX needs
+python-pptx, which the backend already uses to parse slides.
+
+Write a corpus to disk:
+    python benchmarks/corpus.py --out /tmp/corpus --pages 5 20 80
+"""
+import io
+import os
+import random
+import zipfile
+import argparse
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+TOPICS = (
+    "cell respiration", "photosynthesis", "enzyme kinetics", "membrane transport",
+    "DNA replication", "protein synthesis", "the Krebs cycle", "mitosis",
+    "meiosis", "natural selection", "homeostasis", "neural signalling",
+)
+VERBS = ("regulates", "depends on", "converts", "produces", "inhibits", "transports")
+NOUNS = (
+    "ATP", "glucose", "the mitochondrion", "ribosomes", "chlorophyll", "the nucleus",
+    "sodium ions", "messenger RNA", "the cell membrane", "pyruvate", "oxygen", "enzymes",
+)
+
+FORMATS = ("pdf", "docx", "pptx")
+
+HEADER = "BIO 101 - Introduction to Cell Biology - Spring Term"
+FOOTER = "SmartEdu University - for enrolled students only"
+RECAP_EVERY = 8
+RECAP = (
+    "Questions?\n"
+    "Recap: review the key terms from this section before the next lecture.\n"
+    "Office hours are on Tuesdays and Thursdays; post questions on the forum."
+)
+
+
+def page_texts(
+    pages: int, lines: int = 24, salt: str = "", seed: int = 0, boilerplate: bool = False
+) -> List[str]:
+    """One block of lecture-like text per page / slide."""
+    rng = random.Random(f"{seed}:{salt}")
+    out = []
+    for p in range(pages):
+        topic = TOPICS[p % len(TOPICS)]
+        label = f"Lecture notes {salt}" if salt else "Lecture notes"
+        body = [f"{label} - page {p + 1}: {topic}"]
+        if boilerplate and p % RECAP_EVERY == RECAP_EVERY - 1:
+            body = RECAP.split("\n")
+        else:
+            for _ in range(lines):
+                body.append(
+                    f"In {topic}, {rng.choice(NOUNS)} {rng.choice(VERBS)} "
+                    f"{rng.choice(NOUNS)} under condition {rng.randint(1, 999)}."
+                )
+        if boilerplate:
+            body = [HEADER] + body + [FOOTER, f"Page {p + 1} of {pages}"]
+        out.append("\n".join(body))
+    return out
+
+
+# -------------------------------------------------
+# PDF (one Helvetica text object per page)
+# -------------------------------------------------
+def _pdf_string(line: str) -> str:
+    return "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    n = len(pages)
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(n))}] "
+        f"/Count {n} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        ops = "BT /F1 10 Tf 50 780 Td 12 TL " + " ".join(
+            f"{_pdf_string(line)} '" for line in text.split("\n")
+        ) + " ET"
+        data = ops.encode("latin-1", "replace")
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % (i + 1) + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+# -------------------------------------------------
+# DOCX (minimal WordprocessingML package)
+# -------------------------------------------------
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def make_docx(pages: List[str]) -> bytes:
+    paragraphs = []
+    for text in pages:
+        for line in text.split("\n"):
+            paragraphs.append(f"<w:p><w:r><w:t>{escape(line)}</w:t></w:r></w:p>")
+        paragraphs.append("<w:p/>")
+    document = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document xmlns:w="{_W_NS}"><w:body>{"".join(paragraphs)}</w:body></w:document>'
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        z.writestr("_rels/.rels", _DOCX_RELS)
+        z.writestr("word/document.xml", document)
+    return buf.getvalue()
+
+
+# -------------------------------------------------
+# PPTX (python-pptx, one title + body slide per page)
+# -------------------------------------------------
+def make_pptx(pages: List[str]) -> bytes:
+    from pptx import Presentation
+
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for text in pages:
+        title, _, body = text.partition("\n")
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = title
+        slide.placeholders[1].text = body
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+
+BUILDERS = {"pdf": make_pdf, "docx": make_docx, "pptx": make_pptx}
+
+
+def make_document(
+    fmt: str,
+    pages: int,
+    salt: str = "",
+    seed: int = 0,
+    boilerplate: bool = False,
+    lines: int = 24,
+) -> Tuple[str, bytes]:
+    """Returns (filename, file bytes)."""
+    texts = page_texts(pages, lines=lines, salt=salt, seed=seed, boilerplate=boilerplate)
+    data = BUILDERS[fmt](texts)
+    return f"synthetic_{pages}p{('_' + salt) if salt else ''}.{fmt}", data
+
+
+def make_corpus(sizes: List[int], formats=FORMATS) -> Dict[Tuple[str, int], Tuple[str, bytes]]:
+    return {(fmt, n): make_document(fmt, n) for fmt in formats for n in sizes}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 80])
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for (fmt, n), (name, data) in make_corpus(args.pages, args.formats).items():
+        path = os.path.join(args.out, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"{path}  {len(data) / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
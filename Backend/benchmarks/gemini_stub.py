@@ -0,0 +1,266 @@
+"""
+Local stand-in for the Gemini REST API, for offline tests and benchmarks.
+
+Serves POST /v1beta/models/<model>:batchEmbedContents with deterministic
+hash-derived vectors, and :generateContent / :streamGenerateContent
+(alt=sse) with a reply streamed in small pieces. The reply is either a
+fixed string (StubConfig.generate_reply) or, with synthetic=True, shaped
+after the prompt: N MCQs for an MCQ prompt, the feedback JSON for a
+feedback prompt.
+
+Knobs: fixed latency per request, a generation token rate (replies take
+len/4/token_rate seconds, spread over the stream), 429 throttling and
+injected 500 failures.
+Point the backend at it with
+    GEMINI_API_BASE=http://127.0.0.1:<port>/v1beta
+
+Run standalone:
+    python benchmarks/gemini_stub.py --port 8765 --latency 0.05 --throttle-rate 0.1 \
+        --token-rate 200 --failure-rate 0.01 --synthetic
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_batch: int = 100,
+        dim: int = 768,
+        seed: int = 0,
+        stream_chunk_chars: int = 40,
+        stream_delay: float = 0.0,
+        token_rate: float = 0.0,
+        failure_rate: float = 0.0,
+        synthetic: bool = False,
+    ):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        # Generated tokens per second (0 = instant); ~4 chars per token.
+        self.token_rate = token_rate
+        # Fraction of requests answered with a 500 (after latency).
+        self.failure_rate = failure_rate
+        self.synthetic = synthetic
+        self.max_batch = max_batch
+        self.dim = dim
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_delay = stream_delay
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.generate_reply = json.dumps({
+            "What does the stub server stand in for?": {
+                "options": ["Gemini", "MongoDB", "Flask", "React"],
+                "correct_option": "Gemini",
+                "difficulty": "Easy",
+            }
+        })
+        self.stats = {
+            "embed_requests": 0, "embed_texts": 0, "generate_requests": 0, "throttled": 0,
+            "failed": 0,
+        }
+
+    def count(self, key: str, n: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += n
+
+    def should_throttle(self) -> bool:
+        with self.lock:
+            return self.rng.random() < self.throttle_rate
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.rng.random() < self.failure_rate
+
+    def reply_for(self, prompt: str) -> str:
+        return synthetic_reply(prompt) if self.synthetic else self.generate_reply
+
+    def generation_seconds(self, reply: str) -> float:
+        return len(reply) / 4 / self.token_rate if self.token_rate > 0 else 0.0
+
+
+def fake_embedding(text: str, dim: int) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32).tolist()
+
+
+def usage_metadata(prompt: str, reply: str) -> dict:
+    """Rough token counts (~4 chars per token), shaped like Gemini's."""
+    return {
+        "promptTokenCount": len(prompt) // 4,
+        "candidatesTokenCount": len(reply) // 4,
+        "totalTokenCount": (len(prompt) + len(reply)) // 4,
+    }
+
+
+_NUM_QUESTIONS = re.compile(r"Generate \*\*(\d+)\*\*")
+# Mirrors feedback.FEEDBACK_KEYS (not imported: feedback needs an API key).
+_FEEDBACK_KEYS = (
+    "overall_performance", "strengths", "areas_for_improvement",
+    "question_type_breakdown", "next_steps",
+)
+_STUDENT_LINE = re.compile(r"^(s\d+): ", re.MULTILINE)
+
+
+def synthetic_reply(prompt: str) -> str:
+    """A plausible reply for the backend's MCQ and feedback prompts."""
+    tag = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    match = _NUM_QUESTIONS.search(prompt)
+    if match:
+        return json.dumps({
+            f"Synthetic question {i} ({tag})?": {
+                "options": [f"Option {c} {i}" for c in "ABCD"],
+                "correct_option": f"Option A {i}",
+                "difficulty": ("Easy", "Medium", "Hard")[i % 3],
+            }
+            for i in range(int(match.group(1)))
+        })
+    if "feedback" in prompt.lower():
+        body = {key: f"Synthetic {key.replace('_', ' ')} ({tag})." for key in _FEEDBACK_KEYS}
+        # Group prompts address students as s0, s1, ...
+        students = _STUDENT_LINE.findall(prompt)
+        return json.dumps({s: body for s in students} if students else body)
+    return json.dumps({"reply": tag})
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_sse(self, text: str) -> None:
+        cfg = self.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        step = max(1, cfg.stream_chunk_chars)
+        pieces = -(-len(text) // step) or 1
+        delay = cfg.stream_delay + cfg.generation_seconds(text) / pieces
+        for i in range(0, len(text), step):
+            if delay:
+                time.sleep(delay)
+            event = {"candidates": [{"content": {"parts": [{"text": text[i:i + step]}]}}]}
+            if i + step >= len(text):
+                event["usageMetadata"] = usage_metadata(self.prompt_text, text)
+            self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?", 1)[0]
+        cfg = self.config
+
+        if cfg.latency:
+            time.sleep(cfg.latency)
+        if cfg.should_throttle():
+            cfg.count("throttled")
+            self._send_json(
+                429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                {"Retry-After": "0"},
+            )
+            return
+        if cfg.should_fail():
+            cfg.count("failed")
+            self._send_json(500, {"error": {"code": 500, "status": "INTERNAL"}})
+            return
+
+        if path.endswith(":batchEmbedContents"):
+            reqs = body.get("requests", [])
+            if len(reqs) > cfg.max_batch:
+                self._send_json(400, {"error": {"code": 400, "message": "batch too large"}})
+                return
+            cfg.count("embed_requests")
+            cfg.count("embed_texts", len(reqs))
+            self._send_json(200, {
+                "embeddings": [
+                    {"values": fake_embedding(r["content"]["parts"][0]["text"], cfg.dim)}
+                    for r in reqs
+                ]
+            })
+            return
+
+        self.prompt_text = "".join(
+            p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", [])
+        )
+        if path.endswith(":streamGenerateContent"):
+            cfg.count("generate_requests")
+            self._send_sse(cfg.reply_for(self.prompt_text))
+            return
+
+        if path.endswith(":generateContent"):
+            cfg.count("generate_requests")
+            reply = cfg.reply_for(self.prompt_text)
+            time.sleep(cfg.generation_seconds(reply))
+            self._send_json(200, {
+                "candidates": [{"content": {"parts": [{"text": reply}]}}],
+                "usageMetadata": usage_metadata(self.prompt_text, reply),
+            })
+            return
+
+        self._send_json(404, {"error": {"code": 404, "message": f"unknown path {path}"}})
+
+
+class StubServer(ThreadingHTTPServer):
+    # Room for load tests that open hundreds of connections at once.
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def start_stub(config: StubConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """Start the stub on a daemon thread; returns (server, base_url)."""
+    handler = type("Handler", (GeminiStubHandler,), {"config": config or StubConfig()})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1beta"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--max-batch", type=int, default=100)
+    parser.add_argument("--token-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--synthetic", action="store_true")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        args.latency, args.throttle_rate, args.max_batch,
+        token_rate=args.token_rate, failure_rate=args.failure_rate, synthetic=args.synthetic,
+    )
+    server, base = start_stub(config, args.host, args.port)
+    print(f"Gemini stub listening at {base}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Offline end-to-end benchmark: the real Flask app against the Gemini stub.
+
+Starts benchmarks/gemini_stub.py (synthetic replies, configurable latency,
+token rate, throttling and failures) and the backend on a local werkzeug
+server, then drives /generate_mcq with synthetic PDF / DOCX / PPTX files of
+growing size, and /generate_feedback with synthetic results, at each
+concurrency level. Reports p50/p95/p99 latency, requests per second,
+errors and peak RSS per scenario.
+
+All state (caches, index store, analytics DB) goes to a temp dir. The
+server runs in this process, so RSS includes the (small) load driver; the
+PDF extraction workers are separate processes and are not included.
+
+Run from Backend/:
+    python benchmarks/run_e2e.py --pages 5 20 80 --concurrency 1 4 16 --requests 24 \\
+        --latency 0.2 --token-rate 500 --json results.json
+
+Regression check against a saved run (exit status 1 on regression):
+    python benchmarks/run_e2e.py ... --baseline results.json --max-regression 0.25
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from corpus import FORMATS, make_document  # noqa: E402
+from gemini_stub import StubConfig, start_stub  # noqa: E402
+
+
+# -------------------------------------------------
+# MEMORY
+# -------------------------------------------------
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is KiB on Linux, bytes on macOS; either way a peak, not current.
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class RSSSampler:
+    """Samples this process's RSS in the background; .peak is the max seen."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self) -> "RSSSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+# -------------------------------------------------
+# SERVERS
+# -------------------------------------------------
+def start_backend(state_dir: str, stub_base: str) -> Tuple[Any, str]:
+    """Import the app with all state under state_dir; serve it on a thread."""
+    os.environ.update({
+        "GEMINI_API_BASE": stub_base,
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "benchmark",
+        "SMARTEDU_CACHE_DIR": os.path.join(state_dir, "cache"),
+        "ANALYTICS_DB_PATH": os.path.join(state_dir, "analytics.db"),
+    })
+    # The app resolves some paths relative to the working directory.
+    os.chdir(state_dir)
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# -------------------------------------------------
+# REQUEST FACTORIES
+# -------------------------------------------------
+Request = Callable[[requests.Session, str], requests.Response]
+
+
+def mcq_requests(
+    fmt: str, pages: int, n: int, num_questions: int, cold: bool, run_id: str
+) -> List[Request]:
+    """Files are built up front so document generation is not timed."""
+    if cold:
+        docs = [make_document(fmt, pages, salt=f"{run_id}-{i}") for i in range(n)]
+    else:
+        docs = [make_document(fmt, pages, salt=run_id)] * n
+
+    def make(filename: str, data: bytes) -> Request:
+        def send(session: requests.Session, base: str) -> requests.Response:
+            return session.post(
+                f"{base}/generate_mcq",
+                files={"file": (filename, data)},
+                data={"num_questions": str(num_questions), "user_focus": ""},
+                timeout=600,
+            )
+        return send
+
+    return [make(name, data) for name, data in docs]
+
+
+def synthetic_result(rng: random.Random, questions: int, salt: str) -> Dict[str, Any]:
+    mcq = {}
+    score = 0
+    for i in range(questions):
+        options = [f"Option {c} {i}" for c in "ABCD"]
+        chosen = rng.choice(options)
+        correct = chosen == options[0]
+        score += correct
+        mcq[f"Synthetic question {i} {salt}?"] = {
+            "options": options,
+            "correct_option": options[0],
+            "chosen_option": chosen,
+            "difficulty": ("Easy", "Medium", "Hard")[i % 3],
+            "is_correct": correct,
+        }
+    return {
+        "userID": f"bench-{salt}",
+        "score": score,
+        "total_questions": questions,
+        "mcq": mcq,
+        "multiple_correct": {},
+        "fill_in_the_blanks": {},
+        "true_false": {},
+    }
+
+
+def feedback_requests(n: int, questions: int, cold: bool, run_id: str) -> List[Request]:
+    rng = random.Random(run_id)
+    if cold:
+        results = [synthetic_result(rng, questions, f"{run_id}-{i}") for i in range(n)]
+    else:
+        results = [synthetic_result(rng, questions, run_id)] * n
+
+    def make(result: Dict[str, Any]) -> Request:
+        def send(session: requests.Session, base: str) -> requests.Response:
+            return session.post(f"{base}/generate_feedback", json=result, timeout=600)
+        return send
+
+    return [make(r) for r in results]
+
+
+# -------------------------------------------------
+# DRIVER
+# -------------------------------------------------
+def run_scenario(base: str, reqs: List[Request], concurrency: int) -> Dict[str, Any]:
+    local = threading.local()
+
+    def call(send: Request) -> Tuple[float, Optional[int]]:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            status = send(session, base).status_code
+        except requests.RequestException:
+            status = None
+        return time.perf_counter() - start, status
+
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(call, reqs))
+        wall = time.perf_counter() - start
+
+    latencies = np.array([t for t, _ in outcomes])
+    errors = sum(status != 200 for _, status in outcomes)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+    return {
+        "requests": len(outcomes),
+        "errors": errors,
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "rps": len(outcomes) / wall if wall else 0.0,
+        "peak_rss_mb": rss.peak / 1024 ** 2,
+    }
+
+
+# The app prints every MCQ set and feedback reply; unless --verbose, that
+# goes to /dev/null and the report is written to the real stdout.
+REPORT = sys.stdout
+
+
+def report(*args: Any) -> None:
+    print(*args, file=REPORT, flush=True)
+
+
+def print_row(name: str, r: Dict[str, Any]) -> None:
+    report(
+        f"{name:<34} {r['requests']:>4} {r['errors']:>4} "
+        f"{r['p50'] * 1000:>9.0f} {r['p95'] * 1000:>9.0f} {r['p99'] * 1000:>9.0f} "
+        f"{r['rps']:>7.2f} {r['peak_rss_mb']:>8.0f}"
+    )
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], max_regression: float) -> List[str]:
+    """Scenarios whose p95 or error count got worse than the baseline allows."""
+    regressions = []
+    for name, r in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if old["p95"] > 0 and r["p95"] > old["p95"] * (1 + max_regression):
+            regressions.append(
+                f"{name}: p95 {old['p95'] * 1000:.0f} ms -> {r['p95'] * 1000:.0f} ms"
+            )
+        if r["errors"] > old["errors"]:
+            regressions.append(f"{name}: errors {old['errors']} -> {r['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 80])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=16, help="requests per scenario")
+    parser.add_argument("--num-questions", type=int, default=10)
+    parser.add_argument("--feedback-questions", type=int, default=10)
+    parser.add_argument("--warm", action="store_true",
+                        help="repeat one document/result per scenario (cache hits)")
+    parser.add_argument("--skip-feedback", action="store_true")
+    # stub knobs
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--token-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--dim", type=int, default=768)
+    # output
+    parser.add_argument("--json", help="write results here")
+    parser.add_argument("--baseline", help="results JSON from an earlier run")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own output")
+    parser.add_argument("--keep-state", action="store_true", help="keep the temp state dir")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    stub_config = StubConfig(
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        failure_rate=args.failure_rate,
+        token_rate=args.token_rate,
+        dim=args.dim,
+        synthetic=True,
+    )
+    _, stub_base = start_stub(stub_config)
+    state_dir = tempfile.mkdtemp(prefix="smartedu-e2e-")
+    server, base = start_backend(state_dir, stub_base)
+    run_id = f"{time.time():.0f}"
+    cold = not args.warm
+
+    report(f"backend {base}  stub {stub_base}  state {state_dir}  "
+          f"mode {'cold' if cold else 'warm'}")
+    report(f"{'scenario':<34} {'n':>4} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'rps':>7} {'rss MB':>8}")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for fmt in args.formats:
+        for pages in args.pages:
+            for c in args.concurrency:
+                name = f"generate_mcq/{fmt}/{pages}p/c{c}"
+                reqs = mcq_requests(
+                    fmt, pages, args.requests, args.num_questions, cold, f"{run_id}-{name}"
+                )
+                results[name] = run_scenario(base, reqs, c)
+                print_row(name, results[name])
+
+    if not args.skip_feedback:
+        for c in args.concurrency:
+            name = f"generate_feedback/c{c}"
+            reqs = feedback_requests(args.requests, args.feedback_questions, cold, f"{run_id}-{name}")
+            results[name] = run_scenario(base, reqs, c)
+            print_row(name, results[name])
+
+    server.shutdown()
+    report(f"stub: {stub_config.stats}")
+    if not args.keep_state:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            report("REGRESSIONS:")
+            for line in regressions:
+                report(f"  {line}")
+            sys.exit(1)
+        report("no regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from analytics import AnalyticsStore, get_analytics_store, option_counts, question_key
+from feedback import QUESTION_TYPES
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+# No verdicts (observed difficulty, flags) before this many attempts.
+CALIBRATION_MIN_ATTEMPTS = int(os.getenv("CALIBRATION_MIN_ATTEMPTS", "20"))
+# Proportion correct (p-value) cut-offs: p >= EASY_P is Easy, p < HARD_P is Hard.
+CALIBRATION_EASY_P = float(os.getenv("CALIBRATION_EASY_P", "0.8"))
+CALIBRATION_HARD_P = float(os.getenv("CALIBRATION_HARD_P", "0.5"))
+
+
+def observed_difficulty(attempts: int, correct: int) -> Optional[str]:
+    if attempts < CALIBRATION_MIN_ATTEMPTS:
+        return None
+    p = correct / attempts
+    if p >= CALIBRATION_EASY_P:
+        return "Easy"
+    if p < CALIBRATION_HARD_P:
+        return "Hard"
+    return "Medium"
+
+
+# -------------------------------------------------
+# PER-QUESTION RUNNING COUNTS
+# -------------------------------------------------
+class QuestionStats:
+    __slots__ = ("key", "text", "labelled", "attempts", "correct", "options")
+
+    def __init__(self, key: str, text: str, labelled: str):
+        self.key = key
+        self.text = text
+        self.labelled = labelled
+        self.attempts = 0
+        self.correct = 0
+        # option -> [is_correct, times_chosen]
+        self.options: Dict[str, List[int]] = {}
+
+    def add(self, is_correct: bool, counts: Dict[str, List[int]]) -> None:
+        self.attempts += 1
+        self.correct += is_correct
+        for option, (is_right, picks) in counts.items():
+            entry = self.options.setdefault(option, [0, 0])
+            entry[0] |= is_right
+            entry[1] += picks
+
+    def distractor_flags(self) -> Dict[str, str]:
+        """
+        {option: reason} for wrong options that do not discriminate:
+        `never_chosen` (nobody falls for it) or `beats_correct` (picked more
+        often than the right answer, usually a mis-keyed or ambiguous item).
+        """
+        if self.attempts < CALIBRATION_MIN_ATTEMPTS or not self.options:
+            return {}
+        top_correct = max((picks for right, picks in self.options.values() if right), default=0)
+        flags = {}
+        for option, (right, picks) in self.options.items():
+            if right:
+                continue
+            if picks == 0:
+                flags[option] = "never_chosen"
+            elif picks > top_correct:
+                flags[option] = "beats_correct"
+        return flags
+
+    def report(self) -> Dict[str, Any]:
+        observed = observed_difficulty(self.attempts, self.correct)
+        return {
+            "question_key": self.key,
+            "question": self.text,
+            "attempts": self.attempts,
+            "correct": self.correct,
+            "p_value": self.correct / self.attempts if self.attempts else None,
+            "labelled_difficulty": self.labelled,
+            "observed_difficulty": observed,
+            "difficulty_mismatch": observed is not None and observed != self.labelled,
+            "options": {o: {"correct": bool(r), "chosen": n} for o, (r, n) in self.options.items()},
+            "bad_distractors": self.distractor_flags(),
+        }
+
+    def is_flagged(self) -> bool:
+        observed = observed_difficulty(self.attempts, self.correct)
+        return (observed is not None and observed != self.labelled) or bool(self.distractor_flags())
+
+
+# -------------------------------------------------
+# INDEX
+# -------------------------------------------------
+class CalibrationIndex:
+    """
+    In-memory difficulty calibration keyed by normalized question text.
+
+    record_result() costs O(1) per answer (plus the handful of options), so
+    it runs inline on every submission. The set of flagged questions is kept
+    up to date as answers arrive, so listing them never walks the whole index.
+    Counts can be warmed from the analytics rollups at startup.
+    """
+
+    def __init__(self, store: Optional[AnalyticsStore] = None):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, QuestionStats] = {}
+        self._flagged = set()
+        if store is not None:
+            self._warm(store)
+
+    def _warm(self, store: AnalyticsStore) -> None:
+        questions, options = store.option_snapshot()
+        with self._lock:
+            for key, text, difficulty, answers, correct in questions:
+                stats = QuestionStats(key, text, difficulty)
+                stats.attempts, stats.correct = answers, correct
+                self._stats[key] = stats
+            for key, option, is_correct, chosen in options:
+                if key in self._stats:
+                    self._stats[key].options[option] = [is_correct, chosen]
+            self._flagged = {k for k, s in self._stats.items() if s.is_flagged()}
+
+    def record_answer(self, text: str, details: Dict[str, Any]) -> None:
+        key = question_key(text)
+        counts = option_counts(details)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = QuestionStats(key, text, str(details.get("difficulty") or "Unknown"))
+                self._stats[key] = stats
+            stats.add(bool(details.get("is_correct")), counts)
+            if stats.is_flagged():
+                self._flagged.add(key)
+            else:
+                self._flagged.discard(key)
+
+    def record_result(self, result: Dict[str, Any]) -> None:
+        for qtype in QUESTION_TYPES:
+            section = result.get(qtype) or {}
+            if not isinstance(section, dict):
+                continue
+            for text, details in section.items():
+                if isinstance(details, dict):
+                    self.record_answer(text, details)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            stats = self._stats.get(key)
+            return stats.report() if stats else None
+
+    def lookup(self, text: str) -> Optional[Dict[str, Any]]:
+        return self.get(question_key(text))
+
+    def flagged(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Flagged questions, most-attempted first."""
+        with self._lock:
+            stats = sorted(
+                (self._stats[k] for k in self._flagged),
+                key=lambda s: s.attempts, reverse=True,
+            )[:limit]
+            return [s.report() for s in stats]
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+
+_index: Optional[CalibrationIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_calibration_index() -> CalibrationIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CalibrationIndex(get_analytics_store())
+    return _index
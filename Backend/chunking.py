@@ -0,0 +1,242 @@
+import os
+import re
+import hashlib
+from collections import Counter
+from itertools import chain, islice
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+# Whole pages / slides are packed into chunks of up to CHUNK_MAX_CHARS;
+# only a page longer than that is split (with overlap).
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1500"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# Header / footer lines are learned from the first BOILERPLATE_SAMPLE pages.
+BOILERPLATE_SAMPLE = int(os.getenv("BOILERPLATE_SAMPLE", "8"))
+# Chunks whose SimHash differs from a kept chunk in at most this many bits
+# are dropped as near-duplicates (must be < 4: see SimHashIndex).
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", "3"))
+
+
+class ChunkStats:
+    """Counters for one document's trip through the chunker."""
+
+    __slots__ = ("pages", "boilerplate_lines", "chunks", "duplicates")
+
+    def __init__(self):
+        self.pages = 0
+        self.boilerplate_lines = 0
+        self.chunks = 0
+        self.duplicates = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# -------------------------------------------------
+# HEADERS / FOOTERS
+# -------------------------------------------------
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_line(line: str) -> str:
+    """Case-, whitespace- and number-insensitive form ('Page 3 of 40' == 'page 7 of 40')."""
+    return _DIGITS_RE.sub("#", _SPACE_RE.sub(" ", line.strip().lower()))
+
+
+class BoilerplateFilter:
+    """
+    Strips header and footer lines that repeat across pages.
+
+    A line counts as boilerplate when its normalized form appears within
+    the first or last `edge_lines` lines of at least `min_ratio` of the
+    sampled pages. Only leading and trailing runs of such lines are removed,
+    so a repeated phrase in the body of a page is kept.
+    """
+
+    def __init__(self, edge_lines: int = 3, min_ratio: float = 0.5):
+        self.edge_lines = edge_lines
+        self.min_ratio = min_ratio
+        self.repeated: Set[str] = set()
+
+    def learn(self, pages: List[str]) -> None:
+        counts: Counter = Counter()
+        for text in pages:
+            lines = [l for l in text.splitlines() if l.strip()]
+            edges = lines[: self.edge_lines] + lines[-self.edge_lines:]
+            counts.update({normalize_line(l) for l in edges})
+        threshold = max(2, self.min_ratio * len(pages))
+        self.repeated = {line for line, n in counts.items() if n >= threshold}
+
+    def clean(self, text: str) -> Tuple[str, int]:
+        """(text without leading/trailing boilerplate lines, lines removed)."""
+        if not self.repeated:
+            return text, 0
+        # Blank lines are skipped over at the edges only: the interior of
+        # the page is kept verbatim, paragraph breaks included.
+        def strippable(line: str) -> bool:
+            return not line.strip() or normalize_line(line) in self.repeated
+
+        lines = text.splitlines()
+        start, end = 0, len(lines)
+        while start < end and strippable(lines[start]):
+            start += 1
+        while end > start and strippable(lines[end - 1]):
+            end -= 1
+        removed = sum(bool(l.strip()) for l in lines[:start] + lines[end:])
+        return "\n".join(lines[start:end]), removed
+
+
+# -------------------------------------------------
+# NEAR-DUPLICATE DETECTION (SimHash)
+# -------------------------------------------------
+_WORD_RE = re.compile(r"\w+")
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word 3-shingles (words, for very short texts)."""
+    words = _WORD_RE.findall(text.lower())
+    features = [" ".join(words[i:i + 3]) for i in range(len(words) - 2)] or words or [text]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little")
+         for f in features],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> _BITS) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(features)
+    return int(np.sum(np.where(votes > 0, np.uint64(1) << _BITS, np.uint64(0)), dtype=np.uint64))
+
+
+class SimHashIndex:
+    """
+    Set of fingerprints answering "is anything within max_distance bits?".
+
+    Fingerprints are bucketed by four 16-bit bands; two fingerprints at
+    most 3 bits apart agree exactly on at least one band, so only the
+    bucket-mates need a popcount.
+    """
+
+    _BANDS = 4
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = min(max_distance, self._BANDS - 1)
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self._BANDS)]
+
+    def _bands(self, fp: int) -> List[int]:
+        return [(fp >> (16 * b)) & 0xFFFF for b in range(self._BANDS)]
+
+    def seen_or_add(self, fp: int) -> bool:
+        bands = self._bands(fp)
+        for bucket, band in zip(self._buckets, bands):
+            for other in bucket.get(band, ()):
+                if bin(fp ^ other).count("1") <= self.max_distance:
+                    return True
+        for bucket, band in zip(self._buckets, bands):
+            bucket.setdefault(band, []).append(fp)
+        return False
+
+
+# -------------------------------------------------
+# STRUCTURE-AWARE CHUNKER
+# -------------------------------------------------
+def make_page_splitter(
+    chunk_size: int = CHUNK_MAX_CHARS, chunk_overlap: int = CHUNK_OVERLAP
+) -> "RecursiveCharacterTextSplitter":
+    """Splitter for pages too long to be one chunk (paragraphs, then lines, ...)."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def iter_structured_chunks(
+    pages: Iterable[Tuple[int, str]],
+    splitter: Optional[Any] = None,
+    max_chars: int = CHUNK_MAX_CHARS,
+    strip_boilerplate: bool = True,
+    dedupe: bool = True,
+    stats: Optional[ChunkStats] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Chunk a numbered page stream along page / slide boundaries, yielding
+    (start_page, chunk).
+
+    - Header / footer lines repeated across the first BOILERPLATE_SAMPLE
+      pages are stripped from every page (only those pages are buffered).
+    - Near-duplicate pages (SimHash) are dropped before packing, so they
+      are never embedded.
+    - Consecutive whole pages are packed into one chunk up to max_chars,
+      so chunks start and end on page boundaries. A page longer than that
+      is split with `splitter`, together with the pages buffered before
+      it; its last piece is packed with the following pages.
+    """
+    stats = stats if stats is not None else ChunkStats()
+    splitter = splitter or make_page_splitter(max_chars)
+    seen = SimHashIndex() if dedupe else None
+    boilerplate = BoilerplateFilter()
+
+    pages = iter(pages)
+    if strip_boilerplate:
+        head = list(islice(pages, BOILERPLATE_SAMPLE))
+        boilerplate.learn([text for _, text in head])
+        pages = chain(head, pages)
+
+    def is_duplicate(text: str) -> bool:
+        if seen is not None and seen.seen_or_add(simhash(text)):
+            stats.duplicates += 1
+            return True
+        return False
+
+    def emit(page: int, text: str) -> Iterator[Tuple[int, str]]:
+        stats.chunks += 1
+        yield page, text
+
+    buffer: List[str] = []
+    buffer_page = 0
+    buffer_len = 0
+    for number, text in pages:
+        stats.pages += 1
+        text, removed = boilerplate.clean(text)
+        stats.boilerplate_lines += removed
+        text = text.strip()
+        if not text:
+            continue
+
+        if len(text) > max_chars:
+            # Too long for one chunk: split it together with the buffered
+            # pages and carry the last piece forward. Pages stay separated
+            # by a blank line, so a page's first line still starts a block.
+            start_page = buffer_page if buffer else number
+            parts = splitter.split_text("\n\n".join(buffer + [text]))
+            for i, part in enumerate(parts[:-1]):
+                if not is_duplicate(part):
+                    yield from emit(start_page if i == 0 else number, part)
+            buffer = [parts[-1]]
+            buffer_page = start_page if len(parts) == 1 else number
+            buffer_len = len(parts[-1])
+            continue
+
+        # Whole pages are de-duplicated before packing (repeated agenda,
+        # "Questions?" and section-divider slides).
+        if is_duplicate(text):
+            continue
+        if buffer and buffer_len + len(text) + 2 > max_chars:
+            yield from emit(buffer_page, "\n\n".join(buffer))
+            buffer, buffer_len = [], 0
+        if not buffer:
+            buffer_page = number
+        buffer.append(text)
+        buffer_len += len(text) + (2 if len(buffer) > 1 else 0)
+
+    if buffer:
+        yield from emit(buffer_page, "\n\n".join(buffer))
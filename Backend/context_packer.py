@@ -0,0 +1,189 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from lexical import tokenize
+from retrieval import normalize_rows
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+# Context budget (estimated tokens) for an MCQ prompt: this many per
+# question, clamped to [CONTEXT_MIN_TOKENS, CONTEXT_MAX_TOKENS].
+CONTEXT_TOKENS_PER_QUESTION = int(os.getenv("CONTEXT_TOKENS_PER_QUESTION", "150"))
+CONTEXT_MIN_TOKENS = int(os.getenv("CONTEXT_MIN_TOKENS", "1200"))
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "8000"))
+# Retrieved chunks the packer chooses from.
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "20"))
+# MMR trade-off: 1.0 ranks by relevance only, lower values favour diversity.
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# Shared text shorter than this between two chunks is not trimmed.
+OVERLAP_MIN_CHARS = int(os.getenv("CONTEXT_OVERLAP_MIN_CHARS", "40"))
+# Chunks per prompt before packing; tokens saved are reported against it.
+BASELINE_CHUNKS = 5
+
+
+class ContextStats:
+    """Token accounting for one request's prompt context (estimated tokens)."""
+
+    __slots__ = ("candidates", "selected", "budget", "tokens", "baseline_tokens", "trimmed_tokens")
+
+    def __init__(self):
+        self.candidates = 0
+        self.selected = 0
+        self.budget = 0
+        self.tokens = 0
+        self.baseline_tokens = 0
+        self.trimmed_tokens = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        """Against joining the top BASELINE_CHUNKS chunks as they are."""
+        return self.baseline_tokens - self.tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        out = {name: getattr(self, name) for name in self.__slots__}
+        out["tokens_saved"] = self.tokens_saved
+        return out
+
+
+# -------------------------------------------------
+# TOKEN ESTIMATION
+# -------------------------------------------------
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local estimate of a text's token count: one token per punctuation mark
+    and per started 4 characters of each word. Close to subword tokenizers
+    on English prose, and counted without an API call.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _PIECE_RE.findall(text))
+
+
+def context_budget(num_questions: int) -> int:
+    return max(CONTEXT_MIN_TOKENS, min(CONTEXT_MAX_TOKENS, CONTEXT_TOKENS_PER_QUESTION * num_questions))
+
+
+# -------------------------------------------------
+# OVERLAP
+# -------------------------------------------------
+def overlap_chars(first: str, second: str, min_chars: int = OVERLAP_MIN_CHARS) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second`."""
+    if len(first) < min_chars or len(second) < min_chars:
+        return 0
+    probe = second[:min_chars]
+    start = first.find(probe, max(0, len(first) - len(second)))
+    while start >= 0:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(probe, start + 1)
+    return 0
+
+
+# -------------------------------------------------
+# PACKING
+# -------------------------------------------------
+def _similarity(candidates: Sequence[str], vectors: Optional[np.ndarray]) -> np.ndarray:
+    """Pairwise cosine similarity, or term-set Jaccard without vectors."""
+    if vectors is not None and len(vectors) == len(candidates):
+        unit = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        return unit @ unit.T
+    terms = [set(tokenize(c)) for c in candidates]
+    n = len(candidates)
+    sims = np.eye(n, dtype=np.float32)
+    for i in range(n):
+        for j in range(i + 1, n):
+            union = len(terms[i] | terms[j])
+            sims[i, j] = sims[j, i] = len(terms[i] & terms[j]) / union if union else 0.0
+    return sims
+
+
+def pack_context(
+    candidates: Sequence[str],
+    budget: int,
+    vectors: Optional[np.ndarray] = None,
+    positions: Optional[Sequence[Any]] = None,
+    baseline_chunks: int = BASELINE_CHUNKS,
+    mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+    stats: Optional[ContextStats] = None,
+) -> List[Tuple[int, str]]:
+    """
+    Choose chunks for a prompt from ranked candidates (best first), within
+    `budget` estimated tokens. Returns (candidate index, text) pairs.
+
+    - Maximal marginal relevance: each pick maximizes
+      lambda * relevance - (1 - lambda) * max similarity to the picks so
+      far, relevance falling linearly with rank. Similarity is cosine over
+      `vectors` (one row per candidate) or term overlap without them.
+    - A candidate that no longer fits the budget is skipped; the best one
+      is always taken.
+    - Picks are returned in document order (`positions`, any sortable key
+      such as a chunk index; rank order without them), and text a chunk
+      shares with the end of the previous one (the splitter's overlap) is
+      trimmed from its start.
+    """
+    stats = stats if stats is not None else ContextStats()
+    n = len(candidates)
+    stats.candidates = n
+    stats.budget = budget
+    stats.baseline_tokens = estimate_tokens("\n\n".join(candidates[:baseline_chunks]))
+    if n == 0:
+        return []
+
+    tokens = [estimate_tokens(c) for c in candidates]
+    sims = _similarity(candidates, vectors)
+    relevance = 1.0 - np.arange(n, dtype=np.float32) / n
+    # overlaps[i][j]: characters of j's start repeated at the end of i.
+    overlaps = [
+        [overlap_chars(candidates[i], candidates[j]) if i != j else 0 for j in range(n)]
+        for i in range(n)
+    ]
+
+    def cost(i: int, chosen: List[int]) -> int:
+        shared = max((max(overlaps[j][i], overlaps[i][j]) for j in chosen), default=0)
+        if not shared:
+            return tokens[i]
+        return max(0, tokens[i] - estimate_tokens(candidates[i][:shared]))
+
+    chosen = [0]
+    used = tokens[0]
+    redundancy = sims[0].copy()
+    remaining = set(range(1, n))
+    while remaining:
+        order = sorted(
+            remaining,
+            key=lambda i: -(mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy[i]),
+        )
+        pick = next((i for i in order if used + cost(i, chosen) <= budget), None)
+        if pick is None:
+            break
+        used += cost(pick, chosen)
+        chosen.append(pick)
+        remaining.discard(pick)
+        redundancy = np.maximum(redundancy, sims[pick])
+
+    if positions is not None:
+        chosen.sort(key=lambda i: positions[i])
+
+    packed: List[Tuple[int, str]] = []
+    previous: Optional[int] = None
+    for i in chosen:
+        text = candidates[i]
+        shared = overlaps[previous][i] if previous is not None else 0
+        if shared:
+            stats.trimmed_tokens += estimate_tokens(text[:shared])
+            text = text[shared:].lstrip()
+        if text:
+            packed.append((i, text))
+        previous = i
+
+    stats.selected = len(packed)
+    stats.tokens = estimate_tokens("\n\n".join(text for _, text in packed))
+    return packed
@@ -0,0 +1,179 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+CACHE_DIR = os.getenv(
+    "SMARTEDU_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.db")
+)
+# In-process LRU budget, in bytes of float32 vector data (default 64 MB).
+EMBEDDING_CACHE_MEMORY_BYTES = int(
+    os.getenv("EMBEDDING_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024))
+)
+
+
+def embedding_key(text: str, model: str) -> str:
+    """Content address of one embedding: sha256 over model name + chunk text."""
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+# -------------------------------------------------
+# IN-PROCESS LRU LAYER
+# -------------------------------------------------
+class _LRUVectors:
+    """Byte-bounded LRU of float32 vectors. Not thread-safe on its own."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        vec = self._items.get(key)
+        if vec is not None:
+            self._items.move_to_end(key)
+        return vec
+
+    def put(self, key: str, vec: np.ndarray) -> None:
+        if vec.nbytes > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self._items[key] = vec
+        self.nbytes += vec.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# -------------------------------------------------
+# PERSISTENT CACHE (SQLITE + LRU)
+# -------------------------------------------------
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache.
+
+    Lookups go to the in-process LRU first, then to a local SQLite file.
+    Vectors are stored as raw float32 bytes, so a disk hit is one row read
+    plus np.frombuffer, with no JSON decoding.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = EMBEDDING_CACHE_PATH,
+        max_memory_bytes: int = EMBEDDING_CACHE_MEMORY_BYTES,
+    ):
+        self._lock = threading.Lock()
+        self._memory = _LRUVectors(max_memory_bytes)
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key   TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    dim   INTEGER NOT NULL,
+                    vec   BLOB NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    def get_many(self, texts: Sequence[str], model: str) -> List[Optional[np.ndarray]]:
+        """Return one vector (or None on miss) per input text, in order."""
+        keys = [embedding_key(t, model) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        disk_keys = []
+
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    found[key] = vec
+                else:
+                    disk_keys.append(key)
+
+            if disk_keys and self._conn is not None:
+                unique = list(dict.fromkeys(disk_keys))
+                # Stay well under SQLite's bound-parameter limit.
+                for start in range(0, len(unique), 500):
+                    batch = unique[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vec
+                        self._memory.put(key, vec)
+
+        return [found.get(key) for key in keys]
+
+    def put_many(
+        self, texts: Sequence[str], vectors: Sequence[Sequence[float]], model: str
+    ) -> None:
+        rows = []
+        with self._lock:
+            for text, values in zip(texts, vectors):
+                key = embedding_key(text, model)
+                vec = np.asarray(values, dtype=np.float32)
+                self._memory.put(key, vec)
+                rows.append((key, model, int(vec.shape[0]), vec.tobytes()))
+
+            if rows and self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dim, vec) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+
+    def memory_items(self) -> int:
+        return len(self._memory)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache shared by every caller of rag.embed_texts."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = EmbeddingCache()
+    return _default_cache
@@ -1,10 +1,19 @@
 import os
 import json
-from typing import Any, Dict, Optional
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 import re
-import requests
+import numpy as np
 from dotenv import load_dotenv
 
+from embedding_cache import CACHE_DIR
+from gemini_client import GENERATION_MODEL, generate_content, generate_content_async
+from llm_json import parse_json_object
+from metrics import cache_result, llm_replies, timed
+from ttl_cache import TTLCache
+
 # -------------------------------------------------
 # ENV + GEMINI CONFIG
 # -------------------------------------------------
@@ -14,29 +23,55 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY is not set.")
 
-GEMINI_MODEL = "gemini-2.5-flash"
-GEMINI_ENDPOINT = (
-    f"https://generativelanguage.googleapis.com/v1beta/models/"
-    f"{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+GEMINI_MODEL = GENERATION_MODEL
+
+QUESTION_TYPES = ["mcq", "multiple_correct", "fill_in_the_blanks", "true_false"]
+
+# Question text is cut to this many characters in the prompt.
+QUESTION_STEM_CHARS = int(os.getenv("FEEDBACK_STEM_CHARS", "80"))
+
+# Part of the feedback cache key: bump whenever the prompt changes.
+FEEDBACK_PROMPT_VERSION = 2
+FEEDBACK_CACHE_SIZE = int(os.getenv("FEEDBACK_CACHE_SIZE", "2048"))
+FEEDBACK_CACHE_TTL = float(os.getenv("FEEDBACK_CACHE_TTL", str(30 * 24 * 3600)))
+FEEDBACK_CACHE_PERSIST = os.getenv("FEEDBACK_CACHE_PERSIST", "1") == "1"
+
+# Batch feedback: students per LLM call are limited by an estimated prompt
+# token budget (~4 characters per token) and a hard group size.
+FEEDBACK_BATCH_TOKEN_BUDGET = int(os.getenv("FEEDBACK_BATCH_TOKEN_BUDGET", "6000"))
+FEEDBACK_BATCH_MAX_GROUP = int(os.getenv("FEEDBACK_BATCH_MAX_GROUP", "8"))
+FEEDBACK_BATCH_CONCURRENCY = int(os.getenv("FEEDBACK_BATCH_CONCURRENCY", "4"))
+
+FEEDBACK_KEYS = [
+    "overall_performance",
+    "strengths",
+    "areas_for_improvement",
+    "question_type_breakdown",
+    "next_steps",
+]
+
+feedback_cache = TTLCache(
+    max_items=FEEDBACK_CACHE_SIZE,
+    ttl=FEEDBACK_CACHE_TTL,
+    db_path=os.path.join(CACHE_DIR, "feedback.db") if FEEDBACK_CACHE_PERSIST else None,
+    table="feedback",
 )
 
 # -------------------------------------------------
 # CALL GEMINI
 # -------------------------------------------------
 def call_gemini(prompt: str) -> Optional[str]:
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {"temperature": 0}   # FORCE STRICT JSON
-    }
+    return generate_content(
+        prompt,
+        model=GEMINI_MODEL,
+        generation_config={"temperature": 0},   # FORCE STRICT JSON
+    )
 
-    resp = requests.post(GEMINI_ENDPOINT, json=payload)
-    resp.raise_for_status()
-    data = resp.json()
 
-    try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
-    except:
-        return None
+async def call_gemini_async(prompt: str) -> Optional[str]:
+    return await generate_content_async(
+        prompt, model=GEMINI_MODEL, generation_config={"temperature": 0}
+    )
 
 # -------------------------------------------------
 # BUILD STRICT JSON PROMPT
@@ -48,7 +83,7 @@ def compute_basic_stats(result: Dict[str, Any]) -> Dict[str, Any]:
     accuracy = (score / total) if total else 0
     per_type = {}
 
-    for key in ["mcq", "multiple_correct", "fill_in_the_blanks", "true_false"]:
+    for key in QUESTION_TYPES:
         section = result.get(key, {})
         if isinstance(section, dict) and section:
             correct = sum(1 for q, d in section.items() if d.get("is_correct"))
@@ -61,19 +96,73 @@ def compute_basic_stats(result: Dict[str, Any]) -> Dict[str, Any]:
         "by_type": per_type,
     }
 
-def build_feedback_prompt(result: Dict[str, Any]) -> str:
+def _answer_text(answer: Any, options: List[str]) -> str:
+    """Resolve option letters ("A", ["A", "C"]) to option text where possible."""
+    if isinstance(answer, list):
+        return " | ".join(_answer_text(a, options) for a in answer)
+    answer = "" if answer is None else str(answer)
+    if len(answer) == 1 and answer.isalpha() and options:
+        idx = ord(answer.upper()) - ord("A")
+        if 0 <= idx < len(options):
+            return re.sub(r"^[A-Z]\)\s*", "", str(options[idx]))
+    return answer
+
+
+def encode_result_compact(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a student result to what the feedback model needs.
+
+    Each question becomes a row [id, stem, correct] for right answers and
+    [id, stem, correct, chosen, expected] for wrong ones. Option lists,
+    the user ID and other fields are dropped, so identical answer sheets
+    encode identically.
+    """
     stats = compute_basic_stats(result)
-    result_json_str = json.dumps(result, indent=2)
+    rows = []
+    for qtype in QUESTION_TYPES:
+        section = result.get(qtype, {})
+        if not isinstance(section, dict):
+            continue
+        for n, (question, d) in enumerate(section.items(), start=1):
+            row = [f"{qtype}{n}", question[:QUESTION_STEM_CHARS], int(bool(d.get("is_correct")))]
+            if not d.get("is_correct"):
+                options = d.get("options") or []
+                chosen = d.get("chosen_options", d.get("chosen_option"))
+                expected = d.get("correct_options", d.get("correct_option"))
+                row += [_answer_text(chosen, options), _answer_text(expected, options)]
+            rows.append(row)
+
+    return {
+        "score": stats["score"],
+        "total": stats["total"],
+        "accuracy": round(stats["accuracy"], 3),
+        "by_type": {k: round(v, 3) for k, v in stats["by_type"].items()},
+        "q": rows,
+    }
+
+
+def dumps_compact(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def feedback_cache_key(encoded: Dict[str, Any], prompt: str = "single") -> str:
+    """`prompt` is the prompt kind that produced the reply: "single" or "group"."""
+    raw = f"{FEEDBACK_PROMPT_VERSION}:{prompt}:{GEMINI_MODEL}:{dumps_compact(encoded)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def build_feedback_prompt(result: Dict[str, Any], encoded: Optional[Dict[str, Any]] = None) -> str:
+    encoded = encoded or encode_result_compact(result)
 
     return f"""
 You are an educational evaluation AI.
 You MUST return ONLY a valid JSON object. No markdown. No headings. No lists.
 
-STUDENT RESULT:
-{result_json_str}
+STUDENT RESULT (compact):
+{dumps_compact(encoded)}
 
-STATS:
-{stats}
+Key: score/total/accuracy are overall; by_type is accuracy per question type.
+Each row of "q" is [id, question, correct(1/0)]; wrong answers add [chosen, expected].
 
 OUTPUT FORMAT (STRICT):
 
@@ -97,38 +186,361 @@ Return ONLY the JSON. Nothing else.
 # -------------------------------------------------
 # MAIN ENTRYPOINT
 # -------------------------------------------------
+def _lookup_feedback(result: Dict[str, Any]) -> Tuple[Dict[str, Any], str, Optional[str]]:
+    """(compact encoding, cache key, cached reply or None)."""
+    encoded = encode_result_compact(result)
+    key = feedback_cache_key(encoded)
+    cached = feedback_cache.get(key)
+    cache_result("feedback", cached is not None)
+    return encoded, key, cached
+
+
+def _store_feedback(key: str, raw: Optional[str]) -> str:
+    if not raw:
+        return "{}"
+    # Only replies that parse (after repair) are cached, so a bad one is
+    # regenerated next time instead of being served for the cache TTL.
+    if parse_json_object(raw)[0] is not None:
+        feedback_cache.set(key, raw)
+    return raw
+
+
 def generate_feedback_from_result(result: Dict[str, Any]) -> str:
-    prompt = build_feedback_prompt(result)
-    return call_gemini(prompt) or "{}"
+    """
+    Temperature-0 feedback is deterministic for a given encoding, so
+    replies are cached by a hash of it and identical results return at once.
+    """
+    encoded, key, cached = _lookup_feedback(result)
+    if cached is not None:
+        return cached
+
+    with timed("feedback_generate"):
+        raw = call_gemini(build_feedback_prompt(result, encoded))
+    return _store_feedback(key, raw)
+
+
+async def generate_feedback_from_result_async(result: Dict[str, Any]) -> str:
+    """generate_feedback_from_result on the async Gemini client."""
+    encoded, key, cached = _lookup_feedback(result)
+    if cached is not None:
+        return cached
+
+    with timed("feedback_generate"):
+        raw = await call_gemini_async(build_feedback_prompt(result, encoded))
+    return _store_feedback(key, raw)
 
 # -------------------------------------------------
 # STRICT JSON NORMALIZER
 # -------------------------------------------------
 def normalize_to_feedback_json(text: str) -> dict:
-    # Remove code blocks
-    cleaned = re.sub(r"```[\s\S]*?```", "", text).strip()
-
-    # Extract first {...} JSON object
-    match = re.search(r"\{[\s\S]*\}", cleaned)
-    if not match:
+    """
+    The feedback object in an LLM reply, with every FEEDBACK_KEYS key
+    present. Fences, surrounding prose, trailing commas and truncation are
+    repaired (see llm_json.parse_json_object); {} if nothing is usable.
+    """
+    parsed, result = parse_json_object(text)
+    llm_replies.inc(1, "feedback", result)
+    if parsed is None:
+        print(f"⚠️ Feedback reply is not JSON: {(text or '')[:200]!r}")
         return {}
 
-    cleaned = match.group(0)
+    # Ensure required keys
+    template = {key: "" for key in FEEDBACK_KEYS}
+    template.update(parsed)
+    return template
 
-    # Parse JSON
-    try:
-        parsed = json.loads(cleaned)
-    except:
-        return {}
 
-    # Ensure required keys
-    template = {
-        "overall_performance": "",
-        "strengths": "",
-        "areas_for_improvement": "",
-        "question_type_breakdown": "",
-        "next_steps": ""
+# -------------------------------------------------
+# BATCH (WHOLE CLASS) FEEDBACK
+# -------------------------------------------------
+_batch_executor = ThreadPoolExecutor(
+    max_workers=FEEDBACK_BATCH_CONCURRENCY, thread_name_prefix="feedback"
+)
+
+
+def check_result(result: Any) -> None:
+    """Raises ValueError if compute_batch_stats can't score the result."""
+    if not isinstance(result, dict):
+        raise ValueError("result is not a JSON object")
+    for field in ("score", "total_questions"):
+        value = result.get(field, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{field} is not a number: {value!r}")
+    for qtype in QUESTION_TYPES:
+        section = result.get(qtype) or {}
+        if not isinstance(section, dict):
+            continue
+        for text, d in section.items():
+            if not isinstance(d, dict):
+                raise ValueError(f"{qtype} entry for {str(text)[:60]!r} is not an object")
+
+
+def split_results(results: List[Any]) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """(indexes of usable results, {index, userID, error} for each malformed one)."""
+    valid, skipped = [], []
+    for i, result in enumerate(results):
+        try:
+            check_result(result)
+            valid.append(i)
+        except ValueError as e:
+            user_id = result.get("userID") if isinstance(result, dict) else None
+            skipped.append({"index": i, "userID": user_id, "error": str(e)})
+    return valid, skipped
+
+
+def compute_batch_stats(results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    compute_basic_stats for many results at once, plus class aggregates.
+
+    Answers are flattened into (student, type, is_correct) arrays once and
+    every count is a single np.bincount over them. Results must pass
+    check_result.
+    """
+    n, t = len(results), len(QUESTION_TYPES)
+    scores = np.array([r.get("score", 0) for r in results], dtype=np.float64)
+    totals = np.array([r.get("total_questions", 0) for r in results], dtype=np.float64)
+
+    student_idx, type_idx, correct = [], [], []
+    for i, result in enumerate(results):
+        for j, qtype in enumerate(QUESTION_TYPES):
+            section = result.get(qtype, {})
+            if not isinstance(section, dict):
+                continue
+            for d in section.values():
+                student_idx.append(i)
+                type_idx.append(j)
+                correct.append(bool(d.get("is_correct")))
+
+    cell = np.array(student_idx, dtype=np.int64) * t + np.array(type_idx, dtype=np.int64)
+    answered = np.bincount(cell, minlength=n * t).reshape(n, t)
+    right = np.bincount(
+        cell, weights=np.array(correct, dtype=np.float64), minlength=n * t
+    ).reshape(n, t)
+
+    accuracy = np.divide(scores, totals, out=np.zeros(n), where=totals > 0)
+    by_type = np.divide(right, answered, out=np.zeros((n, t)), where=answered > 0)
+
+    per_student = [
+        {
+            "score": results[i].get("score", 0),
+            "total": results[i].get("total_questions", 0),
+            "accuracy": float(accuracy[i]),
+            "by_type": {
+                qtype: float(by_type[i, j])
+                for j, qtype in enumerate(QUESTION_TYPES) if answered[i, j]
+            },
+        }
+        for i in range(n)
+    ]
+
+    type_answered = answered.sum(axis=0)
+    type_right = right.sum(axis=0)
+    class_stats = {
+        "students": n,
+        "mean_accuracy": float(accuracy.mean()) if n else 0.0,
+        "median_accuracy": float(np.median(accuracy)) if n else 0.0,
+        "min_accuracy": float(accuracy.min()) if n else 0.0,
+        "max_accuracy": float(accuracy.max()) if n else 0.0,
+        "by_type": {
+            qtype: float(type_right[j] / type_answered[j])
+            for j, qtype in enumerate(QUESTION_TYPES) if type_answered[j]
+        },
     }
+    return per_student, class_stats
+
+
+def plan_feedback_groups(
+    encoded: List[Dict[str, Any]],
+    token_budget: int = FEEDBACK_BATCH_TOKEN_BUDGET,
+    max_group: int = FEEDBACK_BATCH_MAX_GROUP,
+) -> List[List[int]]:
+    """Greedily pack student indexes into groups under the prompt budget."""
+    groups: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, enc in enumerate(encoded):
+        tokens = len(dumps_compact(enc)) // 4 + 1
+        if current and (used + tokens > token_budget or len(current) >= max_group):
+            groups.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def build_group_feedback_prompt(encoded: Dict[str, Dict[str, Any]]) -> str:
+    students = "\n".join(f"{sid}: {dumps_compact(enc)}" for sid, enc in encoded.items())
+    ids = ", ".join(encoded)
+
+    return f"""
+You are an educational evaluation AI.
+You MUST return ONLY a valid JSON object. No markdown. No headings. No lists.
+
+Below are the results of {len(encoded)} students, one per line as <id>: <result>.
+Key: score/total/accuracy are overall; by_type is accuracy per question type.
+Each row of "q" is [id, question, correct(1/0)]; wrong answers add [chosen, expected].
+
+STUDENT RESULTS (compact):
+{students}
+
+OUTPUT FORMAT (STRICT): one entry per student id ({ids}), each exactly:
+
+{{
+  "<student id>": {{
+    "overall_performance": "text only",
+    "strengths": "text only",
+    "areas_for_improvement": "text only",
+    "question_type_breakdown": "text only",
+    "next_steps": "text only"
+  }}
+}}
+
+RULES:
+- Output MUST start with '{{' and end with '}}'.
+- No markdown (#, *, **).
+- No explanations outside the JSON.
+- Each key must contain ONE plain paragraph about that student only.
+
+Return ONLY the JSON. Nothing else.
+"""
+
+
+def _parse_group_reply(
+    group: List[int], raw: Optional[str], encoded: List[Dict[str, Any]]
+) -> Dict[int, dict]:
+    """
+    The students a group reply covers. Each is cached on its own, under
+    the group prompt's key: single-result calls never serve them.
+    """
+    feedback: Dict[int, dict] = {}
+    parsed = normalize_to_feedback_json(raw or "")
+    for i in group:
+        entry = parsed.get(f"s{i}")
+        if isinstance(entry, dict):
+            feedback[i] = {key: entry.get(key, "") for key in FEEDBACK_KEYS}
+            feedback_cache.set(feedback_cache_key(encoded[i], "group"), json.dumps(feedback[i]))
+    return feedback
+
+
+def _run_feedback_group(
+    group: List[int], results: List[Dict[str, Any]], encoded: List[Dict[str, Any]]
+) -> Dict[int, dict]:
+    """
+    One LLM call for a group; students it misses (or all of them, if the
+    call fails) fall back to single calls. A student whose own call fails
+    gets an error entry, so one failure never costs the rest of the batch.
+    """
+    feedback: Dict[int, dict] = {}
+    if len(group) > 1:
+        prompt = build_group_feedback_prompt({f"s{i}": encoded[i] for i in group})
+        try:
+            with timed("feedback_group_generate"):
+                raw = call_gemini(prompt)
+            feedback = _parse_group_reply(group, raw, encoded)
+        except Exception as e:
+            print(f"⚠️ Group feedback call failed, falling back to single calls: {e}")
+
+    for i in group:
+        if i not in feedback:
+            try:
+                feedback[i] = normalize_to_feedback_json(generate_feedback_from_result(results[i]))
+            except Exception as e:
+                feedback[i] = _failed_feedback(e)
+    return feedback
+
+
+def _failed_feedback(e: Exception) -> dict:
+    print(f"⚠️ Feedback call failed: {e}")
+    return {"error": str(e)}
+
+
+def _split_cached(
+    results: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Tuple[int, dict]], List[List[int]]]:
+    """
+    (encodings, cached (index, feedback) pairs, groups of uncached indexes).
+    A batch serves either prompt's cached reply.
+    """
+    encoded = [encode_result_compact(r) for r in results]
+    cached_feedback, pending = [], []
+    for i, enc in enumerate(encoded):
+        cached = feedback_cache.get(feedback_cache_key(enc))
+        if cached is None:
+            cached = feedback_cache.get(feedback_cache_key(enc, "group"))
+        cache_result("feedback", cached is not None)
+        if cached is not None:
+            cached_feedback.append((i, normalize_to_feedback_json(cached)))
+        else:
+            pending.append(i)
+    groups = plan_feedback_groups([encoded[i] for i in pending])
+    return encoded, cached_feedback, [[pending[j] for j in group] for group in groups]
+
+
+def iter_batch_feedback(
+    results: List[Dict[str, Any]],
+) -> Iterator[Tuple[int, dict]]:
+    """
+    Yield (index, feedback) for every result as soon as its group finishes.
+    Cached students are yielded first without an LLM call; the rest are
+    grouped under the prompt budget and the groups run concurrently.
+    """
+    encoded, cached_feedback, groups = _split_cached(results)
+    yield from cached_feedback
+    futures = [
+        _batch_executor.submit(_run_feedback_group, group, results, encoded)
+        for group in groups
+    ]
+    for fut in as_completed(futures):
+        yield from fut.result().items()
+
+
+async def _run_feedback_group_async(
+    group: List[int],
+    results: List[Dict[str, Any]],
+    encoded: List[Dict[str, Any]],
+    slots: asyncio.Semaphore,
+) -> Dict[int, dict]:
+    """_run_feedback_group on the async client."""
+    async with slots:
+        feedback: Dict[int, dict] = {}
+        if len(group) > 1:
+            prompt = build_group_feedback_prompt({f"s{i}": encoded[i] for i in group})
+            try:
+                with timed("feedback_group_generate"):
+                    raw = await call_gemini_async(prompt)
+                feedback = _parse_group_reply(group, raw, encoded)
+            except Exception as e:
+                print(f"⚠️ Group feedback call failed, falling back to single calls: {e}")
+
+        for i in group:
+            if i not in feedback:
+                try:
+                    raw = await generate_feedback_from_result_async(results[i])
+                    feedback[i] = normalize_to_feedback_json(raw)
+                except Exception as e:
+                    feedback[i] = _failed_feedback(e)
+        return feedback
+
+
+async def iter_batch_feedback_async(
+    results: List[Dict[str, Any]],
+) -> AsyncIterator[Tuple[int, dict]]:
+    """iter_batch_feedback on the async client, FEEDBACK_BATCH_CONCURRENCY groups at a time."""
+    encoded, cached_feedback, groups = _split_cached(results)
+    for item in cached_feedback:
+        yield item
+    slots = asyncio.Semaphore(FEEDBACK_BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_run_feedback_group_async(group, results, encoded, slots))
+        for group in groups
+    ]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            for item in (await fut).items():
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
 
-    template.update(parsed)
-    return template
@@ -0,0 +1,674 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from metrics import REGISTRY
+
+if TYPE_CHECKING:
+    import httpx
+
+# -------------------------------------------------
+# ENV + API CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+# Overridable so the client can be pointed at a local stub server.
+GEMINI_API_BASE = os.getenv(
+    "GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta"
+).rstrip("/")
+
+GENERATION_MODEL = "gemini-2.5-flash"
+EMBEDDING_MODEL = "text-embedding-004"
+
+# Shared connection pool (keep-alive) for every Gemini call in the process.
+HTTP_POOL_SIZE = int(os.getenv("GEMINI_HTTP_POOL_SIZE", "32"))
+GENERATE_TIMEOUT = float(os.getenv("GEMINI_GENERATE_TIMEOUT", "120"))
+GENERATE_MAX_RETRIES = int(os.getenv("GEMINI_GENERATE_MAX_RETRIES", "2"))
+
+# batchEmbedContents accepts at most 100 requests per call.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Batches allowed in flight before submit() blocks the producer.
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", str(2 * EMBED_CONCURRENCY)))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "30"))
+
+# Async client (ASGI mode): connections open to Gemini at once. Requests
+# beyond this wait for a free connection, not for a thread.
+ASYNC_MAX_CONNECTIONS = int(os.getenv("GEMINI_ASYNC_MAX_CONNECTIONS", "256"))
+# Connections are split over this many client pools (see _AsyncClients).
+ASYNC_CLIENTS = int(os.getenv("GEMINI_ASYNC_CLIENTS", "8"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def api_key() -> str:
+    key = os.getenv("GEMINI_API_KEY")
+    if not key:
+        raise ValueError("GEMINI_API_KEY is not set in the environment.")
+    return key
+
+
+def backoff_delay(attempt: int, base: float, retry_after: Optional[str] = None) -> float:
+    """Exponential backoff with full jitter; honours a numeric Retry-After."""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, base * (2 ** attempt))
+
+
+def _gather(futures: List[Future]) -> Future:
+    """Future resolving to the list of results, in order, or the first error."""
+    combined: Future = Future()
+    results: List[Any] = [None] * len(futures)
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    if not futures:
+        combined.set_result([])
+        return combined
+
+    def on_done(i: int, fut: Future):
+        exc = fut.exception()
+        with lock:
+            if combined.done():
+                return
+            if exc is not None:
+                combined.set_exception(exc)
+                return
+            results[i] = fut.result()
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                combined.set_result(results)
+
+    for i, fut in enumerate(futures):
+        fut.add_done_callback(lambda f, i=i: on_done(i, f))
+    return combined
+
+
+# -------------------------------------------------
+# SHARED SESSION + METRICS
+# -------------------------------------------------
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide pooled Session; connections are reused across calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4, pool_maxsize=HTTP_POOL_SIZE
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({
+                    "Content-Type": "application/json",
+                    "Connection": "keep-alive",
+                })
+                _session = session
+    return _session
+
+
+class CallMetrics:
+    """Per-operation call counts, latency and payload sizes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[str, Dict[str, float]] = {}
+
+    def record(
+        self,
+        op: str,
+        seconds: float,
+        sent: int,
+        received: int,
+        retries: int,
+        error: bool,
+    ) -> None:
+        with self._lock:
+            m = self._ops.setdefault(op, {
+                "calls": 0, "errors": 0, "retries": 0, "seconds": 0.0,
+                "max_seconds": 0.0, "bytes_sent": 0, "bytes_received": 0,
+            })
+            m["calls"] += 1
+            m["errors"] += int(error)
+            m["retries"] += retries
+            m["seconds"] += seconds
+            m["max_seconds"] = max(m["max_seconds"], seconds)
+            m["bytes_sent"] += sent
+            m["bytes_received"] += received
+
+    def record_tokens(self, op: str, usage: Optional[Dict[str, Any]]) -> None:
+        """Add a reply's usageMetadata token counts to `op`."""
+        if not isinstance(usage, dict):
+            return
+        with self._lock:
+            m = self._ops.setdefault(op, {})
+            m["prompt_tokens"] = m.get("prompt_tokens", 0) + int(usage.get("promptTokenCount", 0))
+            m["output_tokens"] = m.get("output_tokens", 0) + int(
+                usage.get("candidatesTokenCount", 0)
+            )
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {op: dict(m) for op, m in self._ops.items()}
+
+
+metrics = CallMetrics()
+
+_EXPORTED = (
+    ("calls", "counter", "Gemini API calls."),
+    ("errors", "counter", "Gemini API calls that failed after retries."),
+    ("retries", "counter", "Gemini API retries (throttling, 5xx, connection errors)."),
+    ("seconds", "counter", "Total wall time in Gemini API calls, retries included."),
+    ("bytes_sent", "counter", "Request bytes sent to the Gemini API."),
+    ("bytes_received", "counter", "Response bytes received from the Gemini API."),
+    ("prompt_tokens", "counter", "Prompt tokens reported by the Gemini API."),
+    ("output_tokens", "counter", "Output tokens reported by the Gemini API."),
+    ("max_seconds", "gauge", "Slowest single Gemini API call."),
+)
+
+
+@REGISTRY.collector
+def export_call_metrics():
+    snapshot = metrics.snapshot()
+    families = []
+    for field, kind, help in _EXPORTED:
+        suffix = "_total" if kind == "counter" else ""
+        values = {(op,): m[field] for op, m in snapshot.items() if field in m}
+        families.append((f"smartedu_gemini_{field}{suffix}", kind, help, ("op",), values))
+    return families
+
+
+def post_json(
+    op: str,
+    url: str,
+    payload: Dict[str, Any],
+    timeout: float,
+    max_retries: int,
+    backoff: float = 0.5,
+    key: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+) -> Dict[str, Any]:
+    """
+    POST a JSON payload to a Gemini endpoint and return the decoded reply.
+
+    Throttling and transient failures are retried with backoff; the final
+    failure is raised (requests.HTTPError / ConnectionError / Timeout).
+    Every call is recorded in `metrics` under `op`.
+    """
+    session = session or get_session()
+    params = {"key": key or api_key()}
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    start = time.perf_counter()
+    received = 0
+    retries = 0
+    error = True
+
+    try:
+        for attempt in range(max_retries + 1):
+            last = attempt == max_retries
+            try:
+                resp = session.post(
+                    url, params=params, data=body, headers=headers, timeout=timeout
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+                retries += 1
+                time.sleep(backoff_delay(attempt, backoff))
+                continue
+
+            received += len(resp.content)
+            if resp.status_code in RETRY_STATUS and not last:
+                retries += 1
+                time.sleep(backoff_delay(attempt, backoff, resp.headers.get("Retry-After")))
+                continue
+            resp.raise_for_status()
+            data = resp.json()
+            error = False
+            return data
+        raise RuntimeError("unreachable")
+    finally:
+        metrics.record(
+            op, time.perf_counter() - start, len(body) * (retries + 1),
+            received, retries, error,
+        )
+
+
+# -------------------------------------------------
+# TEXT GENERATION
+# -------------------------------------------------
+def generate_content(
+    prompt: str,
+    model: str = GENERATION_MODEL,
+    generation_config: Optional[Dict[str, Any]] = None,
+    timeout: float = GENERATE_TIMEOUT,
+    max_retries: int = GENERATE_MAX_RETRIES,
+) -> Optional[str]:
+    """
+    Call generateContent and return the first candidate's text,
+    or None when the reply has no text part.
+    """
+    payload: Dict[str, Any] = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+
+    data = post_json(
+        "generate",
+        f"{GEMINI_API_BASE}/models/{model}:generateContent",
+        payload,
+        timeout=timeout,
+        max_retries=max_retries,
+    )
+    metrics.record_tokens("generate", data.get("usageMetadata"))
+    try:
+        return data["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def stream_generate_content(
+    prompt: str,
+    model: str = GENERATION_MODEL,
+    generation_config: Optional[Dict[str, Any]] = None,
+    timeout: float = GENERATE_TIMEOUT,
+) -> Iterator[str]:
+    """
+    Call streamGenerateContent (server-sent events) and yield text deltas
+    as Gemini produces them. Not retried once the stream has started.
+    """
+    payload: Dict[str, Any] = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+
+    body = json.dumps(payload).encode("utf-8")
+    start = time.perf_counter()
+    received = 0
+    usage = None
+    error = True
+    try:
+        with get_session().post(
+            f"{GEMINI_API_BASE}/models/{model}:streamGenerateContent",
+            params={"key": api_key(), "alt": "sse"},
+            data=body,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout,
+            stream=True,
+        ) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                received += len(line)
+                event = json.loads(line[5:])
+                usage = event.get("usageMetadata") or usage
+                try:
+                    parts = event["candidates"][0]["content"]["parts"]
+                except (KeyError, IndexError, TypeError):
+                    continue
+                for part in parts:
+                    if part.get("text"):
+                        yield part["text"]
+        error = False
+    except GeneratorExit:
+        # The caller stopped early (e.g. the reply parsed complete): a
+        # successful call, not an error.
+        error = False
+        raise
+    finally:
+        metrics.record(
+            "generate_stream", time.perf_counter() - start, len(body), received, 0, error
+        )
+        metrics.record_tokens("generate_stream", usage)
+
+
+# -------------------------------------------------
+# ASYNC CLIENT (ASGI mode)
+# The same calls on an httpx.AsyncClient: a request waiting on Gemini
+# holds a socket, not a thread. httpx is only needed in this mode.
+# -------------------------------------------------
+class _AsyncClients:
+    """
+    httpx clients for one event loop, used round-robin. httpx rescans its
+    whole pool (connections and queued requests) whenever one changes
+    state, so a single pool with hundreds of requests in flight spends
+    more time on bookkeeping than on the wire; several small pools don't.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        import httpx
+
+        self.loop = loop
+        per_client = max(1, ASYNC_MAX_CONNECTIONS // ASYNC_CLIENTS)
+        self.clients = [
+            httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=per_client, max_keepalive_connections=per_client
+                ),
+                headers={"Content-Type": "application/json"},
+            )
+            for _ in range(max(1, ASYNC_CLIENTS))
+        ]
+        self._next = 0
+
+    def next(self) -> "httpx.AsyncClient":
+        self._next = (self._next + 1) % len(self.clients)
+        return self.clients[self._next]
+
+
+_async_clients: Optional[_AsyncClients] = None
+
+
+def get_async_client() -> "httpx.AsyncClient":
+    """A pooled AsyncClient for the running event loop (created on first use)."""
+    global _async_clients
+    loop = asyncio.get_running_loop()
+    if _async_clients is None or _async_clients.loop is not loop:
+        _async_clients = _AsyncClients(loop)
+    return _async_clients.next()
+
+
+async def close_async_client() -> None:
+    global _async_clients
+    if _async_clients is not None:
+        clients, _async_clients = _async_clients.clients, None
+        for client in clients:
+            await client.aclose()
+
+
+async def post_json_async(
+    op: str,
+    url: str,
+    payload: Dict[str, Any],
+    timeout: float,
+    max_retries: int,
+    backoff: float = 0.5,
+    key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """post_json on the async client: same retries, backoff and metrics."""
+    import httpx
+
+    client = get_async_client()
+    params = {"key": key or api_key()}
+    body = json.dumps(payload).encode("utf-8")
+    start = time.perf_counter()
+    received = 0
+    retries = 0
+    error = True
+
+    try:
+        for attempt in range(max_retries + 1):
+            last = attempt == max_retries
+            try:
+                resp = await client.post(url, params=params, content=body, timeout=timeout)
+            except httpx.TransportError:
+                if last:
+                    raise
+                retries += 1
+                await asyncio.sleep(backoff_delay(attempt, backoff))
+                continue
+
+            received += len(resp.content)
+            if resp.status_code in RETRY_STATUS and not last:
+                retries += 1
+                await asyncio.sleep(backoff_delay(attempt, backoff, resp.headers.get("Retry-After")))
+                continue
+            resp.raise_for_status()
+            data = resp.json()
+            error = False
+            return data
+        raise RuntimeError("unreachable")
+    finally:
+        metrics.record(
+            op, time.perf_counter() - start, len(body) * (retries + 1),
+            received, retries, error,
+        )
+
+
+async def generate_content_async(
+    prompt: str,
+    model: str = GENERATION_MODEL,
+    generation_config: Optional[Dict[str, Any]] = None,
+    timeout: float = GENERATE_TIMEOUT,
+    max_retries: int = GENERATE_MAX_RETRIES,
+) -> Optional[str]:
+    """generate_content without blocking the event loop."""
+    payload: Dict[str, Any] = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+
+    data = await post_json_async(
+        "generate",
+        f"{GEMINI_API_BASE}/models/{model}:generateContent",
+        payload,
+        timeout=timeout,
+        max_retries=max_retries,
+    )
+    metrics.record_tokens("generate", data.get("usageMetadata"))
+    try:
+        return data["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+async def stream_generate_content_async(
+    prompt: str,
+    model: str = GENERATION_MODEL,
+    generation_config: Optional[Dict[str, Any]] = None,
+    timeout: float = GENERATE_TIMEOUT,
+) -> AsyncIterator[str]:
+    """stream_generate_content without blocking the event loop."""
+    payload: Dict[str, Any] = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+
+    body = json.dumps(payload).encode("utf-8")
+    start = time.perf_counter()
+    received = 0
+    usage = None
+    error = True
+    try:
+        async with get_async_client().stream(
+            "POST",
+            f"{GEMINI_API_BASE}/models/{model}:streamGenerateContent",
+            params={"key": api_key(), "alt": "sse"},
+            content=body,
+            timeout=timeout,
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line or not line.startswith("data:"):
+                    continue
+                received += len(line)
+                event = json.loads(line[5:])
+                usage = event.get("usageMetadata") or usage
+                try:
+                    parts = event["candidates"][0]["content"]["parts"]
+                except (KeyError, IndexError, TypeError):
+                    continue
+                for part in parts:
+                    if part.get("text"):
+                        yield part["text"]
+        error = False
+    except GeneratorExit:
+        # The caller stopped early (e.g. the reply parsed complete): a
+        # successful call, not an error.
+        error = False
+        raise
+    finally:
+        metrics.record(
+            "generate_stream", time.perf_counter() - start, len(body), received, 0, error
+        )
+        metrics.record_tokens("generate_stream", usage)
+
+
+async def embed_contents_async(
+    texts: Sequence[str], model: str = EMBEDDING_MODEL
+) -> List[List[float]]:
+    """
+    One batchEmbedContents call (at most EMBED_BATCH_SIZE texts) on the
+    async client; for small request-path lookups such as a query vector.
+    """
+    payload = {
+        "requests": [
+            {"model": f"models/{model}", "content": {"parts": [{"text": t}]}} for t in texts
+        ]
+    }
+    data = await post_json_async(
+        "embed",
+        f"{GEMINI_API_BASE}/models/{model}:batchEmbedContents",
+        payload,
+        timeout=EMBED_TIMEOUT,
+        max_retries=EMBED_MAX_RETRIES,
+    )
+    try:
+        vectors = [emb["values"] for emb in data["embeddings"]]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Error parsing embedding response: {e}") from e
+    if len(vectors) != len(texts):
+        raise ValueError(f"Embedding response has {len(vectors)} vectors for {len(texts)} texts")
+    return vectors
+
+
+# -------------------------------------------------
+# EMBEDDING CLIENT
+# -------------------------------------------------
+class EmbeddingClient:
+    """
+    Concurrent batchEmbedContents client.
+
+    Inputs are split into batches of at most batch_size texts and posted
+    from a pool of `concurrency` threads over the shared keep-alive Session.
+    Throttling (429) and transient 5xx/connection errors are retried with
+    exponential backoff. At most max_in_flight batches are queued at once:
+    submit() blocks beyond that, which pushes back on the producer.
+    Results always come back in input order.
+    """
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        base_url: str = GEMINI_API_BASE,
+        key: Optional[str] = None,
+        batch_size: int = EMBED_BATCH_SIZE,
+        concurrency: int = EMBED_CONCURRENCY,
+        max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff: float = 0.5,
+        timeout: float = EMBED_TIMEOUT,
+        session: Optional[requests.Session] = None,
+    ):
+        self.model = model
+        self.url = f"{base_url.rstrip('/')}/models/{model}:batchEmbedContents"
+        self._key = key
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = session or get_session()
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="embed"
+        )
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+
+    def _post_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        payload = {
+            "requests": [
+                {
+                    "model": f"models/{self.model}",
+                    "content": {"parts": [{"text": t}]},
+                }
+                for t in texts
+            ]
+        }
+        data = post_json(
+            "embed",
+            self.url,
+            payload,
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            backoff=self.backoff,
+            key=self._key,
+            session=self.session,
+        )
+
+        try:
+            vectors = [emb["values"] for emb in data["embeddings"]]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Error parsing embedding response: {e}") from e
+        if len(vectors) != len(texts):
+            raise ValueError(
+                f"Embedding response has {len(vectors)} vectors for {len(texts)} texts"
+            )
+        return vectors
+
+    def _submit_batch(self, texts: Sequence[str]) -> Future:
+        self._slots.acquire()
+        try:
+            fut = self._executor.submit(self._post_batch, texts)
+        except BaseException:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        """
+        Queue texts for embedding; returns a Future of the vectors in order.
+        Blocks while max_in_flight batches are already pending.
+        """
+        texts = list(texts)
+        batches = [
+            self._submit_batch(texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        combined = _gather(batches)
+        flat: Future = Future()
+
+        def flatten(fut: Future):
+            if fut.exception() is not None:
+                flat.set_exception(fut.exception())
+            else:
+                flat.set_result([v for batch in fut.result() for v in batch])
+
+        combined.add_done_callback(flatten)
+        return flat
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.submit(texts).result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+_embedding_client: Optional[EmbeddingClient] = None
+_client_lock = threading.Lock()
+
+
+def get_embedding_client() -> EmbeddingClient:
+    global _embedding_client
+    if _embedding_client is None:
+        with _client_lock:
+            if _embedding_client is None:
+                _embedding_client = EmbeddingClient()
+    return _embedding_client
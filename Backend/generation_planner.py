@@ -0,0 +1,101 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+# Requests above SHARD_SIZE questions are split into shards of at most
+# this many questions, generated concurrently.
+SHARD_SIZE = int(os.getenv("MCQ_SHARD_SIZE", "10"))
+SHARD_CONCURRENCY = int(os.getenv("MCQ_SHARD_CONCURRENCY", "4"))
+CHUNKS_PER_SHARD = int(os.getenv("MCQ_CHUNKS_PER_SHARD", "5"))
+
+_executor = ThreadPoolExecutor(max_workers=SHARD_CONCURRENCY, thread_name_prefix="shard")
+
+
+# -------------------------------------------------
+# PLANNING
+# -------------------------------------------------
+def plan_shards(num_questions: int, shard_size: int = SHARD_SIZE) -> List[int]:
+    """Split a question count into near-equal budgets of at most shard_size."""
+    if num_questions <= 0:
+        return []
+    shards = -(-num_questions // max(1, shard_size))
+    base, extra = divmod(num_questions, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def assign_contexts(
+    ranked_chunks: Sequence[str], num_shards: int, per_shard: int = CHUNKS_PER_SHARD
+) -> List[List[str]]:
+    """
+    Deal ranked chunks out round-robin, so every shard gets a mix of highly
+    and less highly ranked context and shards overlap as little as the
+    document allows.
+    """
+    if not ranked_chunks:
+        return [[] for _ in range(num_shards)]
+    contexts: List[List[str]] = [[] for _ in range(num_shards)]
+    for rank in range(num_shards * per_shard):
+        contexts[rank % num_shards].append(ranked_chunks[rank % len(ranked_chunks)])
+    return [list(dict.fromkeys(ctx)) for ctx in contexts]
+
+
+# -------------------------------------------------
+# MERGING
+# -------------------------------------------------
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a question."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def merge_questions(
+    shard_results: Sequence[Dict[str, Any]], limit: int
+) -> Dict[str, Any]:
+    """Merge shard outputs in order, dropping duplicate questions."""
+    merged: Dict[str, Any] = {}
+    seen = set()
+    for result in shard_results:
+        for question, details in result.items():
+            key = normalize_question(question)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged[question] = details
+            if len(merged) >= limit:
+                return merged
+    return merged
+
+
+# -------------------------------------------------
+# EXECUTION
+# -------------------------------------------------
+def run_shards(
+    shards: Sequence[Tuple[List[str], int]],
+    generate: Callable[[List[str], int], Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Run generate(context_chunks, budget) for every shard concurrently and
+    return the results in shard order. A failed shard is dropped as long as
+    at least one shard succeeds; otherwise the first error is raised.
+    """
+    futures = [_executor.submit(generate, ctx, budget) for ctx, budget in shards]
+    results, errors = [], []
+    for fut in futures:
+        try:
+            results.append(fut.result())
+        except Exception as e:
+            errors.append(e)
+    if not results and errors:
+        raise errors[0]
+    return results
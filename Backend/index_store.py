@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding_cache import CACHE_DIR
+from lexical import BM25Index
+from retrieval import VectorIndex
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+INDEX_STORE_DIR = os.getenv("INDEX_STORE_DIR", os.path.join(CACHE_DIR, "indexes"))
+INDEX_STORE_MAX_BYTES = int(os.getenv("INDEX_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+INDEX_STORE_MAX_AGE = int(os.getenv("INDEX_STORE_MAX_AGE", str(30 * 24 * 3600)))
+
+# Bump when chunking/embedding changes so stale indexes are rebuilt, not reused.
+INDEX_VERSION = 4
+
+_CHUNKS_FILE = "chunks.json"
+_EMBEDDINGS_FILE = "embeddings.npy"
+_META_FILE = "meta.json"
+# Optional: start page of each chunk (int32), for page-range filters.
+_PAGES_FILE = "pages.npy"
+# BM25 postings for hybrid retrieval (BM25Index.to_arrays).
+_LEXICAL_FILE = "lexical.npz"
+
+
+def document_id(data: bytes) -> str:
+    """Document ID = sha256 of the uploaded file's bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _is_doc_id(doc_id: str) -> bool:
+    return len(doc_id) == 64 and all(c in "0123456789abcdef" for c in doc_id)
+
+
+# -------------------------------------------------
+# DOCUMENT INDEX STORE
+# -------------------------------------------------
+class DocumentIndexStore:
+    """
+    On-disk store of per-document RAG indexes, keyed by content hash.
+
+    Each document lives in <root>/<doc_id>/ as chunks.json plus a row-normalized
+    float32 embeddings.npy that is memory-mapped on load (with optional
+    pages.npy and lexical.npz alongside), so a cached index
+    is queried without being read into memory up front. The directory's
+    mtime records last access; entries idle longer than max_age are evicted
+    first, then least recently used ones until the store fits in max_bytes.
+    """
+
+    def __init__(
+        self,
+        root: str = INDEX_STORE_DIR,
+        max_bytes: int = INDEX_STORE_MAX_BYTES,
+        max_age: int = INDEX_STORE_MAX_AGE,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, doc_id: str) -> str:
+        if not _is_doc_id(doc_id):
+            raise ValueError(f"Invalid document id: {doc_id!r}")
+        return os.path.join(self.root, doc_id)
+
+    def has(self, doc_id: str) -> bool:
+        return self.meta(doc_id) is not None
+
+    def meta(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._path(doc_id), _META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != INDEX_VERSION:
+            return None
+        return meta
+
+    def save(
+        self,
+        doc_id: str,
+        chunks: List[str],
+        index: VectorIndex,
+        meta: Optional[Dict[str, Any]] = None,
+        pages: Optional[List[int]] = None,
+        lexical: Optional[BM25Index] = None,
+    ) -> str:
+        """Persist an index atomically (write to a temp dir, then rename)."""
+        final = self._path(doc_id)
+        tmp = f"{final}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            with open(os.path.join(tmp, _CHUNKS_FILE), "w", encoding="utf-8") as f:
+                json.dump(chunks, f, ensure_ascii=False)
+            np.save(os.path.join(tmp, _EMBEDDINGS_FILE), index.matrix)
+            if pages is not None and len(pages) == len(chunks):
+                np.save(os.path.join(tmp, _PAGES_FILE), np.asarray(pages, dtype=np.int32))
+            if lexical is not None and len(lexical) == len(chunks):
+                np.savez(os.path.join(tmp, _LEXICAL_FILE), **lexical.to_arrays())
+            record = dict(meta or {})
+            record.update({
+                "version": INDEX_VERSION,
+                "doc_id": doc_id,
+                "num_chunks": len(chunks),
+                "dim": index.dim,
+                "created_at": time.time(),
+            })
+            with open(os.path.join(tmp, _META_FILE), "w") as f:
+                json.dump(record, f)
+
+            with self._lock:
+                if os.path.exists(final):
+                    shutil.rmtree(final, ignore_errors=True)
+                os.replace(tmp, final)
+        finally:
+            if os.path.exists(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        self.evict()
+        return doc_id
+
+    def load(self, doc_id: str) -> Optional[Tuple[List[str], VectorIndex]]:
+        """Return (chunks, index) with a memory-mapped matrix, or None."""
+        if self.meta(doc_id) is None:
+            return None
+        path = self._path(doc_id)
+        try:
+            with open(os.path.join(path, _CHUNKS_FILE), encoding="utf-8") as f:
+                chunks = json.load(f)
+            matrix = np.load(os.path.join(path, _EMBEDDINGS_FILE), mmap_mode="r")
+            # LRU touch; an index evicted since meta() is a cache miss.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return chunks, VectorIndex(matrix, normalized=True)
+
+    def load_pages(self, doc_id: str) -> Optional[np.ndarray]:
+        """Start page per chunk, or None for indexes saved without pages."""
+        if self.meta(doc_id) is None:
+            return None
+        try:
+            return np.load(os.path.join(self._path(doc_id), _PAGES_FILE))
+        except (OSError, ValueError):
+            return None
+
+    def load_lexical(self, doc_id: str) -> Optional[BM25Index]:
+        """The document's BM25 index, or None if it was saved without one."""
+        if self.meta(doc_id) is None:
+            return None
+        try:
+            with np.load(os.path.join(self._path(doc_id), _LEXICAL_FILE)) as arrays:
+                return BM25Index.from_arrays(dict(arrays))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def delete(self, doc_id: str) -> None:
+        shutil.rmtree(self._path(doc_id), ignore_errors=True)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not _is_doc_id(name) or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)
+                )
+                entries.append((os.path.getmtime(path), size, name))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self) -> List[str]:
+        """Drop expired entries, then LRU entries until under max_bytes."""
+        evicted = []
+        with self._lock:
+            entries = sorted(self._entries())
+            now = time.time()
+            total = sum(size for _, size, _ in entries)
+            for last_access, size, doc_id in entries:
+                if now - last_access <= self.max_age and total <= self.max_bytes:
+                    break
+                shutil.rmtree(os.path.join(self.root, doc_id), ignore_errors=True)
+                total -= size
+                evicted.append(doc_id)
+        return evicted
+
+
+_default_store: Optional[DocumentIndexStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_index_store() -> DocumentIndexStore:
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = DocumentIndexStore()
+    return _default_store
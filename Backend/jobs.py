@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from embedding_cache import CACHE_DIR
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+JOB_STORE = os.getenv("JOB_STORE", "memory")           # memory | sqlite
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(CACHE_DIR, "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Finished jobs are kept this long for result retrieval.
+JOB_TTL = int(os.getenv("JOB_TTL", str(24 * 3600)))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+
+# -------------------------------------------------
+# JOB STORES
+# -------------------------------------------------
+class JobStore(ABC):
+    """
+    Job state backend. A job is a plain dict:
+    id, kind, status, created_at, started_at, finished_at,
+    result (JSON-serializable), error (dict) and http_status.
+    """
+
+    @abstractmethod
+    def create(self, kind: str) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs that ended before `older_than` (epoch s)."""
+
+    @staticmethod
+    def _new_job(kind: str) -> Dict[str, Any]:
+        return {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "http_status": None,
+        }
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def create(self, kind: str) -> Dict[str, Any]:
+        job = self._new_job(kind)
+        with self._lock:
+            self._jobs[job["id"]] = job
+        return dict(job)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            stale = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINISHED and job["finished_at"] < older_than
+            ]
+            for job_id in stale:
+                del self._jobs[job_id]
+        return len(stale)
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs persisted in a local SQLite file; result/error stored as JSON."""
+
+    _COLUMNS = (
+        "id", "kind", "status", "created_at", "started_at", "finished_at",
+        "result", "error", "http_status",
+    )
+
+    def __init__(self, db_path: str = JOB_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id          TEXT PRIMARY KEY,
+                kind        TEXT NOT NULL,
+                status      TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                started_at  REAL,
+                finished_at REAL,
+                result      TEXT,
+                error       TEXT,
+                http_status INTEGER
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, finished_at)"
+        )
+        self._conn.commit()
+
+    def create(self, kind: str) -> Dict[str, Any]:
+        job = self._new_job(kind)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, created_at) VALUES (?, ?, ?, ?)",
+                (job["id"], kind, job["status"], job["created_at"]),
+            )
+            self._conn.commit()
+        return job
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if not fields:
+            return
+        for key in ("result", "error"):
+            if key in fields and fields[key] is not None:
+                fields[key] = json.dumps(fields[key])
+        unknown = set(fields) - set(self._COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self._COLUMNS, row))
+        for key in ("result", "error"):
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (*FINISHED, older_than),
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+
+def make_job_store(kind: str = JOB_STORE) -> JobStore:
+    if kind == "sqlite":
+        return SQLiteJobStore()
+    if kind == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unknown JOB_STORE backend: {kind!r}")
+
+
+# -------------------------------------------------
+# JOB QUEUE
+# -------------------------------------------------
+class JobQueue:
+    """
+    Runs submitted callables on a local worker pool and records their state
+    in a JobStore. A callable returns the JSON result; an exception with
+    `status` and `payload` attributes (e.g. mcq_pipeline.PipelineError)
+    is stored as that HTTP status and error body, anything else as 500.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, ttl: int = JOB_TTL):
+        self.store = store
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._changed = threading.Condition()
+
+    def _notify(self) -> None:
+        with self._changed:
+            self._changed.notify_all()
+
+    def _run(self, job_id: str, fn: Callable[..., Any], args, kwargs) -> None:
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+        self._notify()
+        try:
+            result = fn(*args, **kwargs)
+            fields = {"status": DONE, "result": result, "http_status": 200}
+        except Exception as e:
+            fields = {
+                "status": FAILED,
+                "error": getattr(e, "payload", None) or {"error": str(e)},
+                "http_status": getattr(e, "status", 500),
+            }
+        fields["finished_at"] = time.time()
+        self.store.update(job_id, **fields)
+        self._notify()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        self.store.purge(time.time() - self.ttl)
+        job = self.store.create(kind)
+        self._executor.submit(self._run, job["id"], fn, args, kwargs)
+        return job["id"]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Long-poll: return the job once finished or after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            job = self.store.get(job_id)
+            while job is not None and job["status"] not in FINISHED:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Also re-check periodically in case another process owns the job.
+                self._changed.wait(min(remaining, 1.0))
+                job = self.store.get(job_id)
+        return job
@@ -0,0 +1,251 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+from retrieval import top_k_indices
+
+# -------------------------------------------------
+# TOKENIZATION
+# -------------------------------------------------
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Common English words plus the filler that shows up in focus strings
+# ("Unit 2 only", "questions about ...").
+STOPWORDS = frozenset("""
+a about above after again all also an and any are as at be because been before
+being below between both but by can did do does doing during each few for from
+further had has have having here how i if in into is it its itself just me more
+most my no nor not of off on once only or other our out over own same she should
+so some such than that the their them then there these they this those through
+to too under until up very was we were what when where which while who whom why
+will with you your focus focusing mainly mostly please question questions quiz
+mcq mcqs topic topics related regarding based
+""".split())
+
+_HEADING_MAX_WORDS = 12
+_HEADING_MAX_CHARS = 100
+# "Unit 2", "Chapter IV", "Lecture 3: ...", "1.2 Cell division", "3. Enzymes"
+_NUMBERED_HEADING_RE = re.compile(
+    r"^(?:(?i:unit|chapter|section|module|lesson|lecture|part|week|appendix)\s+(?:\d+|[IVXLC]+)\b"
+    r"|\d+(?:\.\d+)+\.?\s+[A-Z]|\d+[.)]\s+[A-Z])"
+)
+
+
+def _stem(token: str) -> str:
+    """Plural folding only: 'definitions' -> 'definition', 'studies' -> 'study'."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stopword-free, plural-folded terms (single digits kept)."""
+    return [
+        _stem(t)
+        for t in _TOKEN_RE.findall(text.lower())
+        if t not in STOPWORDS and (len(t) > 1 or t.isdigit())
+    ]
+
+
+def _title_case(line: str) -> bool:
+    """Every word but stopwords capitalized ("Cell Respiration and ATP"), or all caps."""
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 4 and all(c.isupper() for c in letters):
+        return True
+    words = [w.strip("()[]{}:;,-\"'") for w in line.split()]
+    words = [w for w in words if w and w.lower() not in STOPWORDS]
+    return len(words) >= 2 and all(w[0].isupper() or w[0].isdigit() for w in words)
+
+
+def heading_lines(text: str) -> List[str]:
+    """
+    Lines that look like titles: short, not ending like a sentence, not
+    running on into a lowercase line, and either numbered ("Unit 2",
+    "1.2 ..."), title case, or the first line of a page / slide / block.
+    A short wrapped line of body text is none of these.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    out = []
+    for i, line in enumerate(lines):
+        if (
+            not line
+            or len(line) > _HEADING_MAX_CHARS
+            or len(line.split()) > _HEADING_MAX_WORDS
+            or line[-1] in ".,;?!"
+            or not any(c.isalpha() for c in line)
+        ):
+            continue
+        following = lines[i + 1] if i + 1 < len(lines) else ""
+        if following[:1].islower():
+            continue  # a sentence wrapped onto the next line
+        starts_block = (i == 0 or not lines[i - 1]) and not line[0].islower()
+        if starts_block or _NUMBERED_HEADING_RE.match(line) or _title_case(line):
+            out.append(line)
+    return out
+
+
+# -------------------------------------------------
+# BM25 INVERTED INDEX
+# -------------------------------------------------
+class BM25Index:
+    """
+    Okapi BM25 over a document's chunks, plus a heading-term index.
+
+    Chunks are added one at a time while the document streams through
+    chunking (add), and the postings are packed into flat arrays on first
+    query, which is also the layout saved next to the embeddings
+    (to_arrays / from_arrays) and loaded back in with the index.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._doc_len: List[int] = []
+        self._postings: Dict[str, List[tuple]] = {}
+        self._headings: Dict[str, List[int]] = {}
+        self._packed: Optional[Dict[str, np.ndarray]] = None
+        self._terms: Dict[str, int] = {}
+        self._heading_terms: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_len) if self._packed is None else len(self._packed["doc_len"])
+
+    # ---------- build ----------
+    def add(self, chunk: str) -> None:
+        if self._packed is not None:
+            self._unpack()
+        doc = len(self._doc_len)
+        terms = tokenize(chunk)
+        self._doc_len.append(len(terms))
+        for term, tf in Counter(terms).items():
+            self._postings.setdefault(term, []).append((doc, tf))
+        heading_terms = {t for line in heading_lines(chunk) for t in tokenize(line)}
+        for term in heading_terms:
+            self._headings.setdefault(term, []).append(doc)
+
+    def add_many(self, chunks: Iterable[str]) -> "BM25Index":
+        for chunk in chunks:
+            self.add(chunk)
+        return self
+
+    # ---------- packed form ----------
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Flat CSR-style arrays: terms[i]'s postings are docs[offsets[i]:offsets[i+1]]."""
+        if self._packed is not None:
+            return self._packed
+        terms = sorted(self._postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(self._postings[t]) for t in terms], out=offsets[1:])
+        flat = [p for t in terms for p in self._postings[t]]
+        heading_terms = sorted(self._headings)
+        heading_offsets = np.zeros(len(heading_terms) + 1, dtype=np.int64)
+        np.cumsum([len(self._headings[t]) for t in heading_terms], out=heading_offsets[1:])
+        return {
+            "doc_len": np.asarray(self._doc_len, dtype=np.int32),
+            "terms": np.asarray(terms, dtype=str),
+            "offsets": offsets,
+            "docs": np.asarray([d for d, _ in flat], dtype=np.int32),
+            "tfs": np.asarray([tf for _, tf in flat], dtype=np.int32),
+            "heading_terms": np.asarray(heading_terms, dtype=str),
+            "heading_offsets": heading_offsets,
+            "heading_docs": np.asarray(
+                [d for t in heading_terms for d in self._headings[t]], dtype=np.int32
+            ),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], **params: float) -> "BM25Index":
+        index = cls(**params)
+        index._pack(arrays)
+        return index
+
+    def _pack(self, arrays: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        if self._packed is None:
+            self._packed = {k: v for k, v in (arrays or self.to_arrays()).items()}
+            self._terms = {t: i for i, t in enumerate(self._packed["terms"].tolist())}
+            self._heading_terms = {
+                t: i for i, t in enumerate(self._packed["heading_terms"].tolist())
+            }
+            self._postings, self._headings, self._doc_len = {}, {}, []
+        return self._packed
+
+    def _unpack(self) -> None:
+        """Back to the append-friendly form (adding after a query)."""
+        packed = self._packed
+        self._doc_len = packed["doc_len"].tolist()
+        offsets, docs, tfs = packed["offsets"], packed["docs"], packed["tfs"]
+        self._postings = {
+            t: list(zip(docs[offsets[i]:offsets[i + 1]].tolist(), tfs[offsets[i]:offsets[i + 1]].tolist()))
+            for t, i in self._terms.items()
+        }
+        h_offsets, h_docs = packed["heading_offsets"], packed["heading_docs"]
+        self._headings = {
+            t: h_docs[h_offsets[i]:h_offsets[i + 1]].tolist()
+            for t, i in self._heading_terms.items()
+        }
+        self._packed = None
+
+    # ---------- query ----------
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for the query's terms."""
+        packed = self._pack()
+        doc_len = packed["doc_len"]
+        n = len(doc_len)
+        scores = np.zeros(n, dtype=np.float32)
+        if n == 0:
+            return scores
+        avg_len = max(float(doc_len.mean()), 1.0)
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avg_len)
+        for term in set(tokenize(query)):
+            i = self._terms.get(term)
+            if i is None:
+                continue
+            start, end = packed["offsets"][i], packed["offsets"][i + 1]
+            docs = packed["docs"][start:end]
+            tfs = packed["tfs"][start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        return scores
+
+    def search(self, query: str, k: int = 5) -> List[int]:
+        """Top-k chunk indices with a positive score, best first."""
+        scores = self.scores(query)
+        return [int(i) for i in top_k_indices(scores, k) if scores[i] > 0]
+
+    def heading_matches(self, query: str) -> Set[int]:
+        """Chunks whose heading lines contain every query term (empty if none)."""
+        packed = self._pack()
+        terms = set(tokenize(query))
+        if not terms:
+            return set()
+        matched: Optional[Set[int]] = None
+        for term in terms:
+            i = self._heading_terms.get(term)
+            if i is None:
+                return set()
+            start, end = packed["heading_offsets"][i], packed["heading_offsets"][i + 1]
+            docs = set(packed["heading_docs"][start:end].tolist())
+            matched = docs if matched is None else matched & docs
+            if not matched:
+                return set()
+        return matched or set()
+
+
+# -------------------------------------------------
+# RANK FUSION
+# -------------------------------------------------
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], limit: int, k: int = 60
+) -> List[int]:
+    """Merge ranked lists by sum of 1 / (k + rank); ties keep first-seen order."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=lambda item: -fused[item])[:limit]
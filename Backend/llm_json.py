@@ -0,0 +1,198 @@
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# -------------------------------------------------
+# INCREMENTAL JSON OBJECT PARSING
+# -------------------------------------------------
+
+
+class IncrementalObjectParser:
+    """
+    Pull completed top-level members out of a JSON object while it is still
+    being received, e.g. from a streaming LLM reply:
+
+        parser = IncrementalObjectParser()
+        for delta in stream:
+            for key, value in parser.feed(delta):
+                ...
+
+    Anything before the first '{' (such as a ```json fence) is skipped.
+    Each member is decoded once its closing ',' or '}' arrives; a member
+    that is not valid JSON on its own is dropped and recorded in `errors`.
+    Every character is scanned once, so total work is linear in the reply.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = -1
+        self.started = False
+        self.finished = False
+        self.errors: List[str] = []
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        if self.finished or not text:
+            return []
+        self._buf += text
+        members: List[Tuple[str, Any]] = []
+        buf = self._buf
+        i = self._pos
+
+        while i < len(buf):
+            ch = buf[i]
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._depth = 1
+                    self._member_start = i + 1
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._member_start:i], members)
+                    self.finished = True
+                    i += 1
+                    break
+            elif ch == "," and self._depth == 1:
+                self._emit(buf[self._member_start:i], members)
+                self._member_start = i + 1
+            i += 1
+
+        # Drop text that can no longer be part of an unfinished member.
+        if self.started and not self.finished and self._member_start > 0:
+            self._buf = buf[self._member_start:]
+            i -= self._member_start
+            self._member_start = 0
+        self._pos = i
+        return members
+
+    def _emit(self, text: str, out: List[Tuple[str, Any]]) -> None:
+        if not text.strip():
+            return
+        try:
+            member = json.loads("{" + text + "}")
+        except ValueError:
+            self.errors.append(text)
+            return
+        out.extend(member.items())
+
+
+# -------------------------------------------------
+# TOLERANT PARSING
+# Repairs the usual defects of LLM JSON: markdown fences, prose around the
+# object, trailing commas and replies cut off mid-object.
+# -------------------------------------------------
+_FENCE_RE = re.compile(r"```[A-Za-z]*")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def strip_fences(text: str) -> str:
+    """Drop ``` / ```json markers, keeping what is between them."""
+    return _FENCE_RE.sub("", text).strip()
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Best-effort valid JSON for the first object or array in `text`.
+
+    Text outside the value is ignored and trailing commas are removed. A
+    truncated value is cut back to its last complete element (the last
+    ',' or closing bracket outside a string) and its open brackets are
+    closed. Returns None when there is nothing to salvage.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escape = False
+    # (length of out, open brackets) at the last point the value could end.
+    safe: Optional[Tuple[int, List[str]]] = None
+
+    for ch in text[min(starts):]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(stack.pop())
+            if not stack:
+                return "".join(out)
+            safe = (len(out), list(stack))
+        elif ch == ",":
+            safe = (len(out), list(stack))
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    if safe is None:
+        return None
+    end, open_brackets = safe
+    return "".join(out[:end]) + "".join(reversed(open_brackets))
+
+
+def parse_json_object(text: Optional[str]) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Parse an LLM reply that should be a JSON object, repairing it if needed.
+
+    Returns (object or None, result), result being "ok" (valid as is),
+    "repaired" (see repair_json), "salvaged" (only the members that decode
+    on their own, see IncrementalObjectParser) or "failed".
+    """
+    if not text:
+        return None, "failed"
+    cleaned = strip_fences(text)
+    try:
+        parsed = json.loads(cleaned)
+        if isinstance(parsed, dict):
+            return parsed, "ok"
+    except ValueError:
+        pass
+
+    repaired = repair_json(cleaned)
+    if repaired is not None:
+        try:
+            parsed = json.loads(repaired)
+            if isinstance(parsed, dict):
+                return parsed, "repaired"
+        except ValueError:
+            pass
+
+    # A broken member (e.g. an unescaped quote) spoils json.loads for the
+    # whole reply; keep every member that is valid on its own.
+    parser = IncrementalObjectParser()
+    members = parser.feed(repaired or cleaned)
+    if members:
+        return dict(members), "salvaged"
+    return None, "failed"
@@ -0,0 +1,709 @@
+import os
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from rag import (
+    SUPPORTED_EXTENSIONS,
+    iter_numbered_pages,
+    build_index_streaming,
+    rank_hybrid,
+    call_gemini,
+    embed_texts,
+    needs_query_embedding,
+    prefetch_embeddings_async,
+)
+from chunking import ChunkStats, iter_structured_chunks
+from context_packer import (
+    BASELINE_CHUNKS,
+    CONTEXT_CANDIDATES,
+    ContextStats,
+    context_budget,
+    pack_context,
+)
+from lexical import BM25Index
+from retrieval import VectorIndex
+from index_store import get_index_store
+from ann_index import get_library_index
+from gemini_client import (
+    generate_content_async,
+    stream_generate_content,
+    stream_generate_content_async,
+)
+from llm_json import IncrementalObjectParser, parse_json_object
+from quiz_cache import get_quiz_cache, quiz_key
+from uploads import Upload
+from metrics import (
+    bytes_processed,
+    cache_result,
+    chunks_processed,
+    context_tokens,
+    fork_timings,
+    llm_replies,
+    mcq_questions,
+    timed,
+    timed_iter,
+)
+from generation_planner import (
+    CHUNKS_PER_SHARD,
+    assign_contexts,
+    merge_questions,
+    normalize_question,
+    plan_shards,
+    run_shards,
+)
+
+# -------------------------------------------------
+# MCQ GENERATION PIPELINE
+# Shared by the synchronous /generate_mcq route and the job workers, so
+# nothing here touches the Flask request.
+# -------------------------------------------------
+
+load_dotenv()
+
+# Part of the quiz cache key: bump whenever the prompt or parsing changes.
+PROMPT_VERSION = 4
+# How many times missing / invalid questions are asked for again.
+MCQ_REPAIR_ROUNDS = int(os.getenv("MCQ_REPAIR_ROUNDS", "2"))
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+
+class PipelineError(Exception):
+    """A pipeline failure that maps onto an HTTP error response."""
+
+    def __init__(self, message: str, status: int = 500, **extra: Any):
+        super().__init__(message)
+        self.status = status
+        self.payload = {"error": message, **extra}
+
+
+def index_document(upload: Upload) -> Tuple[str, List[str], VectorIndex, BM25Index]:
+    """
+    Parse, chunk and embed an upload, or reuse its stored index.
+    Returns (doc_id, chunks, index, lexical).
+    """
+    doc_id = upload.doc_id
+    store = get_index_store()
+    bytes_processed.inc(upload.size, "upload")
+
+    with timed("index_load"):
+        cached = store.load(doc_id)
+    cache_result("document_index", bool(cached))
+    if cached:
+        return doc_id, cached[0], cached[1], load_lexical(doc_id, cached[0])
+
+    ext = upload.ext
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise PipelineError("Could not extract text", 500)
+
+    # 1️⃣ extract text (parsers read the upload buffer in place) + 2️⃣ chunking
+    # along page / slide boundaries, streamed page by page; headers, footers
+    # and near-duplicate chunks are dropped before anything is embedded
+    pages = timed_iter("extract", iter_numbered_pages(upload.stream(), ext))
+    chunk_stats = ChunkStats()
+    chunk_pages: List[int] = []
+
+    def chunks():
+        # DOCX units are paragraphs, not pages: no header / footer to strip.
+        for page, chunk in iter_structured_chunks(
+            pages, strip_boilerplate=ext != "docx", stats=chunk_stats
+        ):
+            chunk_pages.append(page)
+            yield chunk
+
+    # 3️⃣ build embeddings + vector and BM25 indexes as chunks arrive
+    lexical = BM25Index()
+    with timed("embed_index"):
+        indexed_chunks, embeddings = build_index_streaming(
+            timed_iter("chunk", chunks()), lexical=lexical
+        )
+    chunks_processed.inc(chunk_stats.chunks, "kept")
+    chunks_processed.inc(chunk_stats.duplicates, "duplicate")
+    if not indexed_chunks:
+        raise PipelineError("Could not extract text", 500)
+    with timed("index_save"):
+        store.save(
+            doc_id,
+            indexed_chunks,
+            embeddings,
+            {"filename": upload.filename, "chunking": chunk_stats.as_dict()},
+            pages=chunk_pages,
+            lexical=lexical,
+        )
+    return doc_id, indexed_chunks, embeddings, lexical
+
+
+def load_lexical(doc_id: str, chunks: List[str]) -> BM25Index:
+    """The stored BM25 index, rebuilt from the chunks if it is missing."""
+    lexical = get_index_store().load_lexical(doc_id)
+    if lexical is None or len(lexical) != len(chunks):
+        lexical = BM25Index().add_many(chunks)
+    return lexical
+
+
+def load_document(doc_id: str) -> Tuple[List[str], VectorIndex, BM25Index]:
+    try:
+        cached = get_index_store().load(doc_id)
+    except ValueError:
+        cached = None
+    if not cached:
+        raise PipelineError("Unknown doc_id, please re-upload the file", 404)
+    chunks, index = cached
+    return chunks, index, load_lexical(doc_id, chunks)
+
+
+def build_retrieval_query(num_questions: int, user_focus: str) -> str:
+    if user_focus:
+        return (
+            f"Key concepts related to: {user_focus}. "
+            f"Use this context to generate {num_questions} meaningful MCQs."
+        )
+    return (
+        f"Key concepts that are most important in the uploaded document "
+        f"for generating {num_questions} simple, meaningful MCQs."
+    )
+
+
+def build_mcq_prompt(
+    context_text: str, num_questions: int, avoid: Sequence[str] = ()
+) -> str:
+    # Top-up requests list the questions already kept, so none is repeated.
+    avoid_text = ""
+    if avoid:
+        listed = "\n".join(f"  - {q}" for q in avoid)
+        avoid_text = f"- Do NOT repeat or rephrase any of these questions:\n{listed}\n"
+    return f"""
+You are an expert educational AI system. Your task is to generate multiple-choice questions (MCQs)
+based ONLY on the retrieved context below.
+
+### Retrieved Context:
+{context_text}
+
+### Instructions:
+- Generate **{num_questions}** simple, meaningful MCQs that test understanding.
+- Each question must have exactly 4 options and ONE correct answer.
+- Assign difficulty level:
+  - "Easy": recall
+  - "Medium": understanding
+  - "Hard": reasoning
+- Use only information inside the retrieved context.
+{avoid_text}- STRICTLY return JSON in this format:
+
+{{
+  "Question text 1": {{
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_option": "Correct Option Text",
+    "difficulty": "Easy | Medium | Hard"
+  }},
+  "Question text 2": {{
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_option": "Correct Option Text",
+    "difficulty": "Easy | Medium | Hard"
+  }}
+}}
+"""
+
+
+def validate_mcq(question: Any, details: Any) -> Optional[Dict[str, Any]]:
+    """
+    The question's details checked against the MCQ schema, or None.
+
+    Requires exactly 4 distinct non-empty options, a correct_option that is
+    one of them and a difficulty of Easy / Medium / Hard. Harmless drift is
+    normalized: whitespace, case of the correct option and difficulty, and
+    a correct_option given as the letter A-D.
+    """
+    if not isinstance(question, str) or not question.strip() or not isinstance(details, dict):
+        return None
+    options = details.get("options")
+    if not isinstance(options, list) or len(options) != 4:
+        return None
+    if not all(isinstance(o, (str, int, float)) for o in options):
+        return None
+    options = [str(o).strip() for o in options]
+    if not all(options) or len({o.lower() for o in options}) != 4:
+        return None
+
+    correct = str(details.get("correct_option", "")).strip()
+    matches = [o for o in options if o.lower() == correct.lower()]
+    if not matches and len(correct) == 1 and correct.upper() in "ABCD":
+        matches = [options["ABCD".index(correct.upper())]]
+    if not matches:
+        return None
+
+    difficulty = str(details.get("difficulty", "")).strip().capitalize()
+    if difficulty not in DIFFICULTIES:
+        return None
+    return {**details, "options": options, "correct_option": matches[0], "difficulty": difficulty}
+
+
+def parse_mcq_output(raw_output: Optional[str]) -> Dict[str, Any]:
+    """
+    The valid questions in an LLM reply (possibly none). Fences, trailing
+    commas and truncation are repaired; questions failing validate_mcq are
+    dropped.
+    """
+    if raw_output is None:
+        raise PipelineError("LLM returned no output", 502)
+
+    parsed, result = parse_json_object(raw_output)
+    llm_replies.inc(1, "mcq", result)
+    mcqs: Dict[str, Any] = {}
+    for question, details in (parsed or {}).items():
+        checked = validate_mcq(question, details)
+        if checked is None:
+            mcq_questions.inc(1, "invalid")
+            continue
+        mcq_questions.inc(1, "valid")
+        mcqs[question.strip()] = checked
+    return mcqs
+
+
+def baseline_chunks(num_questions: int) -> int:
+    """Chunks a prompt got before packing: 5, or CHUNKS_PER_SHARD per shard."""
+    shards = len(plan_shards(num_questions))
+    return BASELINE_CHUNKS if shards <= 1 else CHUNKS_PER_SHARD * shards
+
+
+def record_context(stats: ContextStats) -> None:
+    context_tokens.inc(stats.tokens, "packed")
+    context_tokens.inc(stats.baseline_tokens, "baseline")
+    context_tokens.inc(stats.trimmed_tokens, "trimmed")
+
+
+def retrieve_context(
+    chunks: List[str],
+    index: VectorIndex,
+    num_questions: int,
+    user_focus: str,
+    lexical: Optional[BM25Index] = None,
+    stats: Optional[ContextStats] = None,
+) -> List[str]:
+    """
+    Retrieve candidate chunks and pack them into the context budget for
+    num_questions (MMR selection, overlap trimmed, see pack_context).
+    """
+    stats = stats if stats is not None else ContextStats()
+    baseline = baseline_chunks(num_questions)
+
+    # 4️⃣ retrieval query generation
+    query = build_retrieval_query(num_questions, user_focus)
+
+    # 5️⃣ retrieve candidate chunks (lexical + vector)
+    with timed("retrieve"):
+        ranked = rank_hybrid(
+            query, user_focus, chunks, index, lexical, k=max(CONTEXT_CANDIDATES, 2 * baseline)
+        )
+    if not ranked:
+        raise PipelineError("RAG retrieval failed", 500)
+
+    # 6️⃣ context packing under the token budget
+    with timed("pack"):
+        packed = pack_context(
+            [chunks[i] for i in ranked],
+            context_budget(num_questions),
+            vectors=index.matrix[ranked],
+            positions=ranked,
+            baseline_chunks=baseline,
+            stats=stats,
+        )
+    record_context(stats)
+    return [text for _, text in packed]
+
+
+def top_up_prompt(
+    context_text: str, mcqs: Dict[str, Any], num_questions: int
+) -> Optional[str]:
+    """Prompt for just the questions still missing, or None when complete."""
+    missing = num_questions - len(mcqs)
+    if missing <= 0:
+        return None
+    mcq_questions.inc(missing, "regenerated")
+    return build_mcq_prompt(context_text, missing, avoid=list(mcqs))
+
+
+def top_up_mcqs(
+    context_text: str, mcqs: Dict[str, Any], num_questions: int
+) -> Dict[str, Any]:
+    """
+    Ask again for only the questions still missing (dropped as invalid,
+    duplicated or cut off), up to MCQ_REPAIR_ROUNDS times.
+    """
+    for _ in range(MCQ_REPAIR_ROUNDS):
+        prompt = top_up_prompt(context_text, mcqs, num_questions)
+        if prompt is None:
+            break
+        with timed("regenerate"):
+            raw = call_gemini(prompt)
+        if raw is None:
+            break
+        with timed("parse"):
+            mcqs = merge_questions([mcqs, parse_mcq_output(raw)], num_questions)
+    return mcqs
+
+
+def generate_from_context(context_chunks: List[str], num_questions: int) -> Dict[str, Any]:
+    context_text = "\n\n".join(context_chunks)
+    with timed("generate"):
+        raw = call_gemini(build_mcq_prompt(context_text, num_questions))
+    with timed("parse"):
+        mcqs = merge_questions([parse_mcq_output(raw)], num_questions)
+    mcqs = top_up_mcqs(context_text, mcqs, num_questions)
+    if not mcqs:
+        raise PipelineError("LLM returned invalid JSON", 500, raw=raw)
+    return mcqs
+
+
+def generate_mcqs(
+    chunks: List[str],
+    index: VectorIndex,
+    num_questions: int,
+    user_focus: str,
+    lexical: Optional[BM25Index] = None,
+    stats: Optional[ContextStats] = None,
+) -> Dict[str, Any]:
+    # One retrieval, packed for the whole request.
+    context = retrieve_context(chunks, index, num_questions, user_focus, lexical, stats)
+    budgets = plan_shards(num_questions)
+    if len(budgets) <= 1:
+        # 7️⃣ LLM call
+        return generate_from_context(context, num_questions)
+
+    # Large request: one smaller generation per shard, run concurrently.
+    return generate_sharded(context, budgets, num_questions)
+
+
+def generate_sharded(
+    ranked: List[str], budgets: List[int], num_questions: int
+) -> Dict[str, Any]:
+    per_shard = max(1, -(-len(ranked) // len(budgets)))
+    contexts = assign_contexts(ranked, len(budgets), per_shard)
+    with timed("shards"):
+        results = run_shards(list(zip(contexts, budgets)), generate_from_context)
+    # Duplicates across shards and failed shards leave a shortfall.
+    merged = merge_questions(results, num_questions)
+    return top_up_mcqs("\n\n".join(ranked), merged, num_questions)
+
+
+class StreamedMCQs:
+    """Validates and de-duplicates questions as a streamed reply arrives."""
+
+    def __init__(self, num_questions: int):
+        self.num_questions = num_questions
+        self.mcqs: Dict[str, Any] = {}
+        self._seen = set()
+        self._parser = IncrementalObjectParser()
+
+    @property
+    def finished(self) -> bool:
+        return self._parser.finished
+
+    def feed(self, delta: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Questions completed by this delta that are valid and new."""
+        accepted = []
+        for question, details in self._parser.feed(delta):
+            checked = validate_mcq(question, details)
+            if checked is None:
+                mcq_questions.inc(1, "invalid")
+                continue
+            key = normalize_question(question)
+            if key in self._seen or len(self.mcqs) >= self.num_questions:
+                continue
+            self._seen.add(key)
+            mcq_questions.inc(1, "valid")
+            self.mcqs[question.strip()] = checked
+            accepted.append((question.strip(), checked))
+        return accepted
+
+    def close(self) -> None:
+        if self._parser.errors:
+            mcq_questions.inc(len(self._parser.errors), "invalid")
+
+
+def stream_mcqs(
+    context_chunks: List[str], num_questions: int
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream the LLM reply and yield (question, details) as soon as each
+    question's JSON member is complete and passes validate_mcq. Questions
+    still missing when the stream ends (invalid, duplicated or cut off)
+    are then generated on their own, see top_up_mcqs.
+    """
+    context_text = "\n\n".join(context_chunks)
+    prompt = build_mcq_prompt(context_text, num_questions)
+    streamed = StreamedMCQs(num_questions)
+    for delta in timed_iter("generate_stream", stream_generate_content(prompt)):
+        yield from streamed.feed(delta)
+        if streamed.finished:
+            break
+    streamed.close()
+
+    for question, details in top_up_mcqs(context_text, streamed.mcqs, num_questions).items():
+        if question not in streamed.mcqs:
+            yield question, details
+
+
+def open_document(
+    doc_id: str = "", upload: Optional[Upload] = None
+) -> Tuple[str, List[str], VectorIndex, BM25Index]:
+    """Index an uploaded file, or load a previously indexed doc_id."""
+    if upload is not None:
+        return index_document(upload)
+    if doc_id:
+        chunks, index, lexical = load_document(doc_id)
+        return doc_id, chunks, index, lexical
+    raise PipelineError("No file uploaded", 400)
+
+
+def run_mcq_pipeline(
+    num_questions: int,
+    user_focus: str,
+    doc_id: str = "",
+    upload: Optional[Upload] = None,
+) -> Dict[str, Any]:
+    """
+    End-to-end: index (or load) the document, then serve MCQs from the quiz
+    cache or generate them.
+    """
+    doc_id, chunks, index, lexical = open_document(doc_id, upload)
+    key = quiz_key(doc_id, user_focus, num_questions, PROMPT_VERSION)
+    quiz_cache = get_quiz_cache()
+    # Variant fills run this on the quiz cache's threads, each packing its
+    # own context; only this request's generation is reported.
+    generate = lambda: generate_mcqs(chunks, index, num_questions, user_focus, lexical)  # noqa: E731
+
+    mcqs = quiz_cache.lookup(key, generate)
+    cache_result("quiz", mcqs is not None)
+    if mcqs is not None:
+        return {"mcqs": mcqs, "doc_id": doc_id, "cached": True}
+
+    stats = ContextStats()
+    mcqs = generate_mcqs(chunks, index, num_questions, user_focus, lexical, stats)
+    quiz_cache.store(key, mcqs, generate)
+    return {"mcqs": mcqs, "doc_id": doc_id, "cached": False, "context": stats.as_dict()}
+
+
+def run_mcq_job(upload: Optional[Upload] = None, **params: Any) -> Dict[str, Any]:
+    """Job-queue entry point: owns the upload (see Upload.keep) and closes it."""
+    try:
+        return run_mcq_pipeline(upload=upload, **params)
+    finally:
+        if upload is not None:
+            upload.close()
+
+
+# -------------------------------------------------
+# ASYNC PIPELINE (ASGI mode)
+# The same steps with the LLM calls awaited on the async Gemini client.
+# Indexing and retrieval (parsing, chunking, embedding, scoring) run on
+# `executor`, so the event loop only waits on sockets.
+# -------------------------------------------------
+async def top_up_mcqs_async(
+    context_text: str, mcqs: Dict[str, Any], num_questions: int
+) -> Dict[str, Any]:
+    for _ in range(MCQ_REPAIR_ROUNDS):
+        prompt = top_up_prompt(context_text, mcqs, num_questions)
+        if prompt is None:
+            break
+        with timed("regenerate"):
+            raw = await generate_content_async(prompt)
+        if raw is None:
+            break
+        with timed("parse"):
+            mcqs = merge_questions([mcqs, parse_mcq_output(raw)], num_questions)
+    return mcqs
+
+
+async def generate_from_context_async(
+    context_chunks: List[str], num_questions: int
+) -> Dict[str, Any]:
+    context_text = "\n\n".join(context_chunks)
+    with timed("generate"):
+        raw = await generate_content_async(build_mcq_prompt(context_text, num_questions))
+    with timed("parse"):
+        mcqs = merge_questions([parse_mcq_output(raw)], num_questions)
+    mcqs = await top_up_mcqs_async(context_text, mcqs, num_questions)
+    if not mcqs:
+        raise PipelineError("LLM returned invalid JSON", 500, raw=raw)
+    return mcqs
+
+
+async def generate_shard_async(context_chunks: List[str], num_questions: int) -> Dict[str, Any]:
+    """One shard of a gathered request, timed on its own span stack."""
+    fork_timings()
+    return await generate_from_context_async(context_chunks, num_questions)
+
+
+async def retrieve_context_async(
+    chunks: List[str],
+    index: VectorIndex,
+    num_questions: int,
+    user_focus: str,
+    lexical: Optional[BM25Index] = None,
+    stats: Optional[ContextStats] = None,
+    executor: Optional[Executor] = None,
+) -> List[str]:
+    """retrieve_context on `executor`, its query embedding fetched on the loop first."""
+    if needs_query_embedding(user_focus, chunks, lexical):
+        query = build_retrieval_query(num_questions, user_focus)
+        await prefetch_embeddings_async([query], executor)
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, retrieve_context, chunks, index, num_questions, user_focus, lexical, stats
+    )
+
+
+async def generate_mcqs_async(
+    chunks: List[str],
+    index: VectorIndex,
+    num_questions: int,
+    user_focus: str,
+    lexical: Optional[BM25Index] = None,
+    stats: Optional[ContextStats] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Any]:
+    context = await retrieve_context_async(
+        chunks, index, num_questions, user_focus, lexical, stats, executor
+    )
+    budgets = plan_shards(num_questions)
+    if len(budgets) <= 1:
+        return await generate_from_context_async(context, num_questions)
+
+    # Shards run concurrently as coroutines; failed ones are dropped as
+    # long as one succeeds (see run_shards).
+    per_shard = max(1, -(-len(context) // len(budgets)))
+    contexts = assign_contexts(context, len(budgets), per_shard)
+    with timed("shards"):
+        results = await asyncio.gather(
+            *(generate_shard_async(ctx, budget) for ctx, budget in zip(contexts, budgets)),
+            return_exceptions=True,
+        )
+    ok = [r for r in results if not isinstance(r, BaseException)]
+    if not ok:
+        raise results[0]
+    merged = merge_questions(ok, num_questions)
+    return await top_up_mcqs_async("\n\n".join(context), merged, num_questions)
+
+
+async def stream_mcqs_async(
+    context_chunks: List[str], num_questions: int
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """stream_mcqs on the async Gemini client."""
+    context_text = "\n\n".join(context_chunks)
+    prompt = build_mcq_prompt(context_text, num_questions)
+    streamed = StreamedMCQs(num_questions)
+    with timed("generate_stream"):
+        async for delta in stream_generate_content_async(prompt):
+            for item in streamed.feed(delta):
+                yield item
+            if streamed.finished:
+                break
+    streamed.close()
+
+    topped_up = await top_up_mcqs_async(context_text, streamed.mcqs, num_questions)
+    for question, details in topped_up.items():
+        if question not in streamed.mcqs:
+            yield question, details
+
+
+async def run_mcq_pipeline_async(
+    num_questions: int,
+    user_focus: str,
+    doc_id: str = "",
+    upload: Optional[Upload] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Any]:
+    """run_mcq_pipeline for the event loop (see the section comment)."""
+    loop = asyncio.get_running_loop()
+    doc_id, chunks, index, lexical = await loop.run_in_executor(
+        executor, open_document, doc_id, upload
+    )
+    key = quiz_key(doc_id, user_focus, num_questions, PROMPT_VERSION)
+    quiz_cache = get_quiz_cache()
+    # Background variants (QUIZ_VARIANTS > 1) are generated on the quiz
+    # cache's own threads with the synchronous pipeline.
+    generate = lambda: generate_mcqs(chunks, index, num_questions, user_focus, lexical)  # noqa: E731
+
+    mcqs = await loop.run_in_executor(executor, quiz_cache.lookup, key, generate)
+    cache_result("quiz", mcqs is not None)
+    if mcqs is not None:
+        return {"mcqs": mcqs, "doc_id": doc_id, "cached": True}
+
+    stats = ContextStats()
+    mcqs = await generate_mcqs_async(
+        chunks, index, num_questions, user_focus, lexical, stats, executor
+    )
+    await loop.run_in_executor(executor, quiz_cache.store, key, mcqs, generate)
+    return {"mcqs": mcqs, "doc_id": doc_id, "cached": False, "context": stats.as_dict()}
+
+
+# -------------------------------------------------
+# COURSE LIBRARY
+# Cross-document retrieval over every document added to the library.
+# -------------------------------------------------
+def add_to_library(
+    course: str, doc_id: str = "", upload: Optional[Upload] = None
+) -> Dict[str, Any]:
+    """Index (or load) a document and insert its chunks into the library."""
+    doc_id, chunks, index, _ = open_document(doc_id, upload)
+    store = get_index_store()
+    filename = upload.filename if upload else (store.meta(doc_id) or {}).get("filename", "")
+    with timed("library_insert"):
+        added = get_library_index().add_document(
+            doc_id, chunks, index.matrix, store.load_pages(doc_id), course, filename
+        )
+    return {"doc_id": doc_id, "course": course, "chunks": added}
+
+
+def run_library_pipeline(
+    num_questions: int,
+    user_focus: str,
+    course: Optional[str] = None,
+    doc_ids: Optional[Sequence[str]] = None,
+    page_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    nprobe: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Generate MCQs from the best-matching chunks across the library,
+    optionally restricted to a course, documents and/or a page range.
+    """
+    budgets = plan_shards(num_questions)
+    baseline = baseline_chunks(num_questions)
+    query = build_retrieval_query(num_questions, user_focus)
+
+    with timed("retrieve"):
+        query_vec = np.asarray(embed_texts([query])[0], dtype=np.float32)
+        hits = get_library_index().search(
+            query_vec,
+            max(CONTEXT_CANDIDATES, 2 * baseline),
+            nprobe=nprobe,
+            course=course,
+            doc_ids=doc_ids,
+            page_range=page_range,
+        )
+    if not hits:
+        raise PipelineError("No library documents match the filters", 404)
+
+    stats = ContextStats()
+    with timed("pack"):
+        packed = pack_context(
+            [hit["text"] for hit in hits],
+            context_budget(num_questions),
+            positions=[(h["doc_id"], h["chunk_idx"]) for h in hits],
+            baseline_chunks=baseline,
+            stats=stats,
+        )
+    record_context(stats)
+
+    context = [text for _, text in packed]
+    if len(budgets) <= 1:
+        mcqs = generate_from_context(context, num_questions)
+    else:
+        mcqs = generate_sharded(context, budgets, num_questions)
+    sources = [
+        {"doc_id": hits[i]["doc_id"], "page": hits[i]["page"], "score": round(hits[i]["score"], 4)}
+        for i, _ in packed
+    ]
+    return {"mcqs": mcqs, "sources": sources, "context": stats.as_dict()}
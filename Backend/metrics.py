@@ -0,0 +1,342 @@
+import os
+from time import perf_counter
+import bisect
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+# Add a Server-Timing header with the stage breakdown to every response.
+# Clients can also ask for it per request with `X-Debug-Timing: 1`.
+METRICS_TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "0") == "1"
+
+# Seconds; covers cache hits (sub-ms) up to slow LLM calls.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+Labels = Tuple[str, ...]
+
+
+def _fmt_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# -------------------------------------------------
+# METRIC TYPES
+# -------------------------------------------------
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_fmt_labels(self.labelnames, labels)} {_fmt_value(v)}"
+            for labels, v in items
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with labels."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        lines = []
+        for labels, (counts, total, n) in items:
+            running = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                running += c
+                le = f'le="{_fmt_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {running}"
+                )
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {n}")
+        return lines
+
+
+# A collector returns [(name, kind, help, labelnames, {labels: value})] and
+# is called at scrape time, for values that other modules already track.
+Collector = Callable[[], List[Tuple[str, str, str, Sequence[str], Dict[Labels, float]]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Collector) -> Collector:
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            try:
+                families = fn()
+            except Exception as e:
+                lines.append(f"# collector {getattr(fn, '__name__', fn)} failed: {e}")
+                continue
+            for name, kind, help, labelnames, values in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, v in sorted(values.items()):
+                    lines.append(f"{name}{_fmt_labels(labelnames, labels)} {_fmt_value(v)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+stage_seconds = REGISTRY.histogram(
+    "smartedu_stage_seconds",
+    "Exclusive wall time per pipeline stage (nested stages are subtracted).",
+    ("stage",),
+)
+cache_requests = REGISTRY.counter(
+    "smartedu_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result")
+)
+bytes_processed = REGISTRY.counter(
+    "smartedu_bytes_total", "Bytes handled, by kind.", ("kind",)
+)
+chunks_processed = REGISTRY.counter(
+    "smartedu_chunks_total", "Chunks produced at ingestion, by outcome (kept, duplicate).", ("outcome",)
+)
+retrievals = REGISTRY.counter(
+    "smartedu_retrievals_total", "Chunk retrievals by mode (vector, hybrid, lexical).", ("mode",)
+)
+llm_replies = REGISTRY.counter(
+    "smartedu_llm_replies_total",
+    "LLM JSON replies by parse result (ok, repaired, salvaged, failed).",
+    ("kind", "result"),
+)
+mcq_questions = REGISTRY.counter(
+    "smartedu_mcq_questions_total",
+    "Generated MCQs by outcome (valid, invalid, regenerated = asked for again).",
+    ("outcome",),
+)
+context_tokens = REGISTRY.counter(
+    "smartedu_context_tokens_total",
+    "Estimated MCQ prompt context tokens, by kind (packed, baseline = top 5 chunks unpacked, trimmed overlap).",
+    ("kind",),
+)
+http_seconds = REGISTRY.histogram(
+    "smartedu_http_request_seconds", "Request latency by endpoint.", ("endpoint", "method")
+)
+http_responses = REGISTRY.counter(
+    "smartedu_http_responses_total", "Responses by endpoint and status.", ("endpoint", "status")
+)
+
+
+def cache_result(cache: str, hit: bool, n: int = 1) -> None:
+    if n:
+        cache_requests.inc(n, cache, "hit" if hit else "miss")
+
+
+# -------------------------------------------------
+# STAGE TIMING
+# -------------------------------------------------
+class _TimingState:
+    __slots__ = ("stack", "timings")
+
+    def __init__(self):
+        self.stack: List[List[float]] = []
+        self.timings: Optional[Dict[str, float]] = None
+
+
+# Per-thread (per-context) span stack. A ContextVar lookup is an order of
+# magnitude cheaper than threading.local attribute access.
+_state: ContextVar[Optional[_TimingState]] = ContextVar("smartedu_timing", default=None)
+
+
+def _get_state() -> _TimingState:
+    state = _state.get()
+    if state is None:
+        state = _TimingState()
+        _state.set(state)
+    return state
+
+
+def start_request_timings() -> None:
+    """Begin collecting this thread's stage timings (for Server-Timing)."""
+    _get_state().timings = {}
+
+
+def fork_timings() -> None:
+    """
+    Give the current task its own span stack, still recording into the
+    request's timings. Call at the start of a task run concurrently with
+    its siblings (asyncio.gather copies the parent's context, and with it
+    the parent's stack).
+    """
+    parent = _state.get()
+    state = _TimingState()
+    state.timings = parent.timings if parent is not None else None
+    _state.set(state)
+
+
+def pop_request_timings() -> Optional[Dict[str, float]]:
+    state = _get_state()
+    timings, state.timings = state.timings, None
+    return timings
+
+
+def _record(state: _TimingState, stage: str, seconds: float) -> None:
+    stage_seconds.observe(seconds, stage)
+    if state.timings is not None:
+        state.timings[stage] = state.timings.get(stage, 0.0) + seconds
+
+
+def _close(stack: List[List[float]], frame: List[float]) -> float:
+    """Remove a span; returns its self time and charges its total to the parent."""
+    if stack and stack[-1] is frame:
+        stack.pop()
+        i = len(stack)
+    else:
+        i = next(i for i in range(len(stack) - 1, -1, -1) if stack[i] is frame)
+        del stack[i]
+    total = perf_counter() - frame[0]
+    if i:
+        stack[i - 1][1] += total
+    return total - frame[1]
+
+
+class timed:
+    """
+    Context manager recording the wall time of its block under `stage`.
+    Time spent in nested timed blocks on the same thread is attributed to
+    those stages instead.
+    """
+
+    __slots__ = ("stage", "_state", "_frame")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "timed":
+        self._state = _get_state()
+        self._frame = [perf_counter(), 0.0]
+        self._state.stack.append(self._frame)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        _record(self._state, self.stage, _close(self._state.stack, self._frame))
+
+
+def timed_iter(stage: str, iterable: Iterable[Any]) -> Iterator[Any]:
+    """
+    Wrap a (lazy) iterable so the time spent producing its items is
+    recorded once, under `stage`, when it is exhausted or closed. Works for
+    generators interleaved with other stages, e.g. page extraction feeding
+    chunking feeding embedding.
+    """
+    it = iter(iterable)
+    state = _get_state()
+    stack = state.stack
+    spent = 0.0
+    try:
+        while True:
+            frame = [perf_counter(), 0.0]
+            stack.append(frame)
+            try:
+                item = next(it)
+            except StopIteration:
+                break
+            finally:
+                spent += _close(stack, frame)
+            yield item
+    finally:
+        _record(state, stage, spent)
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
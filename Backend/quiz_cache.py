@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from embedding_cache import CACHE_DIR
+from ttl_cache import TTLCache
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+QUIZ_CACHE_SIZE = int(os.getenv("QUIZ_CACHE_SIZE", "512"))
+QUIZ_CACHE_TTL = float(os.getenv("QUIZ_CACHE_TTL", str(7 * 24 * 3600)))
+# Set QUIZ_CACHE_PERSIST=0 to keep the cache in memory only.
+QUIZ_CACHE_PERSIST = os.getenv("QUIZ_CACHE_PERSIST", "1") == "1"
+QUIZ_CACHE_PATH = os.getenv("QUIZ_CACHE_PATH", os.path.join(CACHE_DIR, "quizzes.db"))
+# Variant pool size per key. 1 = plain cache (same quiz for everyone);
+# N > 1 = after the first generation, N - 1 more variants are generated in
+# the background and hits are served a random one.
+QUIZ_VARIANTS = int(os.getenv("QUIZ_VARIANTS", "1"))
+
+_SPACES = re.compile(r"\s+")
+
+Quiz = Dict[str, Any]
+
+
+def normalize_focus(user_focus: str) -> str:
+    return _SPACES.sub(" ", user_focus.strip().lower())
+
+
+def quiz_key(doc_id: str, user_focus: str, num_questions: int, prompt_version: int) -> str:
+    raw = json.dumps([doc_id, normalize_focus(user_focus), num_questions, prompt_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------
+# QUIZ CACHE + VARIANT POOL
+# -------------------------------------------------
+class QuizCache:
+    """Cache of generated quizzes; each key holds a pool of up to `variants`."""
+
+    def __init__(self, cache: TTLCache, variants: int = QUIZ_VARIANTS, workers: int = 2):
+        self.cache = cache
+        self.variants = max(1, variants)
+        self._lock = threading.Lock()
+        self._filling = set()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quiz-fill")
+
+    def pool(self, key: str) -> List[Quiz]:
+        return self.cache.get(key) or []
+
+    def _add(self, key: str, quiz: Quiz) -> int:
+        with self._lock:
+            pool = list(self.pool(key))
+            if quiz and quiz not in pool and len(pool) < self.variants:
+                pool.append(quiz)
+                self.cache.set(key, pool)
+            return len(pool)
+
+    def _fill(self, key: str, generate: Callable[[], Quiz]) -> None:
+        try:
+            # Bounded attempts, in case the model keeps repeating itself.
+            for _ in range(2 * self.variants):
+                if len(self.pool(key)) >= self.variants:
+                    break
+                self._add(key, generate())
+        except Exception as e:
+            print(f"Quiz variant generation failed: {e}")
+        finally:
+            with self._lock:
+                self._filling.discard(key)
+
+    def fill_async(self, key: str, generate: Callable[[], Quiz]) -> None:
+        """Top the pool up to `variants` in the background (once per key)."""
+        with self._lock:
+            if self.variants <= 1 or key in self._filling:
+                return
+            self._filling.add(key)
+        self._executor.submit(self._fill, key, generate)
+
+    def lookup(self, key: str, generate: Callable[[], Quiz]) -> Optional[Quiz]:
+        """A cached quiz for key, or None; an incomplete pool is topped up."""
+        pool = self.pool(key)
+        if not pool:
+            return None
+        if len(pool) < self.variants:
+            self.fill_async(key, generate)
+        return random.choice(pool)
+
+    def store(self, key: str, quiz: Quiz, generate: Callable[[], Quiz]) -> None:
+        """Cache a freshly generated quiz and start filling its variant pool."""
+        self._add(key, quiz)
+        self.fill_async(key, generate)
+
+    def get_or_generate(self, key: str, generate: Callable[[], Quiz]) -> Tuple[Quiz, bool]:
+        """Return (quiz, cache_hit); generates and stores the quiz on a miss."""
+        quiz = self.lookup(key, generate)
+        if quiz is not None:
+            return quiz, True
+
+        quiz = generate()
+        self.store(key, quiz, generate)
+        return quiz, False
+
+
+_quiz_cache: Optional[QuizCache] = None
+_quiz_cache_lock = threading.Lock()
+
+
+def get_quiz_cache() -> QuizCache:
+    global _quiz_cache
+    if _quiz_cache is None:
+        with _quiz_cache_lock:
+            if _quiz_cache is None:
+                _quiz_cache = QuizCache(TTLCache(
+                    max_items=QUIZ_CACHE_SIZE,
+                    ttl=QUIZ_CACHE_TTL,
+                    db_path=QUIZ_CACHE_PATH if QUIZ_CACHE_PERSIST else None,
+                    table="quizzes",
+                ))
+    return _quiz_cache
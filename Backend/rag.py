@@ -1,61 +1,197 @@
 import os
-import json
-import tempfile
-from typing import List, Tuple
+import asyncio
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import IO, TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
-import streamlit as st
-import requests
 from dotenv import load_dotenv
-from pptx import Presentation
-import docx2txt
-import PyPDF2
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from embedding_cache import get_embedding_cache
+from gemini_client import embed_contents_async, generate_content, get_embedding_client
+from lexical import BM25Index, reciprocal_rank_fusion, tokenize
+from metrics import cache_result, retrievals
+from retrieval import VectorIndex, top_k_indices
+
+if TYPE_CHECKING:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# RAG core library. Parsers and the text splitter are imported lazily, per
+# format, so importing this module (e.g. from the Flask API) stays cheap.
+# The Streamlit UI lives in streamlit_app.py.
 
 # -----------------------------
 # ENV + API CONFIG
 # -----------------------------
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY is not set in the environment.")
+# LLM (MCQ generation) and embedding (RAG) requests both go through the
+# pooled client in gemini_client, which reads GEMINI_API_KEY per call.
+EMBEDDING_MODEL = "models/text-embedding-004"
 
-# LLM endpoint (MCQ generation)
-GEMINI_ENDPOINT = (
-    f"https://generativelanguage.googleapis.com/v1beta/models/"
-    f"gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-)
+SUPPORTED_EXTENSIONS = ("pdf", "docx", "pptx")
 
-# Embedding endpoint (RAG)
-GEMINI_EMBEDDING_ENDPOINT = (
-    f"https://generativelanguage.googleapis.com/v1beta/models/"
-    f"text-embedding-004:batchEmbedContents?key={GEMINI_API_KEY}"
-)
+# PDF pages are extracted in batches of PDF_PAGE_BATCH on a process pool;
+# at most PDF_WORKERS batches are in flight, which bounds memory.
+PDF_PAGE_BATCH = int(os.getenv("PDF_PAGE_BATCH", "16"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
 
 # -----------------------------
 # FILE TEXT EXTRACTION
 # -----------------------------
-def extract_text(file_path: str, ext: str) -> str:
-    text = ""
-    if ext == "pdf":
-        with open(file_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pdf_pool
+
+
+# A document is a file path or a readable, seekable binary file object
+# (e.g. an uploads.UploadBuffer, parsed in place without a copy).
+Source = Union[str, IO[bytes]]
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Worker: extract pages [start, stop) of a PDF (runs in the process pool)."""
+    import PyPDF2
+
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _iter_pdf_pages(source: Source, batch_size: int) -> Iterator[str]:
+    import PyPDF2
+
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            num_pages = len(PyPDF2.PdfReader(f).pages)
+        file_path = source
+    else:
+        reader = PyPDF2.PdfReader(source)
+        num_pages = len(reader.pages)
+        # Pool workers need a path; buffers that cannot provide one
+        # (plain file objects) are extracted in this process.
+        spill = getattr(source, "spill", None)
+        if num_pages <= batch_size or spill is None:
             for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+                yield page.extract_text() or ""
+            return
+        file_path = spill()
+
+    # Small documents are not worth the pool round trip.
+    if num_pages <= batch_size:
+        yield from _extract_pdf_pages(file_path, 0, num_pages)
+        return
+
+    pool = _get_pdf_pool()
+    batches = iter(range(0, num_pages, batch_size))
+    in_flight = deque()
+    for start in batches:
+        in_flight.append(
+            pool.submit(_extract_pdf_pages, file_path, start, min(start + batch_size, num_pages))
+        )
+        if len(in_flight) >= PDF_WORKERS:
+            break
+
+    while in_flight:
+        pages = in_flight.popleft().result()
+        start = next(batches, None)
+        if start is not None:
+            in_flight.append(
+                pool.submit(_extract_pdf_pages, file_path, start, min(start + batch_size, num_pages))
+            )
+        yield from pages
+
+
+def iter_numbered_pages(
+    source: Source, ext: str, batch_size: int = PDF_PAGE_BATCH
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) one unit at a time: PDF pages (in order,
+    extracted in parallel batches), PPTX slides, or DOCX paragraph blocks.
+    Numbers are 1-based and count empty units, which are skipped.
+    `source` is a path or a binary file object.
+    """
+    if ext == "pdf":
+        pages = _iter_pdf_pages(source, batch_size)
     elif ext == "docx":
-        text = docx2txt.process(file_path)
+        import docx2txt
+
+        pages = docx2txt.process(source).split("\n\n")
     elif ext == "pptx":
-        prs = Presentation(file_path)
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
+        from pptx import Presentation
+
+        prs = Presentation(source)
+        pages = (
+            "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text"))
+            for slide in prs.slides
+        )
     else:
-        st.error("Unsupported file type.")
-    return text.strip()
+        raise ValueError(f"Unsupported file type: {ext}")
+
+    for number, page in enumerate(pages, 1):
+        if page and page.strip():
+            yield number, page
+
+
+def iter_pages(source: Source, ext: str, batch_size: int = PDF_PAGE_BATCH) -> Iterator[str]:
+    """Page texts only; see iter_numbered_pages."""
+    for _, page in iter_numbered_pages(source, ext, batch_size):
+        yield page
+
+
+def extract_text(source: Source, ext: str) -> str:
+    try:
+        return "\n".join(iter_pages(source, ext)).strip()
+    except ValueError:
+        return ""
+
+
+def make_splitter(
+    chunk_size: int = 1500, chunk_overlap: int = 200
+) -> "RecursiveCharacterTextSplitter":
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def iter_page_chunks(
+    pages: Iterable[Tuple[int, str]], splitter: "RecursiveCharacterTextSplitter"
+) -> Iterator[Tuple[int, str]]:
+    """
+    Chunk a numbered page stream incrementally, yielding (start_page, chunk).
+
+    Each page is split together with the unfinished tail of the previous one;
+    every chunk but the last is final and yielded at once, so chunking keeps
+    pace with extraction and only one page plus one chunk is buffered.
+    A chunk's page is the one it starts on (chunks after the first in a
+    split are attributed to the current page).
+    """
+    tail = ""
+    tail_page = 0
+    for number, page in pages:
+        parts = splitter.split_text(f"{tail}\n{page}" if tail else page)
+        if not parts:
+            continue
+        starts = [tail_page if tail else number] + [number] * (len(parts) - 1)
+        yield from zip(starts[:-1], parts[:-1])
+        tail, tail_page = parts[-1], starts[-1]
+    if tail:
+        yield tail_page, tail
+
+
+def iter_chunks(
+    pages: Iterable[str], splitter: "RecursiveCharacterTextSplitter"
+) -> Iterator[str]:
+    """Chunk texts only, for an unnumbered page stream; see iter_page_chunks."""
+    for _, chunk in iter_page_chunks(enumerate(pages, 1), splitter):
+        yield chunk
 
 
 # -----------------------------
@@ -63,55 +199,80 @@ def extract_text(file_path: str, ext: str) -> str:
 # -----------------------------
 def call_gemini(prompt: str) -> str | None:
     """Call Gemini 2.5-flash for text generation (MCQs)."""
-    headers = {"Content-Type": "application/json"}
-    data = {"contents": [{"parts": [{"text": prompt}]}]}
-    resp = requests.post(GEMINI_ENDPOINT, headers=headers, json=data)
-    resp.raise_for_status()
-    json_response = resp.json()
-    try:
-        return json_response["candidates"][0]["content"]["parts"][0]["text"]
-    except KeyError as e:
-        st.error(f"Error parsing Gemini response: {e}")
-        st.json(json_response)
-        return None
+    return generate_content(prompt)
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def embed_texts_async(texts: List[str]) -> "Future[List[np.ndarray]]":
     """
-    Get embeddings for a list of texts using Gemini text-embedding-004.
+    Embed texts through the content-addressed cache, without blocking on
+    the network.
 
-    Uses batchEmbedContents:
-    POST .../models/text-embedding-004:batchEmbedContents
-    Request: { "requests": [ { "model": "models/text-embedding-004", "content": {...} }, ... ] }
-    Response: { "embeddings": [ { "value": [...] }, ... ] }
+    Only texts that miss the cache (deduplicated) are submitted to the
+    embedding client, so re-uploading the same document costs no round
+    trips. The future resolves to one float32 vector per input text, in
+    input order.
     """
+    result: Future = Future()
     if not texts:
-        return []
-
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "requests": [
-            {
-                "model": "models/text-embedding-004",
-                "content": {"parts": [{"text": t}]},
+        result.set_result([])
+        return result
+
+    cache = get_embedding_cache()
+    vectors = cache.get_many(texts, EMBEDDING_MODEL)
+
+    misses = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    hits = sum(v is not None for v in vectors)
+    cache_result("embedding", True, hits)
+    cache_result("embedding", False, len(texts) - hits)
+    if not misses:
+        result.set_result(vectors)
+        return result
+
+    def fill(fut: Future):
+        # Runs as a done-callback, where an exception would be logged and
+        # dropped, leaving `result` (and every .result() on it) pending.
+        try:
+            if fut.exception() is not None:
+                result.set_exception(fut.exception())
+                return
+            fetched = fut.result()
+            if len(fetched) != len(misses):
+                raise ValueError(f"Got {len(fetched)} embeddings for {len(misses)} texts")
+            cache.put_many(misses, fetched, EMBEDDING_MODEL)
+            by_text = {
+                t: np.asarray(v, dtype=np.float32) for t, v in zip(misses, fetched)
             }
-            for t in texts
-        ]
-    }
-    resp = requests.post(GEMINI_EMBEDDING_ENDPOINT, headers=headers, json=payload)
-    resp.raise_for_status()
-    data = resp.json()
-
-    embeddings = []
-    try:
-        for emb in data["embeddings"]:
-            embeddings.append(emb["values"])
-    except KeyError as e:
-        st.error(f"Error parsing embedding response: {e}")
-        st.json(data)
-        return []
+            result.set_result(
+                [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+            )
+        except BaseException as e:
+            result.set_exception(e)
 
-    return embeddings
+    get_embedding_client().submit(misses).add_done_callback(fill)
+    return result
+
+
+def embed_texts(texts: List[str]) -> List[np.ndarray]:
+    """Blocking form of embed_texts_async."""
+    return embed_texts_async(texts).result()
+
+
+async def prefetch_embeddings_async(
+    texts: List[str], executor: Optional[Executor] = None
+) -> None:
+    """
+    Event-loop warm-up (ASGI mode): embed the texts missing from the cache
+    on the async Gemini client, so a following embed_texts on `executor`
+    is a cache hit instead of a thread blocked on the network. Cache reads
+    and writes (SQLite) run on `executor`.
+    """
+    loop = asyncio.get_running_loop()
+    cache = get_embedding_cache()
+    vectors = await loop.run_in_executor(executor, cache.get_many, texts, EMBEDDING_MODEL)
+    misses = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if misses:
+        fetched = await embed_contents_async(misses)
+        await loop.run_in_executor(executor, cache.put_many, misses, fetched, EMBEDDING_MODEL)
 
 
 # -----------------------------
@@ -128,212 +289,165 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     return float(np.dot(a, b) / denom)
 
 
-def build_index(chunks: List[str]) -> Tuple[List[str], np.ndarray]:
+def build_index(
+    chunks: List[str], lexical: Optional[BM25Index] = None
+) -> Tuple[List[str], VectorIndex]:
     """
     Build an in-memory index:
     - chunks: list of chunk texts
-    - embeddings: numpy array (num_chunks, dim)
+    - index: VectorIndex over the row-normalized embeddings (num_chunks, dim)
+    If `lexical` is given, the chunks are also added to that BM25 index.
     """
+    if lexical is not None:
+        lexical.add_many(chunks)
     embeddings_list = embed_texts(chunks)
     if not embeddings_list:
         raise ValueError("Failed to generate embeddings for chunks.")
     embeddings = np.array(embeddings_list, dtype=np.float32)
-    return chunks, embeddings
+    return chunks, VectorIndex(embeddings)
+
+
+def build_index_streaming(
+    chunks: Iterable[str], batch_size: int = 64, lexical: Optional[BM25Index] = None
+) -> Tuple[List[str], Optional[VectorIndex]]:
+    """
+    Build the index from a chunk stream. Every batch_size chunks are
+    submitted for embedding while extraction continues; the embedding
+    client's in-flight limit applies backpressure to the parser.
+    If `lexical` is given, each chunk is added to it as it arrives.
+    Returns ([], None) when the stream yields no chunks.
+    """
+    all_chunks: List[str] = []
+    pending: List[Future] = []
+    batch: List[str] = []
+
+    for chunk in chunks:
+        if lexical is not None:
+            lexical.add(chunk)
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            pending.append(embed_texts_async(batch))
+            all_chunks.extend(batch)
+            batch = []
+    if batch:
+        pending.append(embed_texts_async(batch))
+        all_chunks.extend(batch)
+
+    if not all_chunks:
+        return [], None
+
+    vectors = [v for fut in pending for v in fut.result()]
+    if len(vectors) != len(all_chunks):
+        raise ValueError("Failed to generate embeddings for chunks.")
+    return all_chunks, VectorIndex(np.array(vectors, dtype=np.float32))
+
+
+def _as_index(embeddings: VectorIndex | np.ndarray) -> VectorIndex:
+    if isinstance(embeddings, VectorIndex):
+        return embeddings
+    return VectorIndex(embeddings)
 
 
 def retrieve_top_k(
-    query: str, chunks: List[str], embeddings: np.ndarray, k: int = 5
+    query: str,
+    chunks: List[str],
+    embeddings: VectorIndex | np.ndarray,
+    k: int = 5,
 ) -> List[str]:
     """
     Retrieve top-k most similar chunks for a query.
     """
-    if not chunks or embeddings is None or len(chunks) == 0:
-        return []
+    results = retrieve_top_k_batch([query], chunks, embeddings, k=k)
+    return results[0] if results else []
 
-    query_emb_list = embed_texts([query])
-    if not query_emb_list:
-        return []
-    query_emb = np.array(query_emb_list[0], dtype=np.float32)
 
-    # Compute cosine similarity with each chunk embedding
-    sims = []
-    for idx, ch_emb in enumerate(embeddings):
-        sim = cosine_similarity(query_emb, ch_emb)
-        sims.append((sim, idx))
+def _uses_lexical(focus: str, chunks: List[str], lexical: Optional[BM25Index]) -> bool:
+    return lexical is not None and len(lexical) == len(chunks) and bool(tokenize(focus))
 
-    # Sort descending by similarity and take top-k
-    sims.sort(reverse=True, key=lambda x: x[0])
-    top_indices = [idx for _, idx in sims[:k]]
 
-    return [chunks[i] for i in top_indices]
+def needs_query_embedding(focus: str, chunks: List[str], lexical: Optional[BM25Index]) -> bool:
+    """Whether rank_hybrid will embed its query (no heading fast path)."""
+    return not _uses_lexical(focus, chunks, lexical) or not lexical.heading_matches(focus)
 
 
-# -----------------------------
-# STREAMLIT APP (RAG + MCQ)
-# -----------------------------
-st.set_page_config(page_title="LLM + RAG MCQ Generator", layout="centered")
-st.title("📘 LLM + RAG Based MCQ Generator")
-st.write(
-    "Upload a PDF, DOCX, or PPTX — I’ll extract the key concepts, build a RAG index, "
-    "and generate simple, meaningful MCQs in JSON format."
-)
-
-uploaded_file = st.file_uploader("Upload your file:", type=["pdf", "docx", "pptx"])
-
-if uploaded_file:
-    ext = uploaded_file.name.split(".")[-1].lower()
-    tmp_file_path = None
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix="." + ext) as tmp:
-            tmp.write(uploaded_file.read())
-            tmp_file_path = tmp.name
-
-        text = extract_text(tmp_file_path, ext)
-    finally:
-        if tmp_file_path and os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
-
-    if text:
-        st.success("✅ File processed successfully!")
-
-        # Preview
-        st.write("### Extracted Preview:")
-        st.text_area(
-            "Document Preview",
-            text[:1000] + ("..." if len(text) > 1000 else ""),
-            height=200,
-        )
+def rank_hybrid(
+    query: str,
+    focus: str,
+    chunks: List[str],
+    embeddings: VectorIndex | np.ndarray,
+    lexical: Optional[BM25Index],
+    k: int = 5,
+) -> List[int]:
+    """
+    Indices of the top-k chunks for a user focus string, best first.
+
+    - Fast path: when every focus term appears in some chunk's headings
+      ("Unit 2", "Definitions"), those chunks are returned, best BM25 first
+      and topped up with the best other BM25 hits. No embedding call.
+    - Otherwise the vector ranking of `query` and the BM25 ranking of
+      `focus` are merged by reciprocal-rank fusion.
+    Without focus terms or a lexical index this is vector search alone.
+    """
+    if not chunks or embeddings is None:
+        return []
+    if not _uses_lexical(focus, chunks, lexical):
+        query_embs = embed_texts([query])
+        if not query_embs:
+            return []
+        retrievals.inc(1, "vector")
+        top, _ = _as_index(embeddings).search(np.asarray(query_embs[0], dtype=np.float32), k)
+        return top.tolist()
+
+    scores = lexical.scores(focus)
+    lexical_rank = [int(i) for i in top_k_indices(scores, max(k * 4, 20)) if scores[i] > 0]
+
+    matched = lexical.heading_matches(focus)
+    if matched:
+        order = sorted(matched, key=lambda i: (-scores[i], i))[:k]
+        order += [i for i in lexical_rank if i not in matched][: k - len(order)]
+        retrievals.inc(1, "lexical")
+        return order
+
+    query_embs = embed_texts([query])
+    if not query_embs:
+        return []
+    vector_rank, _ = _as_index(embeddings).search(
+        np.asarray(query_embs[0], dtype=np.float32), max(k * 4, 20)
+    )
+    retrievals.inc(1, "hybrid")
+    return reciprocal_rank_fusion([vector_rank.tolist(), lexical_rank], k)
+
+
+def retrieve_hybrid(
+    query: str,
+    focus: str,
+    chunks: List[str],
+    embeddings: VectorIndex | np.ndarray,
+    lexical: Optional[BM25Index],
+    k: int = 5,
+) -> List[str]:
+    """Top-k chunk texts for a user focus string (see rank_hybrid)."""
+    return [chunks[i] for i in rank_hybrid(query, focus, chunks, embeddings, lexical, k)]
 
-        # Build chunks + vector index (RAG) once per upload
-        with st.spinner("🔧 Building RAG index (chunking + embeddings)..."):
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1500,
-                chunk_overlap=200,
-            )
-            chunks = splitter.split_text(text)
-
-            # Build in-memory index
-            try:
-                indexed_chunks, chunk_embeddings = build_index(chunks)
-                st.session_state["rag_chunks"] = indexed_chunks
-                st.session_state["rag_embeddings"] = chunk_embeddings
-                st.success("📚 RAG index ready! You can now generate MCQs.")
-            except Exception as e:
-                st.error(f"Failed to build RAG index: {e}")
-                st.stop()
-
-        # Optional: let the user specify how many questions or what focus
-        st.write("### MCQ Generation Settings")
-        num_questions = st.slider(
-            "Number of MCQs to generate", min_value=3, max_value=20, value=8, step=1
-        )
-        user_focus = st.text_input(
-            "Optional: Focus area (e.g., 'Unit 2 only', 'definitions', 'algorithms').",
-            "",
-        )
 
-        if st.button("Generate MCQs"):
-            with st.spinner("🧠 Retrieving relevant content and generating MCQs..."):
-                rag_chunks = st.session_state.get("rag_chunks", [])
-                rag_embeddings = st.session_state.get("rag_embeddings", None)
-
-                if not rag_chunks or rag_embeddings is None:
-                    st.error("RAG index not found. Please re-upload the file.")
-                    st.stop()
-
-                # Build a retrieval query for RAG
-                if user_focus.strip():
-                    query = (
-                        f"Key concepts related to: {user_focus.strip()}. "
-                        f"Use this to generate {num_questions} simple, meaningful MCQs."
-                    )
-                else:
-                    query = (
-                        f"Key concepts that are most important in this document "
-                        f"for generating about {num_questions} simple, meaningful MCQs."
-                    )
-
-                # Retrieve top-k chunks (RAG core step)
-                retrieved_chunks = retrieve_top_k(
-                    query, rag_chunks, rag_embeddings, k=5
-                )
-
-                if not retrieved_chunks:
-                    st.error("Could not retrieve relevant chunks for MCQ generation.")
-                    st.stop()
-
-                context_text = "\n\n".join(retrieved_chunks)
-
-                # Prompt with retrieved context only (RAG)
-                prompt = f"""
-You are an expert educational AI system. Your task is to generate multiple-choice questions (MCQs)
-based on the most important and easy-to-understand themes in the given content.
-
-### Retrieved Context:
-{context_text}
-
-### Instructions:
-- Generate **{num_questions}** simple, meaningful MCQs that test understanding.
-- Each question must have exactly 4 options and one correct answer.
-- Assign a difficulty level to each question based on its conceptual depth:
-  - "Easy" → simple recall or fact-based
-  - "Medium" → involves understanding or application
-  - "Hard" → requires analysis or reasoning
-- Use information **only** from the retrieved context above.
-- Return the output strictly in this JSON format (with many entries, one per question):
-
-{{
-  "Question text 1": {{
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_option": "Correct Option Text",
-    "difficulty": "Easy | Medium | Hard"
-  }},
-  "Question text 2": {{
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_option": "Correct Option Text",
-    "difficulty": "Easy | Medium | Hard"
-  }}
-  ...
-}}
-
-Do not include any explanations or text outside JSON.
-"""
-
-                try:
-                    response_text = call_gemini(prompt)
-                    if response_text:
-                        # Strip ```json fences if model adds them
-                        cleaned = response_text.strip()
-                        if cleaned.startswith("```json"):
-                            cleaned = cleaned[7:]
-                        if cleaned.endswith("```"):
-                            cleaned = cleaned[:-3]
-                        cleaned = cleaned.strip()
-
-                        mcq_json = json.loads(cleaned)
-                        st.success("✅ MCQs generated successfully!")
-                        st.json(mcq_json)
-
-                        json_str = json.dumps(mcq_json, indent=4)
-                        st.download_button(
-                            label="📥 Download JSON",
-                            data=json_str,
-                            file_name="generated_mcqs.json",
-                            mime="application/json",
-                        )
-                    else:
-                        st.error("No response received from Gemini.")
-                except json.JSONDecodeError:
-                    st.error("❌ LLM response was not valid JSON. Please retry.")
-                    st.text("Raw response from LLM:")
-                    st.text(response_text)
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
-                    st.text("Raw response from LLM (if available):")
-                    st.text(response_text if "response_text" in locals() else "No response captured.")
+def retrieve_top_k_batch(
+    queries: List[str],
+    chunks: List[str],
+    embeddings: VectorIndex | np.ndarray,
+    k: int = 5,
+) -> List[List[str]]:
+    """
+    Retrieve top-k chunks for several queries with one embedding call
+    and one matrix multiply.
+    """
+    if not queries or not chunks or embeddings is None or len(chunks) == 0:
+        return []
+
+    query_embs = embed_texts(queries)
+    if not query_embs:
+        return []
 
-    else:
-        st.error(
-            "❌ Could not extract any text from the uploaded file. "
-            "It might be empty, scanned as an image, or corrupted."
-        )
+    index = _as_index(embeddings)
+    top_indices, _ = index.search_batch(np.array(query_embs, dtype=np.float32), k)
+
+    return [[chunks[i] for i in row] for row in top_indices]
@@ -0,0 +1,77 @@
+from typing import Tuple
+
+import numpy as np
+
+# -------------------------------------------------
+# NORMALIZATION
+# -------------------------------------------------
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row as float32. All-zero rows stay zero."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest scores along the last axis, best first.
+
+    argpartition selects the top k in O(n); only those k are then sorted.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+# -------------------------------------------------
+# VECTOR INDEX
+# -------------------------------------------------
+class VectorIndex:
+    """
+    Dense cosine-similarity index over chunk embeddings.
+
+    Rows are normalized once at build time, so scoring a query is a single
+    matrix-vector product and scoring a batch of queries is one matmul.
+    """
+
+    def __init__(self, embeddings: np.ndarray, normalized: bool = False):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.matrix = embeddings if normalized else normalize_rows(embeddings)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine scores, shape (num_queries, num_chunks)."""
+        return normalize_rows(queries) @ self.matrix.T
+
+    def search(self, query: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (indices, scores) for one query vector, best first."""
+        idx, sims = self.search_batch(np.asarray(query).reshape(1, -1), k)
+        return idx[0], sims[0]
+
+    def search_batch(
+        self, queries: np.ndarray, k: int = 5
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (indices, scores) per row of a (num_queries, dim) matrix."""
+        if len(self) == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        sims = self.scores(queries)
+        idx = top_k_indices(sims, k)
+        return idx, np.take_along_axis(sims, idx, axis=-1)
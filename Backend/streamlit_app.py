@@ -0,0 +1,174 @@
+import os
+import json
+import tempfile
+
+import streamlit as st
+
+from rag import build_index, call_gemini, extract_text, make_splitter, retrieve_top_k
+
+# -----------------------------
+# STREAMLIT APP (RAG + MCQ)
+# -----------------------------
+st.set_page_config(page_title="LLM + RAG MCQ Generator", layout="centered")
+st.title("📘 LLM + RAG Based MCQ Generator")
+st.write(
+    "Upload a PDF, DOCX, or PPTX — I’ll extract the key concepts, build a RAG index, "
+    "and generate simple, meaningful MCQs in JSON format."
+)
+
+uploaded_file = st.file_uploader("Upload your file:", type=["pdf", "docx", "pptx"])
+
+if uploaded_file:
+    ext = uploaded_file.name.split(".")[-1].lower()
+    tmp_file_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix="." + ext) as tmp:
+            tmp.write(uploaded_file.read())
+            tmp_file_path = tmp.name
+
+        text = extract_text(tmp_file_path, ext)
+    finally:
+        if tmp_file_path and os.path.exists(tmp_file_path):
+            os.unlink(tmp_file_path)
+
+    if text:
+        st.success("✅ File processed successfully!")
+
+        # Preview
+        st.write("### Extracted Preview:")
+        st.text_area(
+            "Document Preview",
+            text[:1000] + ("..." if len(text) > 1000 else ""),
+            height=200,
+        )
+
+        # Build chunks + vector index (RAG) once per upload
+        with st.spinner("🔧 Building RAG index (chunking + embeddings)..."):
+            splitter = make_splitter()
+            chunks = splitter.split_text(text)
+
+            # Build in-memory index
+            try:
+                indexed_chunks, chunk_embeddings = build_index(chunks)
+                st.session_state["rag_chunks"] = indexed_chunks
+                st.session_state["rag_embeddings"] = chunk_embeddings
+                st.success("📚 RAG index ready! You can now generate MCQs.")
+            except Exception as e:
+                st.error(f"Failed to build RAG index: {e}")
+                st.stop()
+
+        # Optional: let the user specify how many questions or what focus
+        st.write("### MCQ Generation Settings")
+        num_questions = st.slider(
+            "Number of MCQs to generate", min_value=3, max_value=20, value=8, step=1
+        )
+        user_focus = st.text_input(
+            "Optional: Focus area (e.g., 'Unit 2 only', 'definitions', 'algorithms').",
+            "",
+        )
+
+        if st.button("Generate MCQs"):
+            with st.spinner("🧠 Retrieving relevant content and generating MCQs..."):
+                rag_chunks = st.session_state.get("rag_chunks", [])
+                rag_embeddings = st.session_state.get("rag_embeddings", None)
+
+                if not rag_chunks or rag_embeddings is None:
+                    st.error("RAG index not found. Please re-upload the file.")
+                    st.stop()
+
+                # Build a retrieval query for RAG
+                if user_focus.strip():
+                    query = (
+                        f"Key concepts related to: {user_focus.strip()}. "
+                        f"Use this to generate {num_questions} simple, meaningful MCQs."
+                    )
+                else:
+                    query = (
+                        f"Key concepts that are most important in this document "
+                        f"for generating about {num_questions} simple, meaningful MCQs."
+                    )
+
+                # Retrieve top-k chunks (RAG core step)
+                retrieved_chunks = retrieve_top_k(
+                    query, rag_chunks, rag_embeddings, k=5
+                )
+
+                if not retrieved_chunks:
+                    st.error("Could not retrieve relevant chunks for MCQ generation.")
+                    st.stop()
+
+                context_text = "\n\n".join(retrieved_chunks)
+
+                # Prompt with retrieved context only (RAG)
+                prompt = f"""
+You are an expert educational AI system. Your task is to generate multiple-choice questions (MCQs)
+based on the most important and easy-to-understand themes in the given content.
+
+### Retrieved Context:
+{context_text}
+
+### Instructions:
+- Generate **{num_questions}** simple, meaningful MCQs that test understanding.
+- Each question must have exactly 4 options and one correct answer.
+- Assign a difficulty level to each question based on its conceptual depth:
+  - "Easy" → simple recall or fact-based
+  - "Medium" → involves understanding or application
+  - "Hard" → requires analysis or reasoning
+- Use information **only** from the retrieved context above.
+- Return the output strictly in this JSON format (with many entries, one per question):
+
+{{
+  "Question text 1": {{
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_option": "Correct Option Text",
+    "difficulty": "Easy | Medium | Hard"
+  }},
+  "Question text 2": {{
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_option": "Correct Option Text",
+    "difficulty": "Easy | Medium | Hard"
+  }}
+  ...
+}}
+
+Do not include any explanations or text outside JSON.
+"""
+
+                try:
+                    response_text = call_gemini(prompt)
+                    if response_text:
+                        # Strip ```json fences if model adds them
+                        cleaned = response_text.strip()
+                        if cleaned.startswith("```json"):
+                            cleaned = cleaned[7:]
+                        if cleaned.endswith("```"):
+                            cleaned = cleaned[:-3]
+                        cleaned = cleaned.strip()
+
+                        mcq_json = json.loads(cleaned)
+                        st.success("✅ MCQs generated successfully!")
+                        st.json(mcq_json)
+
+                        json_str = json.dumps(mcq_json, indent=4)
+                        st.download_button(
+                            label="📥 Download JSON",
+                            data=json_str,
+                            file_name="generated_mcqs.json",
+                            mime="application/json",
+                        )
+                    else:
+                        st.error("No response received from Gemini.")
+                except json.JSONDecodeError:
+                    st.error("❌ LLM response was not valid JSON. Please retry.")
+                    st.text("Raw response from LLM:")
+                    st.text(response_text)
+                except Exception as e:
+                    st.error(f"An error occurred: {str(e)}")
+                    st.text("Raw response from LLM (if available):")
+                    st.text(response_text if "response_text" in locals() else "No response captured.")
+
+    else:
+        st.error(
+            "❌ Could not extract any text from the uploaded file. "
+            "It might be empty, scanned as an image, or corrupted."
+        )
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+# -------------------------------------------------
+# TTL + LRU CACHE WITH OPTIONAL SQLITE PERSISTENCE
+# -------------------------------------------------
+
+
+class TTLCache:
+    """
+    Thread-safe key/value cache with per-entry TTL and LRU eviction.
+
+    Values must be JSON-serializable. With db_path set, entries are written
+    through to a local SQLite table and read back on an in-memory miss, so
+    the cache survives restarts; the table is capped at max_disk_items rows
+    (oldest writes dropped first) and expired rows are removed on write.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 1024,
+        ttl: float = 3600,
+        db_path: Optional[str] = None,
+        table: str = "cache",
+        max_disk_items: int = 100_000,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_disk_items = max_disk_items
+        self._table = table
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key        TEXT PRIMARY KEY,
+                    value      TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_updated ON {table} (updated_at)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._items[key]
+                entry = None
+
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    f"SELECT value, expires_at FROM {self._table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    entry = (row[1], json.loads(row[0]))
+                    self._remember(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, (expires_at, value))
+            if self._conn is None:
+                return
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, expires_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune_disk(now)
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+                self._conn.commit()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _remember(self, key: str, entry: Tuple[float, Any]) -> None:
+        self._items[key] = entry
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def _prune_disk(self, now: float) -> None:
+        self._conn.execute(f"DELETE FROM {self._table} WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            f"""
+            DELETE FROM {self._table} WHERE key IN (
+                SELECT key FROM {self._table} ORDER BY updated_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_disk_items,),
+        )
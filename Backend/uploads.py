@@ -0,0 +1,231 @@
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+from typing import IO, Optional
+
+from dotenv import load_dotenv
+from flask import Request
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+load_dotenv()
+
+# Uploads larger than this are rejected with 413 (also Flask's MAX_CONTENT_LENGTH).
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 ** 2)))
+# Uploads are kept in memory up to this size, then spilled to a temp file.
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(8 * 1024 ** 2)))
+
+
+# -------------------------------------------------
+# UPLOAD BUFFER
+# -------------------------------------------------
+class UploadBuffer(io.BufferedIOBase):
+    """
+    Write-once, then read, buffer for one uploaded file.
+
+    The multipart parser writes the body into it as it streams in; every
+    write also updates a sha256, so the document id is known as soon as
+    the body is read, without a second pass. Data stays in a BytesIO up to
+    spool_bytes and moves to a uniquely named temp file beyond that (or
+    when a consumer needs a path, see spill). More than max_bytes raises
+    RequestEntityTooLarge, which also covers bodies without a
+    Content-Length.
+    """
+
+    def __init__(
+        self, spool_bytes: int = UPLOAD_SPOOL_BYTES, max_bytes: int = UPLOAD_MAX_BYTES
+    ):
+        super().__init__()
+        self.spool_bytes = spool_bytes
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.path: Optional[str] = None
+        self._file: IO[bytes] = io.BytesIO()
+        self._hash = hashlib.sha256()
+        self._detached = False
+
+    # ---------- writing ----------
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        n = len(data)
+        if self.size + n > self.max_bytes:
+            raise RequestEntityTooLarge()
+        self._hash.update(data)
+        if self.path is None and self.size + n > self.spool_bytes:
+            self._rollover()
+        self._file.write(data)
+        self.size += n
+        return n
+
+    @classmethod
+    def wrap(cls, file: IO[bytes], max_bytes: int = UPLOAD_MAX_BYTES) -> "UploadBuffer":
+        """
+        A buffer over a file that is already spooled (Starlette's
+        UploadFile.file), used in place: one read pass for the size and
+        hash, no copy. Closing the buffer closes the file.
+        """
+        buffer = cls(max_bytes=max_bytes)
+        buffer._file = file
+        file.seek(0)
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            buffer.size += len(block)
+            if buffer.size > max_bytes:
+                raise RequestEntityTooLarge()
+            buffer._hash.update(block)
+        return buffer
+
+    def _rollover(self) -> None:
+        spilled = tempfile.NamedTemporaryFile(prefix="smartedu-upload-", delete=False)
+        if isinstance(self._file, io.BytesIO):
+            spilled.write(self._file.getbuffer())
+        else:
+            self._file.seek(0)
+            shutil.copyfileobj(self._file, spilled)
+        self._file.close()
+        self._file = spilled
+        self.path = spilled.name
+
+    def spill(self) -> str:
+        """Path of a file holding the upload (written out now if in memory)."""
+        if self.path is None:
+            position = self._file.tell()
+            self._rollover()
+            self._file.seek(position)
+        self._file.flush()
+        return self.path
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+    @property
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    # ---------- reading ----------
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        return self._file.read(-1 if size is None else size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def readinto(self, buffer) -> int:
+        return self._file.readinto(buffer)
+
+    def readline(self, size: Optional[int] = -1) -> bytes:
+        return self._file.readline(-1 if size is None else size)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    # ---------- lifetime ----------
+    def detach_from_request(self) -> "UploadBuffer":
+        """Keep the buffer open after the request ends; the caller closes it."""
+        self._detached = True
+        return self
+
+    def close(self) -> None:
+        if self._detached or self.closed:
+            return
+        self._file.close()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        super().close()
+
+    def release(self) -> None:
+        """Close a detached buffer."""
+        self._detached = False
+        self.close()
+
+
+class UploadRequest(Request):
+    """
+    Flask request whose file uploads stream into UploadBuffers. Set
+    MAX_CONTENT_LENGTH to UPLOAD_MAX_BYTES as well, so oversized bodies
+    with a Content-Length are refused before any of them is read.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadBuffer()
+
+
+# -------------------------------------------------
+# UPLOAD
+# -------------------------------------------------
+class Upload:
+    """An uploaded document: filename, a readable buffer, size and content hash."""
+
+    __slots__ = ("filename", "buffer", "size", "doc_id")
+
+    def __init__(self, filename: str, buffer: UploadBuffer):
+        self.filename = filename or ""
+        self.buffer = buffer
+        self.size = buffer.size
+        self.doc_id = buffer.hexdigest
+
+    @property
+    def ext(self) -> str:
+        return self.filename.split(".")[-1].lower()
+
+    def stream(self) -> UploadBuffer:
+        """The buffer, rewound; parsers read it in place."""
+        self.buffer.seek(0)
+        return self.buffer
+
+    @classmethod
+    def from_file_storage(cls, storage: FileStorage) -> "Upload":
+        if isinstance(storage.stream, UploadBuffer):
+            return cls(storage.filename or "", storage.stream)
+        # Not parsed by UploadRequest: copy into a buffer once.
+        return cls.from_stream(storage.stream, storage.filename or "")
+
+    @classmethod
+    def from_stream(cls, stream: IO[bytes], filename: str) -> "Upload":
+        """Copy a readable file object into a new buffer (size-checked)."""
+        buffer = UploadBuffer()
+        try:
+            for block in iter(lambda: stream.read(1024 * 1024), b""):
+                buffer.write(block)
+        except BaseException:
+            buffer.close()
+            raise
+        return cls(filename, buffer)
+
+    @classmethod
+    def from_spooled(cls, file: IO[bytes], filename: str) -> "Upload":
+        """Use an already-spooled file in place (see UploadBuffer.wrap)."""
+        buffer = UploadBuffer.wrap(file)
+        return cls(filename, buffer)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, filename: str) -> "Upload":
+        buffer = UploadBuffer()
+        buffer.write(data)
+        return cls(filename, buffer)
+
+    def keep(self) -> "Upload":
+        """Outlive the request (background jobs); pair with close()."""
+        self.buffer.detach_from_request()
+        return self
+
+    def close(self) -> None:
+        self.buffer.release()
@@ -11,6 +11,7 @@ const AIMcqgenerator = () => {
   const [submitted, setSubmitted] = useState(false);
   const [score, setScore] = useState(0);
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [message, setMessage] = useState("");
   const [reviewData, setReviewData] = useState({});  
   const [reviewLoading, setReviewLoading] = useState(false);
@@ -23,43 +24,83 @@ const AIMcqgenerator = () => {
     }
   };
 
-  // ---------------- UPLOAD + GENERATE ----------------
+  // ---------------- UPLOAD + GENERATE (streamed) ----------------
+  // The backend sends one server-sent event per question as soon as the
+  // LLM has finished it, so the quiz starts rendering before generation ends.
   const handleUpload = async () => {
     if (!file) return setMessage("Please select a file to upload.");
     setLoading(true);
+    setStreaming(true);
+    setMcqs([]);
     setMessage("Generating MCQs... please wait.");
 
     const formData = new FormData();
     formData.append("file", file);
 
     try {
-      const res = await fetch("http://localhost:5000/generate_mcq", {
+      const res = await fetch("http://localhost:5000/generate_mcq/stream", {
         method: "POST",
         body: formData,
       });
 
-      const data = await res.json();
-
       if (!res.ok) {
+        const data = await res.json();
         setMessage(data.error || "Failed to generate MCQs.");
         return;
       }
 
-      const formatted = Object.entries(data.mcqs).map(
-        ([question, details]) => ({
-          question,
-          options: details.options,
-          correct_answer: details.correct_option,
-          difficulty: details.difficulty,
-        })
-      );
-
-      setMcqs(formatted);
-      setMessage("MCQs generated successfully.");
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let count = 0;
+      let failed = false;
+
+      const handleEvent = (raw) => {
+        let event = "message";
+        let data = "";
+        raw.split("\n").forEach((line) => {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        });
+        if (!data) return;
+        const payload = JSON.parse(data);
+
+        if (event === "question") {
+          count += 1;
+          setMcqs((prev) => [
+            ...prev,
+            {
+              question: payload.question,
+              options: payload.options,
+              correct_answer: payload.correct_option,
+              difficulty: payload.difficulty,
+            },
+          ]);
+          setLoading(false);
+        } else if (event === "error") {
+          failed = true;
+          setMessage(payload.error || "Failed to generate MCQs.");
+        }
+      };
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+          handleEvent(buffer.slice(0, sep));
+          buffer = buffer.slice(sep + 2);
+        }
+      }
+
+      if (!count) setMessage("Failed to generate MCQs.");
+      else if (!failed) setMessage("MCQs generated successfully.");
     } catch (error) {
       setMessage("Connection error. Check backend server.");
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -86,6 +127,7 @@ const AIMcqgenerator = () => {
         options: q.options,
         correct_option: correct,
         chosen_option: chosen,
+        difficulty: q.difficulty,
         is_correct:
           chosen.trim().toLowerCase() === correct.trim().toLowerCase(),
       };
@@ -228,9 +270,11 @@ const AIMcqgenerator = () => {
             <button
               className="submit-btn"
               onClick={handleSubmit}
-              disabled={Object.keys(selectedOptions).length !== mcqs.length}
+              disabled={
+                streaming || Object.keys(selectedOptions).length !== mcqs.length
+              }
             >
-              Submit Answers
+              {streaming ? "Generating more questions..." : "Submit Answers"}
             </button>
           </div>
         )}